@@ -56,6 +56,7 @@ from src.telegram_bot.config import TELEGRAM_BOT_TOKEN
 from src.telegram_bot.code_agent_handlers import (
     start_command_code,
     help_command_code,
+    stats_command_code,
     clear_command_code,
     handle_message_code,
     error_handler_code
@@ -114,6 +115,7 @@ def main():
     # Register handlers for code agent system
     application.add_handler(CommandHandler("start", start_command_code))
     application.add_handler(CommandHandler("help", help_command_code))
+    application.add_handler(CommandHandler("stats", stats_command_code))
     application.add_handler(CommandHandler("clear", clear_command_code))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message_code))
 
@@ -24,6 +24,7 @@ from .municipality_agent import CodeMunicipalityAgent
 from .general_agent import GeneralAgent
 from .system import CodeMultiAgentSystem
 from .security import SecurityValidator, validate_and_sanitize
+from .linter import PerformanceLinter
 
 __all__ = [
     'DataManager',
@@ -33,7 +34,8 @@ __all__ = [
     'GeneralAgent',
     'CodeMultiAgentSystem',
     'SecurityValidator',
-    'validate_and_sanitize'
+    'validate_and_sanitize',
+    'PerformanceLinter'
 ]
 
 __version__ = '1.0.0'
@@ -0,0 +1,271 @@
+"""
+Analytics - Vectorized wind analysis helpers for the REPL
+
+Standard analyses (monthly and diurnal profiles, histograms, wind roses,
+exceedance percentages and the windiest days) are exposed to the generated
+code as one-line helper calls, so the code LLM does not rewrite the same
+pandas for every question.
+
+Profiles and daily rankings are answered from the RollupCube of the
+municipality: without a date range they are a lookup of a precomputed
+statistic; with a range the per-day count/sum/min/max/variance are combined
+per bucket (a few thousand rows at most). Histograms, wind roses and
+exceedance need the hourly values and use one binary-searched range view of
+the cached frame plus NumPy.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+# Names under which the helpers are exposed in the REPL
+HELPERS = ('monthly_cycle', 'diurnal_cycle', 'histogram', 'wind_rose', 'exceedance', 'windiest_days')
+
+# Compass sectors in Spanish (O = oeste), clockwise from north
+COMPASS_16 = ('N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE',
+              'S', 'SSO', 'SO', 'OSO', 'O', 'ONO', 'NO', 'NNO')
+
+# Speed classes of the wind rose (m/s)
+ROSE_SPEED_BINS = (0, 2, 4, 6, 8, 10, np.inf)
+
+# Per-bucket statistics combined when a date range is given
+_COMBINABLE = ('count', 'sum', 'min', 'max', 'var')
+
+
+def _combine(stats: pd.DataFrame, keys, stat: str) -> pd.Series:
+    """
+    Combine per-bucket statistics into coarser groups.
+
+    Args:
+        stats: Frame with count, sum, min, max and var (ddof=1) per bucket
+        keys: Grouping keys (array aligned with the rows or level name)
+        stat: Statistic of the groups (see rollups.STATISTICS)
+
+    Returns:
+        Series indexed by group
+    """
+    grouped = stats.groupby(keys, sort=True)
+    if stat in ('count', 'sum'):
+        return grouped[stat].sum()
+    if stat == 'min':
+        return grouped['min'].min()
+    if stat == 'max':
+        return grouped['max'].max()
+    count = grouped['count'].sum()
+    total = grouped['sum'].sum()
+    if stat == 'mean':
+        return total / count
+    # Sum of squares per bucket recovered from its variance
+    sumsq = (stats['var'].fillna(0) * (stats['count'] - 1) + stats['sum'] ** 2 / stats['count']).fillna(0)
+    var = ((sumsq.groupby(keys, sort=True).sum() - total ** 2 / count) / (count - 1)).clip(lower=0)
+    return np.sqrt(var) if stat == 'std' else var
+
+
+class WindAnalytics:
+    """Vectorized analysis helpers over the DataManager frames and rollups."""
+
+    def __init__(self, data_manager):
+        """
+        Initialize the helpers.
+
+        Args:
+            data_manager: DataManager with the municipality data
+        """
+        self.data_manager = data_manager
+
+    def namespace(self) -> Dict[str, object]:
+        """Helpers by the name they get in the REPL (see HELPERS)."""
+        return {name: getattr(self, name) for name in HELPERS}
+
+    def _rollup(self, municipality: str, dimension: str, variable: str, stat: str) -> pd.Series:
+        series = self.data_manager.get_rollup(municipality, dimension, variable, stat)
+        if series is None:
+            raise ValueError(f"No hay datos para el municipio '{municipality}'")
+        return series
+
+    def _stats(self, municipality: str, dimension: str, variable: str) -> pd.DataFrame:
+        """Combinable statistics per bucket of a rollup dimension."""
+        return pd.DataFrame({
+            stat: self._rollup(municipality, dimension, variable, stat) for stat in _COMBINABLE
+        })
+
+    def _values(self, municipality: str, variable: str, start, end) -> np.ndarray:
+        """Non-null hourly values of a variable in a range."""
+        series = self.data_manager.get_range(municipality, start, end, columns=variable)
+        if series is None:
+            raise ValueError(f"No hay datos para el municipio '{municipality}'")
+        values = series.to_numpy(dtype='float64')
+        return values[~np.isnan(values)]
+
+    def monthly_cycle(self, municipality: str, variable: str = 'wind_speed_10m', stat: str = 'mean',
+                      start=None, end=None) -> pd.Series:
+        """
+        Statistic of a variable per month of the year (1-12).
+
+        Args:
+            municipality: Name of the municipality
+            variable: Measure column
+            stat: 'mean', 'min', 'max', 'std', 'var', 'sum' or 'count'
+            start: First day of the period (open if None)
+            end: Last day of the period (open if None)
+
+        Returns:
+            Series indexed by month number
+        """
+        if start is None and end is None:
+            return self._rollup(municipality, 'month_of_year', variable, stat)
+        days = self._stats(municipality, 'day', variable).loc[start:end]
+        return _combine(days, days.index.month.rename('month'), stat).rename(f"{variable}_{stat}")
+
+    def diurnal_cycle(self, municipality: str, variable: str = 'wind_speed_10m', stat: str = 'mean',
+                      months: Optional[Iterable[int]] = None) -> pd.Series:
+        """
+        Statistic of a variable per hour of the day (0-23).
+
+        Args:
+            municipality: Name of the municipality
+            variable: Measure column
+            stat: 'mean', 'min', 'max', 'std', 'var', 'sum' or 'count'
+            months: Months of the year to include (e.g. [12, 1, 2]); all if None
+
+        Returns:
+            Series indexed by hour
+        """
+        if months is None:
+            return self._rollup(municipality, 'hour', variable, stat)
+        table = self._stats(municipality, 'month_hour', variable)
+        table = table[table.index.get_level_values('month').isin(list(months))]
+        return _combine(table, table.index.get_level_values('hour'), stat).rename(f"{variable}_{stat}")
+
+    def histogram(self, municipality: str, variable: str = 'wind_speed_10m',
+                  bins: Union[int, Sequence[float], None] = None, start=None, end=None) -> pd.DataFrame:
+        """
+        Distribution of the hourly values of a variable.
+
+        Args:
+            municipality: Name of the municipality
+            variable: Measure column
+            bins: Bin edges, a number of equal bins, or None for 1-unit bins
+                (1 m/s for wind speed) from 0
+            start: First instant of the period (open if None)
+            end: Last instant of the period (open if None)
+
+        Returns:
+            DataFrame indexed by interval (closed on the left) with hours and
+            pct (percentage of hours)
+        """
+        values = self._values(municipality, variable, start, end)
+        if bins is None:
+            top = np.ceil(values.max()) if len(values) else 1.0
+            bins = np.arange(min(0.0, np.floor(values.min()) if len(values) else 0.0), top + 1)
+        counts, edges = np.histogram(values, bins=bins)
+        index = pd.IntervalIndex.from_breaks(np.round(edges, 6), closed='left', name=variable)
+        total = counts.sum()
+        return pd.DataFrame({
+            'hours': counts,
+            'pct': np.round(counts / total * 100, 2) if total else np.zeros(len(counts)),
+        }, index=index)
+
+    def wind_rose(self, municipality: str, sectors: int = 16,
+                  speed_bins: Sequence[float] = ROSE_SPEED_BINS, start=None, end=None) -> pd.DataFrame:
+        """
+        Frequency of wind direction sectors by speed class.
+
+        Args:
+            municipality: Name of the municipality
+            sectors: Number of direction sectors (16 uses compass labels)
+            speed_bins: Edges of the speed classes (m/s)
+            start: First instant of the period (open if None)
+            end: Last instant of the period (open if None)
+
+        Returns:
+            DataFrame with one row per sector (clockwise from north) and one
+            column per speed class, in percentage of hours, plus a 'total'
+            column
+        """
+        frame = self.data_manager.get_range(municipality, start, end,
+                                            columns=['wind_direction_10m', 'wind_speed_10m'])
+        if frame is None:
+            raise ValueError(f"No hay datos para el municipio '{municipality}'")
+        direction = frame['wind_direction_10m'].to_numpy(dtype='float64')
+        speed = frame['wind_speed_10m'].to_numpy(dtype='float64')
+        valid = ~(np.isnan(direction) | np.isnan(speed))
+        direction, speed = direction[valid], speed[valid]
+
+        width = 360.0 / sectors
+        sector = (((direction % 360) + width / 2) // width).astype(np.int64) % sectors
+        edges = np.asarray(speed_bins, dtype='float64')
+        speed_class = np.clip(np.searchsorted(edges, speed, side='right') - 1, 0, len(edges) - 2)
+        counts = np.bincount(sector * (len(edges) - 1) + speed_class,
+                             minlength=sectors * (len(edges) - 1)).reshape(sectors, len(edges) - 1)
+
+        labels = COMPASS_16 if sectors == 16 else [f"{round(i * width, 1)}°" for i in range(sectors)]
+        columns = [f"{edges[i]:g}-{edges[i + 1]:g}" if np.isfinite(edges[i + 1]) else f">={edges[i]:g}"
+                   for i in range(len(edges) - 1)]
+        pct = counts / max(len(speed), 1) * 100
+        rose = pd.DataFrame(np.round(pct, 2), index=pd.Index(labels, name='sector'), columns=columns)
+        rose['total'] = np.round(pct.sum(axis=1), 2)
+        return rose
+
+    def exceedance(self, municipality: str, thresholds: Union[float, Sequence[float]],
+                   variable: str = 'wind_speed_10m', start=None, end=None) -> Union[float, pd.Series]:
+        """
+        Percentage of hours with a variable at or above thresholds.
+
+        Args:
+            municipality: Name of the municipality
+            thresholds: One threshold or a list of them
+            variable: Measure column
+            start: First instant of the period (open if None)
+            end: Last instant of the period (open if None)
+
+        Returns:
+            Percentage for one threshold, or a Series indexed by threshold
+        """
+        values = np.sort(self._values(municipality, variable, start, end))
+        levels = np.atleast_1d(np.asarray(thresholds, dtype='float64'))
+        above = len(values) - np.searchsorted(values, levels, side='left')
+        pct = np.round(above / max(len(values), 1) * 100, 2)
+        if np.ndim(thresholds) == 0:
+            return float(pct[0])
+        return pd.Series(pct, index=pd.Index(levels, name='threshold'), name=f"{variable}_pct_hours")
+
+    def windiest_days(self, municipality: str, k: int = 10, variable: str = 'wind_speed_10m',
+                      stat: str = 'mean', start=None, end=None) -> pd.Series:
+        """
+        The k days with the highest daily statistic.
+
+        Args:
+            municipality: Name of the municipality
+            k: Number of days
+            variable: Measure column
+            stat: Daily statistic ranked ('mean' or 'max' usually)
+            start: First day of the period (open if None)
+            end: Last day of the period (open if None)
+
+        Returns:
+            Series indexed by day, highest first
+        """
+        daily = self._rollup(municipality, 'day', variable, stat).loc[start:end]
+        return daily.nlargest(k)
+
+
+def describe_helpers(municipality: str) -> List[str]:
+    """
+    Compact documentation of the helpers for the code prompt.
+
+    Args:
+        municipality: Municipality used in the examples
+
+    Returns:
+        One line per helper
+    """
+    m = f"'{municipality}'"
+    return [
+        f"- monthly_cycle({m}, variable='wind_speed_10m', stat='mean', start=None, end=None): Serie por mes 1-12",
+        f"- diurnal_cycle({m}, variable='wind_speed_10m', stat='mean', months=None): Serie por hora 0-23 (months=[12, 1, 2] filtra meses)",
+        f"- histogram({m}, variable='wind_speed_10m', bins=None, start=None, end=None): DataFrame con hours y pct por intervalo (1 m/s por defecto)",
+        f"- wind_rose({m}, sectors=16, start=None, end=None): % de horas por dirección (N, NNE, ..., NNO) x velocidad, con columna total",
+        f"- exceedance({m}, [4, 8], variable='wind_speed_10m', start=None, end=None): % de horas con valor >= cada umbral",
+        f"- windiest_days({m}, k=10, stat='mean', start=None, end=None): los k días más ventosos (Serie por día)",
+    ]
@@ -0,0 +1,213 @@
+"""
+Code Cache - Compiled snippets and memoized results of the REPL
+
+Generated snippets are identified by the hash of their normalized AST, so
+formatting, comments and quoting differences map to the same entry. The
+cache keeps two LRU tables:
+
+- compiled code objects (and the global names they use) per fingerprint,
+  so a recurring snippet is parsed and compiled once;
+- execution results (output and produced artifacts) per (fingerprint,
+  data version), so a recurring analysis over unchanged data returns
+  without executing. A new data version never matches older entries.
+"""
+
+import ast
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from types import CodeType
+from typing import Dict, Optional, Set, Tuple
+
+# File name shown in tracebacks of generated code
+CODE_FILENAME = "<windbot-repl>"
+
+# Names whose results depend on more than the code and the data
+NONDETERMINISTIC_NAMES = {'now', 'today', 'utcnow', 'random', 'sample', 'rand', 'randn', 'shuffle'}
+
+
+def referenced_names(code: CodeType) -> Set[str]:
+    """Collect the global names used by a code object and its nested scopes."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names |= referenced_names(const)
+    return names
+
+
+def scan_artifacts(directory: Path) -> Dict[str, int]:
+    """Map the files of a directory to their modification time (ns)."""
+    try:
+        return {entry.name: entry.stat().st_mtime_ns for entry in Path(directory).iterdir() if entry.is_file()}
+    except OSError:
+        return {}
+
+
+class _LRU:
+    """Bounded mapping evicting the least recently used entry."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class CodeCache:
+    """LRU caches of compiled snippets and of their results per data version."""
+
+    def __init__(self, max_compiled: int = 256, max_results: int = 256):
+        """
+        Initialize the cache.
+
+        Args:
+            max_compiled: Compiled code objects kept
+            max_results: Execution results kept (0 disables memoization)
+        """
+        self._lock = threading.Lock()
+        # Exact source text -> fingerprint, so identical text skips parsing
+        self._fingerprints = _LRU(max_compiled)
+        self._compiled = _LRU(max_compiled)
+        self._results = _LRU(max_results)
+
+    def after_fork(self):
+        """Replace the lock in a forked child, where another thread may have held it."""
+        self._lock = threading.Lock()
+
+    def fingerprint(self, code: str) -> Tuple[str, ast.Module]:
+        """
+        Hash of the normalized AST of a snippet.
+
+        Args:
+            code: Python source
+
+        Returns:
+            Tuple of (hex digest, parsed module or None if the text was
+            seen before)
+
+        Raises:
+            SyntaxError: If the code does not parse
+        """
+        with self._lock:
+            known = self._fingerprints.get(code)
+        if known is not None:
+            return known, None
+        tree = ast.parse(code)
+        digest = hashlib.sha256(ast.dump(tree, annotate_fields=False).encode()).hexdigest()[:16]
+        with self._lock:
+            self._fingerprints.put(code, digest)
+        return digest, tree
+
+    def compile(self, code: str) -> Tuple[str, CodeType, Set[str]]:
+        """
+        Compiled code object of a snippet, compiling it on a miss.
+
+        Args:
+            code: Python source
+
+        Returns:
+            Tuple of (fingerprint, code object, referenced global names)
+
+        Raises:
+            SyntaxError: If the code does not parse
+        """
+        digest, tree = self.fingerprint(code)
+        with self._lock:
+            entry = self._compiled.get(digest)
+        if entry is None:
+            compiled = compile(tree if tree is not None else code, CODE_FILENAME, 'exec')
+            entry = (compiled, referenced_names(compiled))
+            with self._lock:
+                self._compiled.put(digest, entry)
+        return (digest,) + entry
+
+    def memoizable(self, code: str) -> Optional[str]:
+        """
+        Fingerprint under which the result of a snippet may be memoized.
+
+        Returns:
+            The fingerprint, or None if the code does not parse, memoization
+            is disabled or the code uses the clock or random numbers
+        """
+        if self._results.max_entries <= 0:
+            return None
+        try:
+            digest, compiled, names = self.compile(code)
+        except SyntaxError:
+            return None
+        if names & NONDETERMINISTIC_NAMES:
+            return None
+        return digest
+
+    def get_result(self, digest: str, version: int, artifact_dir: Optional[Path] = None) -> Optional[Dict]:
+        """
+        Memoized result of a snippet over a data version.
+
+        Entries whose artifacts were deleted or overwritten are dropped.
+
+        Args:
+            digest: Fingerprint (see memoizable)
+            version: Data version the result must have been computed on
+            artifact_dir: Directory the artifacts were written to
+
+        Returns:
+            Copy of the result dictionary or None on a miss
+        """
+        key = (digest, version)
+        with self._lock:
+            result = self._results.get(key)
+            if result is None:
+                return None
+            artifacts = result.get('artifacts')
+            if artifacts and artifact_dir is not None:
+                current = scan_artifacts(artifact_dir)
+                if any(current.get(name) != mtime for name, mtime in artifacts.items()):
+                    del self._results.entries[key]
+                    self._results.hits -= 1
+                    self._results.misses += 1
+                    return None
+        return dict(result, cached=True)
+
+    def put_result(self, digest: str, version: int, result: Dict):
+        """Memoize the result of a successful execution."""
+        with self._lock:
+            self._results.put((digest, version), dict(result))
+
+    def stats(self) -> Dict:
+        """
+        Cache metrics.
+
+        Returns:
+            Dictionary with entries, hits, misses, evictions and hit_rate of
+            the 'compiled' and 'results' tables
+        """
+        with self._lock:
+            return {'compiled': self._compiled.stats(), 'results': self._results.stats()}
@@ -10,6 +10,7 @@ from langchain_openai import ChatOpenAI
 # Project paths
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 DATA_DIR = PROJECT_ROOT / "data" / "raw"
+STATE_DIR = PROJECT_ROOT / "data" / "state"
 MODELS_DIR = PROJECT_ROOT / "models" / "LSTM"
 OUTPUT_DIR = PROJECT_ROOT / "test" / "chatbot" / "output"
 OUTPUT_DIR.mkdir(exist_ok=True)
@@ -28,6 +29,53 @@ MUNICIPALITIES = [
 # OpenAI API Key
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Seconds between checks for new ingested data (0 disables hot reload)
+DATA_REFRESH_SECONDS = int(os.getenv("DATA_REFRESH_SECONDS", "0"))
+
+# Whether to start from a snapshot of the built data state (warm start),
+# writing one when the source files changed
+DATA_SNAPSHOT = os.getenv("DATA_SNAPSHOT", "false").lower() in ("1", "true", "yes")
+
+# Shared memory segment prefix so bot processes on one host share the data
+# (unset: every process keeps its own copy)
+DATA_SHARED_MEMORY = os.getenv("DATA_SHARED_MEMORY")
+
+# Where generated code runs: "inline" (calling thread), "thread" (thread pool)
+# or "process" (pool of pre-forked workers), with the pool size and the length
+# of its request queue. Only "process" enforces the limits below, so with the
+# default "inline" generated code runs without CPU, memory or time limits
+REPL_BACKEND = os.getenv("REPL_BACKEND", "inline")
+REPL_WORKERS = int(os.getenv("REPL_WORKERS", str(os.cpu_count() or 1)))
+REPL_QUEUE_SIZE = int(os.getenv("REPL_QUEUE_SIZE", "32"))
+
+# Per-execution limits enforced in the "process" workers only (0 disables one;
+# without a wall-clock limit a hung snippet keeps its worker until close())
+REPL_CPU_SECONDS = float(os.getenv("REPL_CPU_SECONDS", "30"))
+REPL_MEMORY_MB = float(os.getenv("REPL_MEMORY_MB", "2048"))
+REPL_WALL_SECONDS = float(os.getenv("REPL_WALL_SECONDS", "60"))
+
+# Compiled snippets and memoized results (per data version) kept by the REPL
+REPL_CODE_CACHE_SIZE = int(os.getenv("REPL_CODE_CACHE_SIZE", "256"))
+REPL_RESULT_CACHE_SIZE = int(os.getenv("REPL_RESULT_CACHE_SIZE", "256"))
+
+# Output of one execution: characters kept (head and tail) for the LLM, and
+# characters written after which the snippet is stopped (0 disables the stop)
+REPL_OUTPUT_MAX_CHARS = int(os.getenv("REPL_OUTPUT_MAX_CHARS", "8000"))
+REPL_OUTPUT_STOP_CHARS = int(os.getenv("REPL_OUTPUT_STOP_CHARS", "1000000"))
+
+# Estimated seconds of row-wise pandas code (see linter.py) above which the
+# agent asks the code LLM once for a vectorized version
+LINT_MAX_SECONDS = float(os.getenv("LINT_MAX_SECONDS", "1.0"))
+
+# Per-execution profiling of the REPL (wall/CPU time, peak memory, hot lines),
+# appended as JSON lines to REPL_PROFILE_PATH
+REPL_PROFILE = os.getenv("REPL_PROFILE", "false").lower() in ("1", "true", "yes")
+REPL_PROFILE_PATH = Path(os.getenv("REPL_PROFILE_PATH", str(STATE_DIR / "repl_profile.jsonl")))
+
+# Render simple results (labeled numbers, short Series) with local Spanish
+# templates instead of a second LLM call (see formatter.py)
+LOCAL_FORMATTER = os.getenv("LOCAL_FORMATTER", "true").lower() in ("1", "true", "yes")
+
 # Initialize LLM models
 def get_supervisor_llm():
     """Get supervisor LLM instance."""
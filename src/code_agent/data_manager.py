@@ -2,45 +2,421 @@
 Data Manager - Handles loading and caching of municipality data
 """
 
+import atexit
+import copy
+import sys
+import threading
+import time
+import numpy as np
 import pandas as pd
-from typing import Dict, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
 from pathlib import Path
 from colorama import Fore, Style
 
-from .config import DATA_DIR, MUNICIPALITIES
+from .config import DATA_DIR, STATE_DIR, MUNICIPALITIES
+from .storage import source_path, read_frame, read_tail, file_signature, normalize_frame
+from .quality import QualityIndex, read_provenance
+from .metadata import manifest_path, build_manifest, read_manifest, write_manifest
+from .snapshot import current_sources, source_version, snapshot_path, save_snapshot, load_snapshot
+from .shared_data import segment_path, publish_frames, attach_frames
+from .rollups import RollupCube, MEASURE_COLUMNS
+
+
+# Narrowest dtypes able to hold each measure in compact mode
+COMPACT_DTYPES = {
+    'wind_speed_10m': 'float32',
+    'wind_direction_10m': 'uint16',
+    'temperature_2m': 'float32',
+    'relative_humidity_2m': 'uint8',
+    'precipitation': 'float32',
+}
+
+# Columns derivable from the DatetimeIndex (or constant per frame)
+DERIVED_COLUMNS = ['hour', 'date', 'municipio']
+
+# Values sampled per text column to estimate its size (see frame_nbytes)
+OBJECT_SAMPLE_SIZE = 64
+
+# Threads used to read the municipality files at startup
+LOAD_WORKERS = 8
+
+# Window re-read on refresh: the ingestion service rewrites the last days
+# (forecast rows) on every hourly pull
+REFRESH_OVERLAP = pd.Timedelta(days=5)
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Build the compact representation of a municipality frame.
+
+    Derived columns are dropped (hour and date come from the DatetimeIndex,
+    the municipality is implied by the frame) and measures are downcast.
+    Integer downcasts fall back to float32 when the column has nulls or
+    values outside the target range.
+
+    Args:
+        df: Municipality frame as stored on disk
+
+    Returns:
+        Compact DataFrame
+    """
+    df = df.drop(columns=[c for c in DERIVED_COLUMNS if c in df.columns])
+    
+    dtypes = {}
+    for column, dtype in COMPACT_DTYPES.items():
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if np.dtype(dtype).kind == 'u':
+            info = np.iinfo(dtype)
+            fits = (
+                values.notna().all()
+                and (values % 1 == 0).all()
+                and values.min() >= info.min
+                and values.max() <= info.max
+            )
+            dtypes[column] = dtype if fits else 'float32'
+        else:
+            dtypes[column] = dtype
+    
+    return df.astype(dtypes)
+
+
+def index_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Put a municipality frame on a sorted, unique DatetimeIndex.
+
+    The index shares its buffer with the datetime column, which is kept so
+    existing code using df['datetime'] keeps working.
+
+    Args:
+        df: Municipality frame
+
+    Returns:
+        Frame sorted by datetime and indexed by it
+    """
+    if not df['datetime'].is_monotonic_increasing:
+        df = df.sort_values('datetime', kind='stable')
+    if df['datetime'].duplicated().any():
+        df = df.drop_duplicates(subset='datetime', keep='last')
+    df.index = pd.DatetimeIndex(df['datetime'].values)
+    return df
+
+
+def readonly_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Zero-copy version of a frame whose column arrays are not writeable.
+
+    Every column (measures, datetime and the text columns) is rebuilt on a
+    read-only view of its own buffer, so writing values (df.loc[...] = ...,
+    Series.iloc[...] = ..., fillna(inplace=True)) raises instead of silently
+    changing a frame shared by every caller. Pandas cannot measure read-only
+    text columns deeply (memory_usage(deep=True) raises), so frame_nbytes
+    measures them itself.
+
+    Args:
+        df: Frame to protect
+
+    Returns:
+        Frame with the same index, columns and buffers
+    """
+    columns = {}
+    for column in df.columns:
+        values = df[column].to_numpy(copy=False)
+        if isinstance(values, np.ndarray) and values.flags.writeable:
+            values = values.view()
+            values.flags.writeable = False
+        columns[column] = values
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def frame_nbytes(df: pd.DataFrame, deep: bool = False) -> int:
+    """
+    Resident size of a frame in bytes.
+
+    Fixed-size columns are counted by their buffer size. Text columns are
+    estimated from a sample of their values unless deep is set, which
+    measures every string (exact but much slower). Strings are measured here
+    rather than by memory_usage(deep=True), which fails on the read-only
+    columns of cached frames (see readonly_frame).
+    The DatetimeIndex of compact frames shares its buffer with the
+    datetime column, so it is only counted once.
+
+    Args:
+        df: Frame to measure
+        deep: Whether to measure every value of the text columns
+
+    Returns:
+        Size in bytes
+    """
+    usage = df.memory_usage(index=False).sum()
+    for column in df.columns:
+        values = df[column].to_numpy(copy=False)
+        if isinstance(values, np.ndarray) and values.dtype == object and len(values):
+            sample = values if deep else values[::max(1, len(values) // OBJECT_SAMPLE_SIZE)]
+            usage += sum(map(sys.getsizeof, sample)) * len(values) // len(sample)
+    if not ('datetime' in df.columns
+            and np.shares_memory(df.index.values, df['datetime'].values)):
+        usage += df.index.memory_usage(deep=deep)
+    return int(usage)
 
 
 class DataManager:
     """Manages loading and caching of municipality data."""
     
-    def __init__(self, verbose: bool = True):
+    def __init__(self, verbose: bool = True, data_dir: Optional[Path] = None,
+                 compact: bool = False, lazy: bool = False,
+                 memory_budget_mb: Optional[float] = None,
+                 snapshot: bool = False, snapshot_dir: Optional[Path] = None,
+                 shared_memory: Optional[str] = None, state_dir: Optional[Path] = None):
         """
         Initialize DataManager.
         
         Args:
             verbose: Whether to print loading messages
+            data_dir: Directory with the municipality files (defaults to DATA_DIR)
+            compact: Whether to keep frames in the compact representation
+                (see compact_frame)
+            lazy: Whether to load each municipality on first access instead
+                of preloading all of them
+            memory_budget_mb: Maximum resident size of the cache; least
+                recently used frames are evicted beyond it (unbounded if None)
+            snapshot: Whether to start from a snapshot of the built state
+                matching the current source files, writing one when missing
+                (ignored in lazy mode)
+            snapshot_dir: Directory for snapshot files (defaults to
+                data_dir/snapshots)
+            shared_memory: Prefix of a shared memory segment holding the
+                frames; attaches to it when another process on the host
+                already published the current data version, otherwise loads
+                and publishes it (ignored in lazy mode)
+            state_dir: Directory of the ingestion service state, read for
+                forecast/archive provenance (defaults to STATE_DIR)
         """
-        self.data_cache: Dict[str, pd.DataFrame] = {}
+        # Ordered from least to most recently used
+        self.data_cache: Dict[str, pd.DataFrame] = OrderedDict()
         self.verbose = verbose
-        self._load_all_data()
+        self.data_dir = Path(data_dir) if data_dir is not None else DATA_DIR
+        self.compact = compact
+        self.lazy = lazy
+        self.memory_budget = int(memory_budget_mb * 1e6) if memory_budget_mb is not None else None
+        self.snapshot_dir = Path(snapshot_dir) if snapshot_dir is not None else self.data_dir / "snapshots"
+        self.state_dir = Path(state_dir) if state_dir is not None else STATE_DIR
+        
+        self._frame_sizes: Dict[str, int] = {}
+        # Rollups are built on first use (see _rollup); they are small and
+        # outlive evicted frames
+        self.rollups: Dict[str, RollupCube] = {}
+        # Cross-municipality views, rebuilt after data changes
+        self._panel: Optional[pd.DataFrame] = None
+        self._wide: Dict[str, pd.DataFrame] = {}
+        self._statistics_all: Optional[Tuple[int, pd.DataFrame]] = None
+        self._lock = threading.RLock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+        
+        # Source file and signature each frame was read from
+        self._sources: Dict[str, Tuple[Path, Tuple[int, int]]] = {}
+        # Increased on every data swap so downstream caches can key on it
+        self.data_version = 0
+        self.versions: Dict[str, int] = {}
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._stop_refresh = threading.Event()
+        # Seconds spent reading and preparing each municipality file
+        self.load_times: Dict[str, float] = {}
+        # Metadata manifest per municipality (see metadata.py) and the
+        # municipalities whose frame no longer matches its source file
+        self.manifests: Dict[str, Dict] = {}
+        self._detached = set()
+        # Quality index per resident municipality (see quality.py), counted
+        # in the memory budget and evicted with its frame, and the
+        # timestamps found more than once in each source file
+        self.quality: Dict[str, QualityIndex] = {}
+        self._duplicates: Dict[str, pd.DatetimeIndex] = {}
+        # Shared memory segment the frames live in and whether we own it
+        self.shared_segment: Optional[Path] = None
+        self._owns_segment = False
+        
+        if not lazy:
+            if shared_memory is not None and self._attach_shared(shared_memory):
+                return
+            if not (snapshot and self._restore_snapshot()):
+                self._load_all_data()
+                if snapshot:
+                    self.save_snapshot()
+            if shared_memory is not None:
+                self._publish_shared(shared_memory)
     
     def _load_all_data(self):
         """Preload all municipality data into cache."""
         if self.verbose:
             print(f"{Fore.YELLOW}📊 Cargando datos de municipios...{Style.RESET_ALL}")
         
-        for municipality in MUNICIPALITIES:
-            df = self.load_municipality_data(municipality)
+        # Parsing and grouping release the GIL, so files are read concurrently
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(LOAD_WORKERS, len(MUNICIPALITIES))) as executor:
+            loaded = list(executor.map(self.load_municipality_data, MUNICIPALITIES))
+        
+        for municipality, df in zip(MUNICIPALITIES, loaded):
             if df is not None:
-                self.data_cache[municipality] = df
+                self._store(municipality, df)
                 if self.verbose:
-                    print(f"{Fore.GREEN}  ✅ {municipality}: {len(df):,} registros{Style.RESET_ALL}")
+                    size_mb = self.get_memory_usage(municipality) / 1e6
+                    load_ms = self.load_times[municipality] * 1000
+                    print(f"{Fore.GREEN}  ✅ {municipality}: {len(df):,} registros ({size_mb:.1f} MB, {load_ms:.0f} ms){Style.RESET_ALL}")
             else:
                 if self.verbose:
                     print(f"{Fore.RED}  ❌ {municipality}: No encontrado{Style.RESET_ALL}")
         
         if self.verbose:
-            print()
+            print(f"{Fore.GREEN}  ⏱️  Carga total: {time.perf_counter() - start:.2f} s{Style.RESET_ALL}\n")
+    
+    def _snapshot_version(self, sources) -> str:
+        return source_version(sources, compact=self.compact)
+    
+    def save_snapshot(self) -> Path:
+        """
+        Write the resident frames and rollups to a snapshot file.
+        
+        Missing rollups are built first, so warm starts never build them.
+        
+        Returns:
+            Path of the snapshot, keyed by the version of the loaded files
+        """
+        with self._lock:
+            sources = {m: self._sources[m] for m in self.data_cache if m in self._sources}
+            state = {
+                'frames': dict(self.data_cache),
+                'rollups': {m: self._rollup(m) for m in sources},
+                'sources': sources,
+                'sizes': {m: self._frame_sizes[m] for m in self.data_cache},
+                'manifests': {m: self.get_metadata(m) for m in sources if m not in self._detached},
+                'duplicates': {m: self._duplicates[m] for m in sources if m in self._duplicates},
+            }
+        
+        path = save_snapshot(state, snapshot_path(self._snapshot_version(sources), self.snapshot_dir))
+        if self.verbose:
+            print(f"{Fore.GREEN}  💾 Snapshot guardado: {path.name}{Style.RESET_ALL}")
+        return path
+    
+    def _restore_snapshot(self) -> bool:
+        """
+        Load the snapshot matching the current source files.
+        
+        Frames come back as read-only views of the memory-mapped file.
+        
+        Returns:
+            True if a snapshot was restored
+        """
+        start = time.perf_counter()
+        sources = current_sources(MUNICIPALITIES, self.data_dir)
+        try:
+            state = load_snapshot(snapshot_path(self._snapshot_version(sources), self.snapshot_dir))
+        except Exception as e:
+            if self.verbose:
+                print(f"{Fore.RED}Error leyendo snapshot: {e}{Style.RESET_ALL}")
+            return False
+        if state is None:
+            return False
+        
+        with self._lock:
+            self.rollups.update(state['rollups'])
+            self.manifests.update(state.get('manifests', {}))
+            self._duplicates.update(state.get('duplicates', {}))
+            self._sources.update(state['sources'])
+            for municipality, df in state['frames'].items():
+                # Re-share the index with the mapped datetime column
+                self._store(municipality, index_frame(df), state['sizes'].get(municipality))
+        
+        if self.verbose:
+            print(f"{Fore.GREEN}⚡ Snapshot cargado: {len(self.data_cache)} municipios en "
+                  f"{time.perf_counter() - start:.2f} s{Style.RESET_ALL}\n")
+        return True
+    
+    def _attach_shared(self, prefix: str, sources=None) -> bool:
+        """
+        Map the segment published for the current source files.
+        
+        Frames become read-only views of the shared segment; rows merged
+        later with append_data/refresh are private to this process.
+        
+        Returns:
+            True if a segment was attached
+        """
+        if sources is None:
+            sources = current_sources(MUNICIPALITIES, self.data_dir)
+        path = segment_path(prefix, self._snapshot_version(sources))
+        try:
+            attached = attach_frames(path)
+        except Exception as e:
+            if self.verbose:
+                print(f"{Fore.RED}Error leyendo memoria compartida: {e}{Style.RESET_ALL}")
+            return False
+        if attached is None:
+            return False
+        
+        frames, rollups, duplicates = attached
+        with self._lock:
+            self.shared_segment = path
+            for municipality, cube in rollups.items():
+                self.rollups.setdefault(municipality, cube)
+            for municipality, timestamps in duplicates.items():
+                self._duplicates.setdefault(municipality, timestamps)
+            self._sources.update({m: sources[m] for m in frames if m in sources})
+            for municipality, df in frames.items():
+                self._store(municipality, df)
+        
+        if self.verbose:
+            size_mb = path.stat().st_size / 1e6 if path.exists() else 0
+            print(f"{Fore.GREEN}🔗 Memoria compartida {path.name}: {len(frames)} municipios "
+                  f"({size_mb:.1f} MB){Style.RESET_ALL}\n")
+        return True
+    
+    def _publish_shared(self, prefix: str):
+        """
+        Publish the resident frames and switch to the shared copy.
+        
+        Missing rollups are built first, so attaching processes never build
+        them.
+        """
+        with self._lock:
+            sources = {m: self._sources[m] for m in self.data_cache if m in self._sources}
+            path = segment_path(prefix, self._snapshot_version(sources))
+            if path.exists():
+                # Already published: attach without building anything
+                self._attach_shared(prefix, sources)
+                return
+            duplicates = {m: self._duplicates[m] for m in self.data_cache if m in self._duplicates}
+            rollups = {m: self._rollup(m) for m in list(self.data_cache)}
+            if publish_frames(dict(self.data_cache), rollups, path, duplicates):
+                self._owns_segment = True
+                atexit.register(self.close)
+            # Drop the private copies in favour of the shared mapping
+            self._attach_shared(prefix, sources)
+    
+    def close(self):
+        """Stop background refresh and remove the shared segment we published."""
+        self.stop_auto_refresh()
+        if self._owns_segment:
+            self._owns_segment = False
+            # Processes that mapped it keep their mapping
+            self.shared_segment.unlink(missing_ok=True)
+    
+    def after_fork(self):
+        """
+        Reset process-local state in a forked child (e.g. a REPL worker).
+        
+        Threads do not survive fork, so a lock held by another parent thread
+        at fork time would never be released, and the child neither runs
+        the refresh thread nor owns the shared segment.
+        """
+        self._lock = threading.RLock()
+        self._stop_refresh = threading.Event()
+        self._refresh_thread = None
+        self._owns_segment = False
     
     def load_municipality_data(self, municipality: str) -> Optional[pd.DataFrame]:
         """
@@ -56,39 +432,543 @@ class DataManager:
             return self.data_cache[municipality]
         
         try:
-            csv_file = DATA_DIR / f"open_meteo_{municipality}.csv"
-            if csv_file.exists():
-                df = pd.read_csv(csv_file)
-                df['datetime'] = pd.to_datetime(df['datetime'])
-                return df
-            else:
+            path = source_path(municipality, self.data_dir)
+            if path is None:
                 return None
+            start = time.perf_counter()
+            signature = file_signature(path)
+            df = read_frame(path, text_columns=not self.compact)
+            duplicated = df['datetime'].duplicated()
+            if duplicated.any():
+                self._duplicates[municipality] = pd.DatetimeIndex(df.loc[duplicated, 'datetime'].unique())
+            else:
+                self._duplicates.pop(municipality, None)
+            if self.compact:
+                df = compact_frame(df)
+            df = index_frame(df)
+            self._sources[municipality] = (path, signature)
+            self.load_times[municipality] = time.perf_counter() - start
+            return df
         except Exception as e:
             if self.verbose:
                 print(f"{Fore.RED}Error loading {municipality}: {e}{Style.RESET_ALL}")
             return None
     
+    def _store(self, municipality: str, df: pd.DataFrame, nbytes: Optional[int] = None) -> pd.DataFrame:
+        """
+        Insert a frame as most recently used and enforce the memory budget.
+        
+        The cached frame is the read-only version (see readonly_frame), which
+        is returned.
+        """
+        df = readonly_frame(df)
+        with self._lock:
+            if municipality not in self.quality:
+                archive_until = read_provenance(self.state_dir).get(municipality)
+                self.quality[municipality] = QualityIndex(df, self._duplicates.get(municipality), archive_until)
+            self.data_cache[municipality] = df
+            self.data_cache.move_to_end(municipality)
+            if nbytes is None:
+                # Exact accounting only matters when enforcing a budget
+                nbytes = frame_nbytes(df, deep=self.memory_budget is not None)
+            self._frame_sizes[municipality] = nbytes
+            self._evict(keep=municipality)
+            return df
+    
+    def _evict(self, keep: Optional[str] = None):
+        """Evict least recently used frames (with their quality indexes) until the cache fits the budget."""
+        if self.memory_budget is None:
+            return
+        
+        with self._lock:
+            for municipality in list(self.data_cache):
+                if self._resident_bytes() <= self.memory_budget:
+                    break
+                if municipality == keep:
+                    continue
+                del self.data_cache[municipality]
+                del self._frame_sizes[municipality]
+                # Rebuilt by _store when the frame is reloaded
+                self.quality.pop(municipality, None)
+                self.cache_evictions += 1
+                if self.verbose:
+                    print(f"{Fore.YELLOW}  ♻️  {municipality}: descargado de memoria{Style.RESET_ALL}")
+    
     def get_data(self, municipality: str) -> Optional[pd.DataFrame]:
         """
         Get cached data for municipality.
         
+        Frames that are not resident (lazy mode or evicted) are loaded on
+        first access.
+        
         Args:
             municipality: Name of the municipality
             
         Returns:
             DataFrame or None
         """
-        return self.data_cache.get(municipality)
+        with self._lock:
+            df = self.data_cache.get(municipality)
+            if df is not None:
+                self.data_cache.move_to_end(municipality)
+                self.cache_hits += 1
+                return df
+            
+            if municipality not in MUNICIPALITIES:
+                return None
+            
+            self.cache_misses += 1
+            previous = self._sources.get(municipality)
+            df = self.load_municipality_data(municipality)
+            if df is not None:
+                if municipality in self._detached or (
+                        previous is not None and previous != self._sources.get(municipality)):
+                    # The file changed (or rows were merged in memory) while
+                    # the frame was not resident
+                    self._detached.discard(municipality)
+                    self.rollups.pop(municipality, None)
+                    self.quality.pop(municipality, None)
+                    self._bump_version(municipality)
+                df = self._store(municipality, df)
+            return df
+    
+    def get_range(self, municipality: str, start=None, end=None,
+                  columns: Optional[Union[str, List[str]]] = None):
+        """
+        Get the rows of a municipality between two instants.
+        
+        Bounds are located by binary search on the sorted DatetimeIndex and
+        follow .loc semantics: both ends are inclusive and partial strings
+        such as '2024-03' cover the whole period. The result is a view of the
+        cached frame (no data is copied), so it must not be modified in place.
+        
+        Args:
+            municipality: Name of the municipality
+            start: First instant (timestamp or string), open if None
+            end: Last instant (timestamp or string), open if None
+            columns: Column name (returns a Series) or list of column names
+            
+        Returns:
+            DataFrame or Series view, or None if the municipality has no data
+        """
+        df = self.get_data(municipality)
+        if df is None:
+            return None
+        
+        rows = df.index.slice_indexer(start, end)
+        if columns is None:
+            return df.iloc[rows]
+        if isinstance(columns, str):
+            return df[columns].iloc[rows]
+        return pd.DataFrame({column: df[column].iloc[rows] for column in columns}, copy=False)
+    
+    def get_rollup(self, municipality: str, dimension: str, variable: str,
+                   stat: str = 'mean') -> Optional[pd.Series]:
+        """
+        Get a precomputed statistic per time bucket.
+        
+        Args:
+            municipality: Name of the municipality
+            dimension: 'day', 'month', 'year', 'month_of_year', 'hour' or
+                'month_hour'
+            variable: Measure column (e.g. 'wind_speed_10m')
+            stat: 'count', 'sum', 'min', 'max', 'mean', 'var' or 'std'
+            
+        Returns:
+            Series indexed by bucket, or None if the municipality has no data
+        """
+        cube = self._rollup(municipality)
+        if cube is None:
+            return None
+        return cube.query(dimension, variable, stat)
+    
+    def _rollup(self, municipality: str) -> Optional[RollupCube]:
+        """
+        Rollup cube of a municipality, built from its frame on first use.
+        
+        Building a cube takes tens of milliseconds per municipality, so it is
+        not done at load time (snapshots and shared segments carry the cubes).
+        """
+        with self._lock:
+            cube = self.rollups.get(municipality)
+            if cube is None:
+                df = self.get_data(municipality)
+                if df is None:
+                    return None
+                # get_data drops the cube of a reloaded, changed file
+                cube = self.rollups.get(municipality)
+                if cube is None:
+                    cube = self.rollups[municipality] = RollupCube(df)
+            return cube
+    
+    def append_data(self, municipality: str, new_rows: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """
+        Merge new rows (in the on-disk format) into a municipality.
+        
+        Rows with a timestamp already present replace the cached ones. A
+        built rollup cube is updated incrementally when only newer rows
+        change; it is dropped (and rebuilt on next use) when existing rows
+        are overwritten with different values.
+        The new frame and cube are swapped in together under the lock, so
+        readers see either the old or the new snapshot, never a mix.
+        
+        Args:
+            municipality: Name of the municipality
+            new_rows: Rows with the same columns as the stored files
+            
+        Returns:
+            Updated DataFrame or None if the municipality has no data
+        """
+        if new_rows.empty:
+            return self.get_data(municipality)
+        
+        with self._lock:
+            current = self.get_data(municipality)
+            if current is None:
+                return None
+            
+            new_rows = normalize_frame(new_rows.copy())
+            dtypes = current.dtypes.to_dict()
+            if self.compact:
+                new_rows = compact_frame(new_rows)
+                # Integer columns the new rows do not fit (nulls, out of
+                # range values) fall back to float32 like compact_frame does
+                for column, dtype in new_rows.dtypes.items():
+                    if dtype.kind == 'f' and column in dtypes and dtypes[column].kind in 'iu':
+                        dtypes[column] = dtype
+            new_rows = index_frame(new_rows).astype(dtypes)
+            
+            # Re-read rows that did not change are not updates
+            overlapping = new_rows.index <= current.index[-1]
+            if overlapping.any():
+                previous = current.reindex(new_rows.index[overlapping])
+                if previous.equals(new_rows[overlapping]):
+                    new_rows = new_rows[~overlapping]
+                    overlapping = overlapping[~overlapping]
+            if new_rows.empty:
+                return current
+            
+            cube = self.rollups.get(municipality)
+            if overlapping.any():
+                current = current.drop(index=new_rows.index, errors='ignore')
+                merged = index_frame(pd.concat([current, new_rows]))
+                cube = None
+            else:
+                merged = index_frame(pd.concat([current, new_rows]))
+                if cube is not None:
+                    # Readers keep using the old cube until the swap
+                    cube = copy.copy(cube)
+                    cube.append(new_rows)
+            
+            if cube is not None:
+                self.rollups[municipality] = cube
+            else:
+                self.rollups.pop(municipality, None)
+            self.quality.pop(municipality, None)
+            merged = self._store(municipality, merged)
+            self._detached.add(municipality)
+            self._bump_version(municipality)
+            return merged
+    
+    def _bump_version(self, municipality: str):
+        """Record a data change and drop the views derived from it."""
+        with self._lock:
+            self.data_version += 1
+            self.versions[municipality] = self.data_version
+            self.manifests.pop(municipality, None)
+            self._invalidate_panels()
+    
+    def get_data_version(self, municipality: Optional[str] = None) -> int:
+        """
+        Get the monotonically increasing data version.
+        
+        Args:
+            municipality: Name of the municipality (global version if None)
+            
+        Returns:
+            Version number, increased on every data swap
+        """
+        if municipality is not None:
+            return self.versions.get(municipality, 0)
+        return self.data_version
+    
+    def refresh(self) -> Dict[str, int]:
+        """
+        Pick up rows written by the ingestion service since the last load.
+        
+        Source files are compared by modification time and size; for changed
+        files only the tail (from REFRESH_OVERLAP before the last cached row)
+        is read and merged with append_data.
+        
+        Returns:
+            Dictionary mapping updated municipalities to their row count change
+        """
+        updated = {}
+        for municipality, source in list(self._sources.items()):
+            path = source_path(municipality, self.data_dir)
+            if path is None:
+                continue
+            signature = file_signature(path)
+            if (path, signature) == source:
+                continue
+            
+            df = self.data_cache.get(municipality)
+            if df is None:
+                # Not resident: reloaded with a fresh rollup on next access
+                with self._lock:
+                    self._sources.pop(municipality, None)
+                    self.rollups.pop(municipality, None)
+                    self.quality.pop(municipality, None)
+                    self._bump_version(municipality)
+                continue
+            
+            tail = read_tail(path, df.index[-1] - REFRESH_OVERLAP)
+            version = self.get_data_version(municipality)
+            merged = self.append_data(municipality, tail)
+            self._sources[municipality] = (path, signature)
+            self._detached.discard(municipality)
+            if self.get_data_version(municipality) != version:
+                updated[municipality] = len(merged) - len(df)
+                if self.verbose:
+                    print(f"{Fore.GREEN}  🔄 {municipality}: datos actualizados (v{self.data_version}){Style.RESET_ALL}")
+        
+        return updated
+    
+    def start_auto_refresh(self, interval_seconds: float = 300):
+        """
+        Call refresh() periodically in a background daemon thread.
+        
+        Args:
+            interval_seconds: Seconds between checks
+        """
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+        
+        def refresh_loop():
+            while not self._stop_refresh.wait(interval_seconds):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    if self.verbose:
+                        print(f"{Fore.RED}Error actualizando datos: {e}{Style.RESET_ALL}")
+        
+        self._stop_refresh.clear()
+        self._refresh_thread = threading.Thread(target=refresh_loop, name="data-refresh", daemon=True)
+        self._refresh_thread.start()
+    
+    def stop_auto_refresh(self):
+        """Stop the background refresh thread."""
+        self._stop_refresh.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join()
+            self._refresh_thread = None
+    
+    def _invalidate_panels(self):
+        """Drop the cross-municipality views so they are rebuilt on next use."""
+        with self._lock:
+            self._panel = None
+            self._wide = {}
+    
+    def get_panel(self) -> pd.DataFrame:
+        """
+        Get all municipalities as one long-format panel.
+        
+        The panel is indexed by (municipio, datetime) and holds the measure
+        columns. It is built once (one copy of the data) and the same object
+        is returned to every caller until the data changes; its arrays are
+        read-only (see readonly_frame).
+        
+        Returns:
+            DataFrame with a sorted (municipio, datetime) MultiIndex
+        """
+        with self._lock:
+            if self._panel is None:
+                frames = {}
+                for municipality in MUNICIPALITIES:
+                    df = self.get_data(municipality)
+                    if df is not None:
+                        frames[municipality] = df[[c for c in MEASURE_COLUMNS if c in df.columns]]
+                self._panel = readonly_frame(pd.concat(frames, names=['municipio', 'datetime']))
+            return self._panel
+    
+    def get_wide(self, variable: str) -> pd.DataFrame:
+        """
+        Get one variable of all municipalities as a time x station matrix.
+        
+        Args:
+            variable: Measure column (e.g. 'wind_speed_10m')
+            
+        Returns:
+            DataFrame indexed by datetime with one column per municipality
+        """
+        with self._lock:
+            if variable not in self._wide:
+                self._wide[variable] = readonly_frame(self.get_panel()[variable].unstack(level='municipio'))
+            return self._wide[variable]
+    
+    def get_statistics_all(self) -> pd.DataFrame:
+        """
+        Get the statistical summary of every municipality in one table.
+        
+        Computed with a single grouped pass over the panel and memoized per
+        data version; the returned table must not be modified in place.
+        
+        Returns:
+            DataFrame indexed by municipality with the get_statistics fields
+            (records, wind speed avg/max/min/std, temperature and humidity
+            averages, total precipitation, start and end)
+        """
+        with self._lock:
+            if self._statistics_all is not None and self._statistics_all[0] == self.data_version:
+                return self._statistics_all[1]
+            
+            panel = self.get_panel()
+            grouped = panel.groupby(level='municipio', sort=False)
+            table = grouped.agg(
+                wind_speed_avg=('wind_speed_10m', 'mean'),
+                wind_speed_max=('wind_speed_10m', 'max'),
+                wind_speed_min=('wind_speed_10m', 'min'),
+                wind_speed_std=('wind_speed_10m', 'std'),
+                temperature_avg=('temperature_2m', 'mean'),
+                humidity_avg=('relative_humidity_2m', 'mean'),
+                precipitation_total=('precipitation', 'sum'),
+            ).astype('float64').round(2)
+            
+            times = panel.index.get_level_values('datetime').to_series(index=panel.index.get_level_values('municipio'))
+            bounds = times.groupby(level=0, sort=False).agg(['size', 'min', 'max'])
+            table.insert(0, 'records', bounds['size'])
+            table['start'] = bounds['min']
+            table['end'] = bounds['max']
+            table.index.name = 'municipality'
+            table = readonly_frame(table)
+            
+            self._statistics_all = (self.data_version, table)
+            return table
     
     def get_all_data(self) -> Dict[str, pd.DataFrame]:
         """
         Get all cached data.
         
+        In lazy mode only the resident frames are included.
+        
         Returns:
             Dictionary mapping municipality names to DataFrames
         """
         return self.data_cache
     
+    def get_cache_stats(self) -> Dict:
+        """
+        Get cache counters.
+        
+        Returns:
+            Dictionary with hits, misses, evictions, resident size and the
+            shared memory segment in use
+        """
+        with self._lock:
+            return {
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "evictions": self.cache_evictions,
+                "resident": list(self.data_cache),
+                "resident_bytes": self._resident_bytes(),
+                "budget_bytes": self.memory_budget,
+                "shared_segment": self.shared_segment.name if self.shared_segment is not None else None,
+            }
+    
+    def _resident_bytes(self) -> int:
+        """Size of the cached frames and their quality indexes."""
+        return sum(self._frame_sizes.values()) + sum(index.nbytes for index in self.quality.values())
+    
+    def get_memory_usage(self, municipality: Optional[str] = None):
+        """
+        Get the memory footprint of cached frames.
+        
+        Args:
+            municipality: Name of the municipality (all if None)
+            
+        Returns:
+            Bytes used by the municipality frame, or a dictionary mapping
+            municipality names to bytes when no municipality is given
+        """
+        if municipality is not None:
+            return self._frame_sizes.get(municipality, 0)
+        
+        return dict(self._frame_sizes)
+    
+    def get_quality(self, municipality: str) -> Optional[QualityIndex]:
+        """
+        Get the data quality index of a municipality.
+        
+        Args:
+            municipality: Name of the municipality
+            
+        Returns:
+            QualityIndex or None if the municipality has no data
+        """
+        with self._lock:
+            if municipality not in self.quality and self.get_data(municipality) is None:
+                return None
+            return self.quality[municipality]
+    
+    def get_coverage(self, municipality: str, start=None, end=None) -> Dict:
+        """
+        Get data coverage of a municipality over a time range in O(1).
+        
+        Args:
+            municipality: Name of the municipality
+            start: First instant (inclusive; whole series if None)
+            end: Last instant (inclusive; strings like '2024-03' cover the
+                whole period)
+            
+        Returns:
+            Dictionary with expected/present/missing hours, coverage_pct and
+            out_of_range, duplicate and forecast hours (empty if no data)
+        """
+        quality = self.get_quality(municipality)
+        if quality is None:
+            return {}
+        return quality.coverage(start, end)
+    
+    def get_metadata(self, municipality: str) -> Optional[Dict]:
+        """
+        Get the metadata manifest of a municipality.
+        
+        The manifest is computed once per data version: it is read from the
+        .meta.json file next to the data file when that file describes the
+        loaded version, and built from the frame (and written) otherwise.
+        
+        Args:
+            municipality: Name of the municipality
+            
+        Returns:
+            Manifest dictionary (see metadata.build_manifest) or None if the
+            municipality has no data
+        """
+        with self._lock:
+            manifest = self.manifests.get(municipality)
+            if manifest is not None:
+                return manifest
+            
+            df = self.get_data(municipality)
+            if df is None:
+                return None
+            
+            source = None if municipality in self._detached else self._sources.get(municipality)
+            path = manifest_path(municipality, self.data_dir)
+            if source is not None:
+                manifest = read_manifest(path, *source)
+            if manifest is None:
+                manifest = build_manifest(df, municipality)
+                if source is not None:
+                    try:
+                        write_manifest(path, manifest, *source)
+                    except OSError as e:
+                        if self.verbose:
+                            print(f"{Fore.YELLOW}No se pudo guardar {path.name}: {e}{Style.RESET_ALL}")
+            
+            self.manifests[municipality] = manifest
+            return manifest
+    
     def get_statistics(self, municipality: str) -> Dict:
         """
         Get statistical summary for a municipality.
@@ -99,18 +979,18 @@ class DataManager:
         Returns:
             Dictionary with statistics
         """
-        df = self.get_data(municipality)
-        if df is None:
+        manifest = self.get_metadata(municipality)
+        if manifest is None:
             return {}
         
+        columns = manifest['columns']
         return {
             "municipality": municipality,
-            "records": len(df),
-            "wind_speed_avg": round(df['wind_speed_10m'].mean(), 2),
-            "wind_speed_max": round(df['wind_speed_10m'].max(), 2),
-            "wind_speed_min": round(df['wind_speed_10m'].min(), 2),
-            "temperature_avg": round(df['temperature_2m'].mean(), 2),
-            "humidity_avg": round(df['relative_humidity_2m'].mean(), 2),
-            "date_range": f"{df['datetime'].min()} a {df['datetime'].max()}"
+            "records": manifest['rows'],
+            "wind_speed_avg": round(columns['wind_speed_10m']['mean'], 2),
+            "wind_speed_max": round(columns['wind_speed_10m']['max'], 2),
+            "wind_speed_min": round(columns['wind_speed_10m']['min'], 2),
+            "temperature_avg": round(columns['temperature_2m']['mean'], 2),
+            "humidity_avg": round(columns['relative_humidity_2m']['mean'], 2),
+            "date_range": f"{manifest['start']} a {manifest['end']}"
         }
-
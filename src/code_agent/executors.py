@@ -0,0 +1,438 @@
+"""
+Executors - Execution backends for SafePythonREPL
+
+InlineBackend runs the generated code in the calling thread and
+ThreadPoolBackend in a pool of threads, which overlap well when the snippets
+spend their time in NumPy/pandas code that releases the GIL. ProcessPoolBackend
+runs it in a pool of worker processes forked from the bot once the REPL is
+built: pandas and matplotlib are already imported and the municipality frames
+are inherited copy-on-write, so workers are warm from the start and analyses
+of different users run in parallel on all cores.
+
+Requests wait in a bounded queue. Each worker is driven by one dispatcher
+thread of the parent, and a worker is re-forked when the DataManager publishes
+a new data version, so it never answers with stale frames.
+
+Workers enforce ExecutionLimits at the OS level: RLIMIT_CPU (SIGXCPU aborts
+the snippet) and RLIMIT_AS (allocations fail with MemoryError) are armed
+around every execution, and the dispatcher kills a worker that exceeds the
+wall-clock limit. A worker that hit any limit is replaced by a fresh fork.
+
+Workers are re-forked from dispatcher threads while other threads of the bot
+may hold locks (caches, logs); a forked child inherits such a lock held and
+would wait on it forever, so the initializer must reset the locks the worker
+uses (see SafePythonREPL._after_fork). With no wall-clock limit the
+dispatcher waits for the answer in WAIT_INTERVAL steps, noticing dead
+workers and close().
+"""
+
+import atexit
+import math
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+# Seconds between checks of a worker that has no wall-clock limit
+WAIT_INTERVAL = 1.0
+
+
+def execution_result(status: str, output: str = "", error: Optional[str] = None, **details) -> Dict:
+    """
+    Build the structured result of one execution.
+
+    Args:
+        status: 'ok', 'error', 'busy' or 'limit_exceeded'
+        output: Captured standard output
+        error: Error message (None on success)
+        **details: Extra fields (e.g. limit='cpu' when a limit was exceeded)
+
+    Returns:
+        Result dictionary
+    """
+    return {'status': status, 'output': output, 'error': error, **details}
+
+
+class ExecutionLimitExceeded(BaseException):
+    """
+    Raised inside a snippet that exceeded its CPU time.
+
+    Derives from BaseException so generated `except Exception` blocks do not
+    swallow it.
+    """
+
+    def __init__(self, limit: str):
+        super().__init__(limit)
+        self.limit = limit
+
+
+LIMIT_MESSAGES = {
+    'cpu': "Límite de tiempo de CPU excedido ({value} s)",
+    'memory': "Límite de memoria excedido ({value} MB)",
+    'wall_time': "Límite de tiempo de ejecución excedido ({value} s)",
+}
+
+
+class ExecutionLimits:
+    """CPU, memory and wall-clock limits of one execution."""
+
+    def __init__(self, cpu_seconds: Optional[float] = None, memory_mb: Optional[float] = None,
+                 wall_seconds: Optional[float] = None):
+        """
+        Initialize the limits (None disables a limit).
+
+        Args:
+            cpu_seconds: CPU time the snippet may use (rounded up to whole
+                seconds, the RLIMIT_CPU granularity)
+            memory_mb: Address space the snippet may add to the worker
+            wall_seconds: Elapsed time before the worker is killed
+        """
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.wall_seconds = wall_seconds
+
+    def exceeded(self, limit: str, output: str = "") -> Dict:
+        """Structured result of an execution stopped by a limit."""
+        value = {'cpu': self.cpu_seconds, 'memory': self.memory_mb, 'wall_time': self.wall_seconds}[limit]
+        return execution_result('limit_exceeded', output, LIMIT_MESSAGES[limit].format(value=value), limit=limit)
+
+    def arm(self):
+        """Apply the limits to the current process, relative to its current usage."""
+        if not RESOURCE_AVAILABLE:
+            return
+        if self.cpu_seconds is not None:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            used = usage.ru_utime + usage.ru_stime
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            resource.setrlimit(resource.RLIMIT_CPU, (math.ceil(used + self.cpu_seconds), hard))
+        if self.memory_mb is not None:
+            _, hard = resource.getrlimit(resource.RLIMIT_AS)
+            resource.setrlimit(resource.RLIMIT_AS, (_address_space() + int(self.memory_mb * 2**20), hard))
+
+    def disarm(self):
+        """Lift the limits again (up to the hard limits)."""
+        if not RESOURCE_AVAILABLE:
+            return
+        for limit in (resource.RLIMIT_CPU, resource.RLIMIT_AS):
+            _, hard = resource.getrlimit(limit)
+            resource.setrlimit(limit, (hard, hard))
+
+
+def _address_space() -> int:
+    """Current virtual memory size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# Whether this worker process is running a snippet (see _worker_loop)
+_executing = False
+
+
+def _on_cpu_limit(signum, frame):
+    # Only the snippet is interrupted: a SIGXCPU delivered while the worker
+    # disarms the limits or answers over the pipe must not kill it mid-send
+    global _executing
+    if _executing:
+        _executing = False
+        raise ExecutionLimitExceeded('cpu')
+
+
+def _completed(result: Dict) -> Future:
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def _busy() -> Future:
+    return _completed(execution_result(
+        'busy', error="El servidor está ocupado con otros análisis; intenta de nuevo en unos segundos"))
+
+
+class InlineBackend:
+    """Runs every execution in the calling thread."""
+
+    name = "inline"
+
+    def __init__(self, execute: Callable[[str], Dict]):
+        """
+        Initialize the backend.
+
+        Args:
+            execute: Function running one snippet and returning its result
+        """
+        self._execute = execute
+
+    def submit(self, code: str) -> Future:
+        """Run the code now and return an already completed future."""
+        return _completed(self._execute(code))
+
+    def close(self):
+        """Nothing to release."""
+
+
+class ThreadPoolBackend:
+    """Runs executions concurrently in a pool of threads of this process."""
+
+    name = "thread"
+
+    def __init__(self, execute: Callable[[str], Dict], workers: Optional[int] = None,
+                 queue_size: int = 32):
+        """
+        Start the thread pool.
+
+        Args:
+            execute: Function running one snippet; it must keep the output
+                and variables of concurrent executions apart
+            workers: Number of threads (defaults to the CPU count)
+            queue_size: Maximum number of executions waiting for a thread;
+                further submissions get a 'busy' result
+        """
+        self._execute = execute
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="repl")
+        self._pending = threading.BoundedSemaphore(self.workers + queue_size)
+
+    def submit(self, code: str) -> Future:
+        """
+        Queue a snippet for execution.
+
+        Args:
+            code: Python code to execute
+
+        Returns:
+            Future resolving to the execution result
+        """
+        if not self._pending.acquire(blocking=False):
+            return _busy()
+        try:
+            future = self._executor.submit(self._execute, code)
+        except RuntimeError:
+            self._pending.release()
+            return _completed(execution_result('error', error="El ejecutor está cerrado"))
+        future.add_done_callback(lambda _: self._pending.release())
+        return future
+
+    def close(self):
+        """Wait for running executions and stop the threads."""
+        self._executor.shutdown(wait=True)
+
+
+def _worker_loop(conn, execute: Callable[[str], Dict], initializer: Optional[Callable[[], None]],
+                 limits: ExecutionLimits):
+    """Body of a worker process: run the snippets received over the pipe."""
+    global _executing
+    # Ctrl+C is handled by the parent, which stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(signal, 'SIGXCPU'):
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+    if initializer is not None:
+        initializer()
+    while True:
+        try:
+            code = conn.recv()
+        except (EOFError, OSError):
+            break
+        if code is None:
+            break
+        try:
+            limits.arm()
+            _executing = True
+            result = execute(code)
+            _executing = False
+        except ExecutionLimitExceeded as e:
+            result = limits.exceeded(e.limit)
+        finally:
+            _executing = False
+            limits.disarm()
+        conn.send(result)
+
+
+class _Worker:
+    """One forked worker process and the parent end of its pipe."""
+
+    def __init__(self, context, execute, initializer, limits, version):
+        self.version = version
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_loop, args=(child_conn, execute, initializer, limits),
+                                       name="repl-worker", daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def stop(self, timeout: float = 1.0):
+        """Ask the worker to exit, killing it if it does not."""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class ProcessPoolBackend:
+    """Runs executions in a pool of pre-forked worker processes."""
+
+    name = "process"
+
+    def __init__(self, execute: Callable[[str], Dict], workers: Optional[int] = None,
+                 queue_size: int = 32, version: Optional[Callable[[], int]] = None,
+                 initializer: Optional[Callable[[], None]] = None,
+                 limits: Optional[ExecutionLimits] = None):
+        """
+        Fork the workers and start their dispatcher threads.
+
+        Args:
+            execute: Function running one snippet in a worker; it is inherited
+                through fork, so it may reference unpicklable state
+            workers: Number of worker processes (defaults to the CPU count)
+            queue_size: Maximum number of executions waiting for a worker;
+                further submissions get a 'busy' result
+            version: Returns the current data version; workers forked at an
+                older version are replaced before their next execution
+            initializer: Called in each worker right after the fork; it must
+                reset the locks the worker uses, which another thread of
+                the parent may have held at fork time
+            limits: Limits enforced on every execution (none if None)
+        """
+        self._context = multiprocessing.get_context("fork")
+        self._execute = execute
+        self._version = version or (lambda: 0)
+        self._initializer = initializer
+        self.limits = limits or ExecutionLimits()
+        self.workers = workers or os.cpu_count() or 1
+        self.recycled = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._closed = False
+
+        # Fork everything up front, from the constructing thread
+        self._slots: List[_Worker] = [self._fork() for _ in range(self.workers)]
+        self._threads = [
+            threading.Thread(target=self._dispatch, args=(slot,), name=f"repl-dispatch-{slot}", daemon=True)
+            for slot in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        atexit.register(self.close)
+
+    def _fork(self) -> _Worker:
+        return _Worker(self._context, self._execute, self._initializer, self.limits, self._version())
+
+    @property
+    def pids(self) -> List[int]:
+        """Process ids of the current workers."""
+        return [worker.pid for worker in self._slots]
+
+    def submit(self, code: str) -> Future:
+        """
+        Queue a snippet for execution.
+
+        Args:
+            code: Python code to execute
+
+        Returns:
+            Future resolving to the execution result
+        """
+        if self._closed:
+            return _completed(execution_result('error', error="El ejecutor está cerrado"))
+        future = Future()
+        try:
+            self._queue.put_nowait((future, code))
+        except queue.Full:
+            return _busy()
+        return future
+
+    def _replace(self, slot: int, timeout: float = 1.0):
+        """Stop the worker of a slot and fork a fresh one."""
+        self._slots[slot].stop(timeout)
+        self._slots[slot] = self._fork()
+        self.recycled += 1
+
+    def _wait(self, worker: _Worker) -> bool:
+        """
+        Wait for the answer of a worker.
+
+        Returns:
+            True when an answer (or the end of the pipe) is ready, False if
+            the wall-clock limit passed or the backend was closed while
+            waiting without a limit
+        """
+        wall_seconds = self.limits.wall_seconds
+        if wall_seconds is not None:
+            return worker.conn.poll(wall_seconds)
+        # No limit: wait indefinitely, but never block close()
+        while not worker.conn.poll(WAIT_INTERVAL):
+            if self._closed:
+                return False
+        return True
+
+    def _dispatch(self, slot: int):
+        """Feed queued executions to one worker, re-forking it when stale, dead or over a limit."""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            future, code = job
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                result = self._run(slot, code)
+            except Exception as e:
+                # Forking a replacement failed (e.g. EAGAIN, ENOMEM): answer
+                # and keep dispatching; the dead slot is re-forked next time
+                result = execution_result('error', error=f"No se pudo iniciar el proceso de ejecución ({type(e).__name__}: {e})")
+            future.set_result(result)
+
+    def _run(self, slot: int, code: str) -> Dict:
+        """Run one snippet on the worker of a slot."""
+        worker = self._slots[slot]
+        if worker.version != self._version() or not worker.process.is_alive():
+            self._replace(slot)
+            worker = self._slots[slot]
+
+        try:
+            worker.conn.send(code)
+            if self._wait(worker):
+                result = worker.conn.recv()
+                if result['status'] == 'limit_exceeded':
+                    self._replace(slot)
+                return result
+            if self._closed:
+                worker.stop(timeout=0)
+                return execution_result('error', error="El ejecutor está cerrado")
+            self._replace(slot, timeout=0)
+            return self.limits.exceeded('wall_time')
+        except (EOFError, OSError) as e:
+            # The worker died mid-execution (e.g. killed by the OOM killer)
+            self._replace(slot, timeout=0)
+            return execution_result('error', error=f"El proceso de ejecución terminó inesperadamente ({type(e).__name__})")
+
+    def close(self):
+        """Stop the dispatcher threads and the workers."""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        for worker in self._slots:
+            worker.stop()
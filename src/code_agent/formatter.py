@@ -0,0 +1,209 @@
+"""
+Formatter - Deterministic Spanish rendering of simple REPL results
+
+Most analyses print a few labeled numbers ("Velocidad promedio: 15.39 m/s")
+or a short pandas Series (a monthly profile, the windiest days). Those are
+rendered here with fixed templates, so the agent answers without the second
+LLM round-trip. Anything else (errors, truncated or free-form output,
+DataFrames, long listings) returns None and is left to the LLM.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from .config import MUNICIPALITIES
+
+# Longest result rendered locally (lines of output; a 24-hour profile fits)
+MAX_LINES = 30
+
+MONTH_NAMES = ('enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio',
+               'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre')
+
+VARIABLE_LABELS = {
+    'wind_speed_10m': 'Velocidad del viento (m/s)',
+    'wind_direction_10m': 'Dirección del viento (°)',
+    'temperature_2m': 'Temperatura (°C)',
+    'relative_humidity_2m': 'Humedad relativa (%)',
+    'precipitation': 'Precipitación (mm)',
+}
+
+STAT_LABELS = {
+    'mean': 'promedio',
+    'min': 'mínimo',
+    'max': 'máximo',
+    'std': 'desviación estándar',
+    'var': 'varianza',
+    'sum': 'total',
+    'count': 'número de horas',
+    'pct_hours': '% de horas',
+}
+
+# Columns of DataManager.get_statistics_all()
+SUMMARY_LABELS = {
+    'records': 'Registros',
+    'wind_speed_avg': 'Viento promedio (m/s)',
+    'wind_speed_max': 'Viento máximo (m/s)',
+    'wind_speed_min': 'Viento mínimo (m/s)',
+    'wind_speed_std': 'Desviación del viento (m/s)',
+    'temperature_avg': 'Temperatura promedio (°C)',
+    'humidity_avg': 'Humedad promedio (%)',
+    'precipitation_total': 'Precipitación total (mm)',
+}
+
+INDEX_LABELS = {
+    'month': 'Por mes', 'month_of_year': 'Por mes', 'hour': 'Por hora del día', 'day': 'Por día',
+    'year': 'Por año', 'datetime': 'Por fecha', 'threshold': 'Por umbral', 'municipio': 'Por municipio',
+    'sector': 'Por dirección',
+}
+
+_NUMBER = r"-?\d[\d,]*(?:\.\d+)?(?:e[-+]?\d+)?"
+_NUMBER_VALUE = re.compile(rf"^(?P<number>{_NUMBER})\s*(?P<unit>%|°C|°|m/s|km/h|mm|horas|h|días|registros)?\.?$")
+_DATE_VALUE = re.compile(r"^\d{4}-\d{2}(-\d{2})?( \d{2}:\d{2}(:\d{2})?)?$")
+_PATH_VALUE = re.compile(r"^\S+\.(png|jpg|jpeg|svg|pdf|html|csv)$", re.IGNORECASE)
+_WORDS_VALUE = re.compile(r"^[^\W\d_]+(?: [^\W\d_]+){0,3}$")
+_LABELED_LINE = re.compile(r"^(?P<label>[^:=\[\]{}()]{1,60}?)\s*[:=]\s*(?P<value>.+)$")
+_SERIES_FOOTER = re.compile(r"^(?:Name: (?P<name>.+), )?dtype: \w+$")
+
+
+def _format_number(text: str) -> str:
+    """Round long decimals: 2 places from 1 up, 4 significant digits below."""
+    if 'e' in text.lower() or '.' not in text or len(text.split('.')[1]) <= 2:
+        return text
+    value = float(text.replace(',', ''))
+    if abs(value) >= 1:
+        return f"{value:,.2f}"
+    return f"{value:.4g}"
+
+
+def _format_value(value: str) -> Optional[str]:
+    """Normalize a printed value, or None if it is not a simple one."""
+    value = value.strip()
+    match = _NUMBER_VALUE.match(value)
+    if match:
+        unit = match.group('unit')
+        number = _format_number(match.group('number'))
+        if not unit:
+            return number
+        return f"{number}{unit}" if unit == '°' else f"{number} {unit}"
+    if _DATE_VALUE.match(value) or _PATH_VALUE.match(value) or _WORDS_VALUE.match(value):
+        return value
+    return None
+
+
+def _labeled_lines(lines: List[str]) -> Optional[Tuple[Optional[str], List[Tuple[str, str]]]]:
+    """
+    Parse "label: value" lines, optionally under a "Title:" line.
+
+    Returns:
+        Tuple of (title, [(label, value)]) or None if a line does not fit
+    """
+    title = None
+    if lines[0].endswith(':') and len(lines) > 1:
+        title, lines = lines[0][:-1].strip(), lines[1:]
+    items = []
+    for line in lines:
+        match = _LABELED_LINE.match(line.lstrip('-•* '))
+        if not match:
+            return None
+        value = _format_value(match.group('value'))
+        if value is None:
+            return None
+        items.append((match.group('label').strip(), value))
+    return title, items
+
+
+def _series_title(name: Optional[str]) -> Optional[str]:
+    """Spanish title of a Series name like 'wind_speed_10m_mean'."""
+    if not name or name == 'None':
+        return None
+    if name in SUMMARY_LABELS:
+        return SUMMARY_LABELS[name]
+    for variable, label in VARIABLE_LABELS.items():
+        if name == variable:
+            return label
+        if name.startswith(variable + '_'):
+            stat = name[len(variable) + 1:]
+            return f"{label} - {STAT_LABELS.get(stat, stat.replace('_', ' '))}"
+    return name.replace('_', ' ')
+
+
+def _index_value(index_name: Optional[str], value: str) -> str:
+    """Render one index label of a Series (month names, hours, municipalities)."""
+    if index_name in ('month', 'month_of_year') and value.isdigit() and 1 <= int(value) <= 12:
+        return MONTH_NAMES[int(value) - 1].capitalize()
+    if index_name == 'hour' and value.isdigit():
+        return f"{int(value):02d}:00"
+    if index_name == 'municipio' or value in MUNICIPALITIES:
+        return value.replace('_', ' ').title()
+    if index_name == 'threshold':
+        return _format_value(value) or value
+    return value
+
+
+def _series(lines: List[str]) -> Optional[Tuple[Optional[str], Optional[str], List[Tuple[str, str]]]]:
+    """
+    Parse the repr of a short pandas Series.
+
+    Returns:
+        Tuple of (title, index name, [(index label, value)]) or None
+    """
+    footer = _SERIES_FOOTER.match(lines[-1])
+    if not footer or len(lines) < 2:
+        return None
+    body = lines[:-1]
+    index_name = None
+    if len(body[0].split()) == 1 and not _NUMBER_VALUE.match(body[0]):
+        index_name, body = body[0], body[1:]
+    rows = []
+    for line in body:
+        parts = line.rsplit(None, 1)
+        if len(parts) != 2 or parts[0].strip() == '...':
+            return None
+        value = _format_value(parts[1])
+        if value is None:
+            return None
+        rows.append((_index_value(index_name, parts[0].strip()), value))
+    if not rows:
+        return None
+    return _series_title(footer.group('name')), index_name, rows
+
+
+def format_result_locally(result: Dict, title: str, query: Optional[str] = None) -> Optional[str]:
+    """
+    Render a simple execution result as the answer, without the LLM.
+
+    Args:
+        result: Execution result (see SafePythonREPL.execute)
+        title: What the analysis is about (e.g. the municipality name)
+        query: User question, repeated above a bare number
+
+    Returns:
+        Plain-text Spanish answer, or None if the result needs the LLM
+        (errors, truncated output, DataFrames, free text, long listings)
+    """
+    if result.get('status') != 'ok' or result.get('truncated'):
+        return None
+    lines = [line.strip() for line in result.get('output', '').strip().splitlines() if line.strip()]
+    if not lines or len(lines) > MAX_LINES:
+        return None
+
+    if len(lines) == 1:
+        value = _format_value(lines[0])
+        if value is not None and _NUMBER_VALUE.match(lines[0]):
+            question = f"{query.strip()}\n" if query else ""
+            return f"📊 {title}\n\n{question}• Resultado: {value}"
+
+    series = _series(lines)
+    if series is not None:
+        name, index_name, rows = series
+        header = f"📊 {title}" + (f" - {name}" if name else "")
+        label = INDEX_LABELS.get(index_name)
+        intro = f"{label}:\n" if label else ""
+        return header + "\n\n" + intro + "\n".join(f"• {index}: {value}" for index, value in rows)
+
+    labeled = _labeled_lines(lines)
+    if labeled is not None:
+        heading, items = labeled
+        header = f"📊 {title}" + (f" - {heading}" if heading else "")
+        return header + "\n\n" + "\n".join(f"• {label}: {value}" for label, value in items)
+    return None
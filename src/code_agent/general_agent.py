@@ -2,6 +2,7 @@
 General Agent - Handles conceptual questions without code
 """
 
+from typing import Optional
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
@@ -9,14 +10,17 @@ from langchain_core.output_parsers import StrOutputParser
 class GeneralAgent:
     """General agent for conceptual questions (no code execution)."""
     
-    def __init__(self, llm):
+    def __init__(self, llm, data_manager: Optional[object] = None):
         """
         Initialize General Agent.
         
         Args:
             llm: Language model instance
+            data_manager: DataManager whose per-municipality summary table is
+                given as context (e.g. to rank municipalities by wind)
         """
         self.llm = llm
+        self.data_manager = data_manager
         
         self.prompt = ChatPromptTemplate.from_template(
             """Eres WindBot, un asistente especializado EXCLUSIVAMENTE en predicción de viento y energía sostenible en La Guajira, Colombia.
@@ -37,12 +41,27 @@ Temas que PUEDES responder:
 - Información general sobre La Guajira relacionada con energía eólica
 
 Responde ÚNICAMENTE en español de forma clara, técnica pero accesible.
-
+{data_summary}
 Pregunta del usuario: {query}
 
 Respuesta:"""
         )
     
+    def _data_summary(self) -> str:
+        """Summary table of all municipalities for the prompt (empty without data)."""
+        if self.data_manager is None:
+            return ""
+        try:
+            table = self.data_manager.get_statistics_all()
+        except Exception:
+            return ""
+        return (
+            "\nResumen REAL de los datos históricos por municipio (velocidad en m/s, "
+            "temperatura en °C, humedad en %, precipitación en mm). Si la pregunta "
+            "se refiere a estos valores, úsalos y no inventes otros:\n"
+            f"{table.drop(columns=['start', 'end']).to_string()}\n"
+        )
+    
     def answer(self, query: str) -> str:
         """
         Answer general query.
@@ -55,7 +74,7 @@ Respuesta:"""
         """
         try:
             chain = self.prompt | self.llm | StrOutputParser()
-            response = chain.invoke({"query": query})
+            response = chain.invoke({"query": query, "data_summary": self._data_summary()})
             return response
         except Exception as e:
             return f"Error al procesar consulta: {e}"
@@ -0,0 +1,480 @@
+"""
+Performance Linter - Static checks of generated code for slow pandas idioms
+
+Generated snippets sometimes walk the rows of a frame in Python (iterrows,
+itertuples, df.iloc[i] in a range loop), apply a function per row
+(apply(axis=1)) or grow a frame with pd.concat inside a loop. On a
+municipality frame (~44,000 hourly rows) these take seconds where the
+vectorized equivalent takes milliseconds.
+
+The linter walks the AST of a snippet, flags those patterns and estimates
+their cost from the number of rows of the frame they iterate (resolved
+through the DataManager) and the iterations of the enclosing loops. Two
+cases are rewritten without the LLM:
+
+- `for i, row in df.iterrows()` whose body only reads `row['col']` (and
+  `i`) and never rebinds either name, nested scopes included, becomes
+  `for row in df.itertuples()` with `row.col` (and `row.Index`), about 20x
+  faster; itertuples yields Python ints and floats, so the narrow integer
+  columns of compact frames do not wrap around;
+- `df.apply(lambda row: <arithmetic over row['col']>, axis=1)` reading at
+  least one column becomes the same arithmetic over the columns of df, each
+  widened to int64 or float64: apply computes on Python ints and floats,
+  while arithmetic in the column dtype would wrap around on the uint8/uint16
+  columns of compact frames (humidity * 3) and lose precision on float32
+  ones.
+
+Whatever remains above the cost budget is reported back to the code LLM
+(see regeneration_request).
+"""
+
+import ast
+import keyword
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .config import LINT_MAX_SECONDS
+
+# Seconds per row of each row-wise pattern, measured on an hourly
+# municipality frame (pandas 2.x)
+ROW_COST_SECONDS = {
+    'iterrows': 30e-6,
+    'itertuples': 1.5e-6,
+    'row_indexing': 25e-6,
+    'apply_rows': 10e-6,
+}
+
+# Seconds per pd.concat / DataFrame.append call inside a loop (each one
+# copies everything accumulated so far)
+CONCAT_COST_SECONDS = 5e-4
+
+# Rows assumed for a municipality frame that is not resident, for frames of
+# unknown origin, and iterations assumed for loops of unknown length
+DEFAULT_ROWS = 50_000
+UNKNOWN_ROWS = 1_000
+DEFAULT_ITERATIONS = 100
+
+# Methods whose result is much smaller than the frame they are called on
+REDUCING_METHODS = {
+    'groupby', 'resample', 'rolling', 'agg', 'aggregate', 'describe', 'head', 'tail',
+    'nlargest', 'nsmallest', 'value_counts', 'mean', 'sum', 'min', 'max', 'std',
+    'count', 'median', 'unique', 'sample', 'pivot_table', 'corr',
+}
+
+ROW_ACCESSORS = {'iloc', 'loc', 'at', 'iat'}
+
+ARITHMETIC_OPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+
+RULE_MESSAGES = {
+    'iterrows': "recorre {rows:,} filas con iterrows(); usa operaciones vectorizadas sobre columnas, groupby o rollup()",
+    'itertuples': "recorre {rows:,} filas con itertuples(); usa operaciones vectorizadas sobre columnas",
+    'row_indexing': "indexa fila por fila ({rows:,} filas) dentro de un bucle; opera sobre columnas completas",
+    'apply_rows': "usa apply(axis=1) sobre {rows:,} filas; usa aritmética entre columnas o np.where",
+    'concat_in_loop': "llama a {call} dentro de un bucle (~{iterations:,} iteraciones, copia todo en cada una); "
+                      "acumula en una lista y concatena una sola vez, o usa groupby",
+}
+
+
+def _finding(rule: str, node: ast.AST, seconds: float, **details) -> Dict:
+    return {
+        'rule': rule,
+        'line': getattr(node, 'lineno', 0),
+        'message': RULE_MESSAGES[rule].format(**details),
+        'seconds': round(seconds, 3),
+    }
+
+
+def _is_row_axis(call: ast.Call) -> bool:
+    """Whether a call passes axis=1 / axis='columns'."""
+    return any(
+        kw.arg == 'axis' and isinstance(kw.value, ast.Constant) and kw.value.value in (1, 'columns')
+        for kw in call.keywords
+    )
+
+
+def _names_in(node: ast.AST) -> set:
+    return {n.id for n in ast.walk(node) if isinstance(n, ast.Name)}
+
+
+class _Analyzer(ast.NodeVisitor):
+    """Collects the findings of one module."""
+
+    def __init__(self, frame_rows: Callable[[str], Optional[int]]):
+        self.frame_rows = frame_rows
+        self.findings: List[Dict] = []
+        self.aliases: Dict[str, int] = {}
+        self.loops: List[int] = []
+
+    def outer_iterations(self) -> int:
+        total = 1
+        for iterations in self.loops:
+            total *= iterations
+        return total
+
+    def rows(self, node: ast.AST) -> int:
+        """Rows of the frame an expression evaluates to (estimated)."""
+        while True:
+            if isinstance(node, ast.Call):
+                func = node.func
+                if isinstance(func, ast.Attribute) and func.attr in REDUCING_METHODS:
+                    return UNKNOWN_ROWS
+                if isinstance(func, ast.Name) and func.id == 'get_range':
+                    if node.args and isinstance(node.args[0], ast.Constant):
+                        return self.frame_rows(f"df_{node.args[0].value}") or DEFAULT_ROWS
+                    return DEFAULT_ROWS
+                node = func
+            elif isinstance(node, (ast.Attribute, ast.Subscript)):
+                node = node.value
+            elif isinstance(node, ast.Name):
+                if node.id in self.aliases:
+                    return self.aliases[node.id]
+                return self.frame_rows(node.id) or UNKNOWN_ROWS
+            else:
+                return UNKNOWN_ROWS
+
+    def iterations(self, node: ast.AST) -> int:
+        """Iterations of a for loop over an expression (estimated)."""
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'range':
+            bound = node.args[1] if len(node.args) > 1 else node.args[0] if node.args else None
+            if isinstance(bound, ast.Constant) and isinstance(bound.value, int):
+                return max(bound.value, 1)
+            if (isinstance(bound, ast.Call) and isinstance(bound.func, ast.Name)
+                    and bound.func.id == 'len' and bound.args):
+                return self.rows(bound.args[0])
+            return DEFAULT_ITERATIONS
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+            return max(len(node.elts), 1)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            if node.func.attr in ('iterrows', 'itertuples'):
+                return self.rows(node.func.value)
+        return DEFAULT_ITERATIONS
+
+    def visit_Assign(self, node: ast.Assign):
+        self.generic_visit(node)
+        value = node.value
+        if (self.loops and isinstance(value, ast.Call) and isinstance(value.func, ast.Attribute)
+                and value.func.attr == 'append'):
+            # list.append returns None, so an assigned append is DataFrame.append
+            iterations = self.outer_iterations()
+            self.findings.append(_finding('concat_in_loop', node, iterations * CONCAT_COST_SECONDS,
+                                          call='DataFrame.append()', iterations=iterations))
+        if len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            rows = self.rows(value)
+            if rows != UNKNOWN_ROWS:
+                self.aliases[node.targets[0].id] = rows
+            else:
+                self.aliases.pop(node.targets[0].id, None)
+
+    def visit_Call(self, node: ast.Call):
+        func = node.func
+        if isinstance(func, ast.Attribute):
+            if func.attr in ('iterrows', 'itertuples'):
+                rows = self.rows(func.value)
+                seconds = ROW_COST_SECONDS[func.attr] * rows * self.outer_iterations()
+                self.findings.append(_finding(func.attr, node, seconds, rows=rows))
+            elif func.attr == 'apply' and _is_row_axis(node):
+                rows = self.rows(func.value)
+                seconds = ROW_COST_SECONDS['apply_rows'] * rows * self.outer_iterations()
+                self.findings.append(_finding('apply_rows', node, seconds, rows=rows))
+            elif (func.attr == 'concat' and isinstance(func.value, ast.Name) and func.value.id == 'pd'
+                    and self.loops):
+                iterations = self.outer_iterations()
+                self.findings.append(_finding('concat_in_loop', node, iterations * CONCAT_COST_SECONDS,
+                                              call='pd.concat()', iterations=iterations))
+        self.generic_visit(node)
+
+    def visit_For(self, node: ast.For):
+        self.visit(node.iter)
+        iterations = self.iterations(node.iter)
+        loop_names = _names_in(node.target)
+        # for i in range(len(df)): ... df.iloc[i] ...
+        if (isinstance(node.iter, ast.Call) and isinstance(node.iter.func, ast.Name)
+                and node.iter.func.id == 'range'):
+            for child in ast.walk(ast.Module(body=node.body, type_ignores=[])):
+                if (isinstance(child, ast.Subscript) and isinstance(child.value, ast.Attribute)
+                        and child.value.attr in ROW_ACCESSORS and _names_in(child.slice) & loop_names):
+                    seconds = ROW_COST_SECONDS['row_indexing'] * iterations * self.outer_iterations()
+                    self.findings.append(_finding('row_indexing', node, seconds, rows=iterations))
+                    break
+        self.loops.append(iterations)
+        for statement in node.body + node.orelse:
+            self.visit(statement)
+        self.loops.pop()
+
+    def visit_While(self, node: ast.While):
+        self.visit(node.test)
+        self.loops.append(DEFAULT_ITERATIONS)
+        for statement in node.body + node.orelse:
+            self.visit(statement)
+        self.loops.pop()
+
+    def _visit_comprehension(self, node):
+        iterations = 1
+        for generator in node.generators:
+            self.visit(generator.iter)
+            iterations *= self.iterations(generator.iter)
+            for condition in generator.ifs:
+                self.visit(condition)
+        self.loops.append(iterations)
+        for field in ('elt', 'key', 'value'):
+            if hasattr(node, field):
+                self.visit(getattr(node, field))
+        self.loops.pop()
+
+    visit_ListComp = visit_SetComp = visit_GeneratorExp = visit_DictComp = _visit_comprehension
+
+
+def _column_reads(body: List[ast.stmt], row: str) -> Optional[List[ast.Subscript]]:
+    """
+    The row['col'] reads of a loop body, if that is the only use of row.
+
+    Returns:
+        List of the subscript nodes, or None if row is used any other way or
+        a column is not a valid attribute name of itertuples()
+    """
+    reads, other = [], 0
+    for statement in body:
+        for node in ast.walk(statement):
+            if (isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == row
+                    and isinstance(node.ctx, ast.Load)):
+                column = node.slice
+                if not (isinstance(column, ast.Constant) and isinstance(column.value, str)
+                        and column.value.isidentifier() and not keyword.iskeyword(column.value)
+                        and not column.value.startswith('_') and column.value != 'Index'):
+                    return None
+                reads.append(node)
+            elif isinstance(node, ast.Name) and node.id == row:
+                other += 1
+    # Each read contains one Name node for row
+    return reads if other == len(reads) else None
+
+
+def _binds(body: List[ast.stmt], names: set) -> bool:
+    """
+    Whether a loop body binds any of names, in its own scope or a nested one.
+
+    Assignments, lambda/def parameters, def/class names, imports and
+    `except ... as` all count: a nested `lambda i: i + 1` has its own `i`,
+    which a rename of the loop variable must not touch.
+    """
+    for statement in body:
+        for node in ast.walk(statement):
+            if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+                bound = node.id
+            elif isinstance(node, ast.arg):
+                bound = node.arg
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.ExceptHandler)):
+                bound = node.name
+            elif isinstance(node, ast.alias):
+                bound = (node.asname or node.name).split('.')[0]
+            else:
+                continue
+            if bound in names:
+                return True
+    return False
+
+
+def _vectorizable(node: ast.AST, row: str) -> bool:
+    """Whether an expression is arithmetic over row['col'] and numbers."""
+    if isinstance(node, ast.BinOp):
+        return (isinstance(node.op, ARITHMETIC_OPS) and _vectorizable(node.left, row)
+                and _vectorizable(node.right, row))
+    if isinstance(node, ast.UnaryOp):
+        return isinstance(node.op, (ast.USub, ast.UAdd)) and _vectorizable(node.operand, row)
+    if isinstance(node, ast.Constant):
+        return isinstance(node.value, (int, float)) and not isinstance(node.value, bool)
+    return (isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == row
+            and isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str))
+
+
+def _pure(node: ast.AST) -> bool:
+    """Whether an expression can be evaluated twice (names, attributes, subscripts)."""
+    return all(not isinstance(child, (ast.Call, ast.NamedExpr, ast.Await, ast.Yield, ast.YieldFrom))
+               for child in ast.walk(node))
+
+
+def _widened(column: ast.expr) -> ast.expr:
+    """column.astype('int64' if column.dtype.kind in 'biu' else 'float64')"""
+    kind = ast.Attribute(ast.Attribute(column, 'dtype', ast.Load()), 'kind', ast.Load())
+    dtype = ast.IfExp(ast.Compare(kind, [ast.In()], [ast.Constant('biu')]),
+                      ast.Constant('int64'), ast.Constant('float64'))
+    return ast.Call(ast.Attribute(column, 'astype', ast.Load()), [dtype], [])
+
+
+class _Rewriter(ast.NodeTransformer):
+    """Applies the trivial rewrites and records them."""
+
+    def __init__(self):
+        self.rewrites: List[Dict] = []
+
+    def visit_For(self, node: ast.For):
+        self.generic_visit(node)
+        target, loop = node.target, node.iter
+        if not (isinstance(loop, ast.Call) and isinstance(loop.func, ast.Attribute)
+                and loop.func.attr == 'iterrows' and not loop.args and not loop.keywords
+                and isinstance(target, ast.Tuple) and len(target.elts) == 2
+                and all(isinstance(element, ast.Name) for element in target.elts)):
+            return node
+        index, row = target.elts[0].id, target.elts[1].id
+        body = node.body + node.orelse
+        if index == row or _binds(body, {index, row}):
+            return node
+        reads = _column_reads(body, row)
+        if reads is None:
+            return node
+
+        class Accessors(ast.NodeTransformer):
+            def visit_Subscript(self, sub):
+                if any(sub is read for read in reads):
+                    return ast.copy_location(ast.Attribute(ast.Name(row, ast.Load()), sub.slice.value, ast.Load()), sub)
+                return self.generic_visit(sub)
+
+            def visit_Name(self, name):
+                if name.id == index:
+                    return ast.copy_location(ast.Attribute(ast.Name(row, ast.Load()), 'Index', ast.Load()), name)
+                return name
+
+        node.body = [Accessors().visit(statement) for statement in node.body]
+        node.orelse = [Accessors().visit(statement) for statement in node.orelse]
+        node.target = ast.Name(row, ast.Store())
+        loop.func.attr = 'itertuples'
+        self.rewrites.append({'rule': 'iterrows', 'line': node.lineno,
+                              'message': "iterrows() reemplazado por itertuples()"})
+        return node
+
+    def visit_Call(self, node: ast.Call):
+        self.generic_visit(node)
+        func = node.func
+        if not (isinstance(func, ast.Attribute) and func.attr == 'apply' and _is_row_axis(node)
+                and len(node.args) == 1 and len(node.keywords) == 1 and _pure(func.value)):
+            return node
+        function = node.args[0]
+        if not (isinstance(function, ast.Lambda) and len(function.args.args) == 1
+                and not function.args.defaults and not function.args.kwonlyargs
+                and function.args.vararg is None and function.args.kwarg is None):
+            return node
+        row = function.args.args[0].arg
+        # A body without row['col'] (lambda r: 1) is a scalar, not a column
+        reads_row = any(isinstance(child, ast.Subscript) for child in ast.walk(function.body))
+        if not (reads_row and _vectorizable(function.body, row)):
+            return node
+
+        frame = func.value
+
+        class Columns(ast.NodeTransformer):
+            def visit_Subscript(self, sub):
+                return ast.copy_location(_widened(ast.Subscript(frame, sub.slice, ast.Load())), sub)
+
+        self.rewrites.append({'rule': 'apply_rows', 'line': node.lineno,
+                              'message': "apply(axis=1) reemplazado por aritmética entre columnas"})
+        return ast.copy_location(Columns().visit(function.body), node)
+
+
+class PerformanceLinter:
+    """Flags slow pandas idioms in generated code and estimates their cost."""
+
+    def __init__(self, data_manager=None, max_seconds: float = LINT_MAX_SECONDS):
+        """
+        Initialize the linter.
+
+        Args:
+            data_manager: DataManager used to size the municipality frames
+                (DEFAULT_ROWS is assumed without it)
+            max_seconds: Estimated cost above which a snippet is considered
+                too slow (see too_slow)
+        """
+        self.data_manager = data_manager
+        self.max_seconds = max_seconds
+
+    def frame_rows(self, name: str) -> Optional[int]:
+        """
+        Rows of a preloaded frame by its REPL name.
+
+        Returns:
+            Row count of df_<municipality> (DEFAULT_ROWS if not resident),
+            of df_panel, or None for other names
+        """
+        resident = self.data_manager.get_all_data() if self.data_manager is not None else {}
+        if name == 'df_panel':
+            return sum(len(df) for df in resident.values()) or DEFAULT_ROWS
+        if not name.startswith('df_'):
+            return None
+        df = resident.get(name[3:])
+        return len(df) if df is not None else DEFAULT_ROWS
+
+    def lint(self, code: str) -> List[Dict]:
+        """
+        Find the slow idioms of a snippet.
+
+        Args:
+            code: Python source
+
+        Returns:
+            Findings ordered by line, each a dictionary with rule, line,
+            message (Spanish, for the LLM) and seconds (estimated cost);
+            empty if the code does not parse
+        """
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return []
+        analyzer = _Analyzer(self.frame_rows)
+        analyzer.visit(tree)
+        return sorted(analyzer.findings, key=lambda finding: finding['line'])
+
+    def rewrite(self, code: str) -> Tuple[str, List[Dict]]:
+        """
+        Apply the trivial rewrites (iterrows to itertuples, arithmetic
+        apply(axis=1) to column arithmetic).
+
+        Args:
+            code: Python source
+
+        Returns:
+            Tuple of (code, rewrites applied); the code is returned unchanged
+            (comments included) when nothing was rewritten
+        """
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return code, []
+        rewriter = _Rewriter()
+        tree = ast.fix_missing_locations(rewriter.visit(tree))
+        if not rewriter.rewrites:
+            return code, []
+        return ast.unparse(tree), rewriter.rewrites
+
+    @staticmethod
+    def cost(findings: List[Dict]) -> float:
+        """Estimated seconds spent in the flagged code."""
+        return sum(finding['seconds'] for finding in findings)
+
+    def too_slow(self, findings: List[Dict]) -> bool:
+        """Whether the estimated cost of the findings exceeds max_seconds."""
+        return self.cost(findings) > self.max_seconds
+
+    def regeneration_request(self, code: str, findings: List[Dict]) -> str:
+        """
+        Complaint appended to the code prompt to ask for a faster version.
+
+        Args:
+            code: Code that was generated
+            findings: Its findings (see lint)
+
+        Returns:
+            Prompt section in Spanish
+        """
+        problems = "\n".join(
+            f"- Línea {finding['line']}: {finding['message']} (~{finding['seconds']:.1f} s estimados)"
+            for finding in findings
+        )
+        return f"""
+El código que generaste es demasiado lento:
+
+{code}
+
+Problemas de rendimiento detectados:
+{problems}
+
+Reescríbelo SIN recorrer filas: usa operaciones vectorizadas de pandas sobre columnas completas, groupby, rollup() o stats_all().
+
+Genera SOLO el código Python corregido (sin imports, sin explicaciones, solo el código ejecutable):"""
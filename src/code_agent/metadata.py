@@ -0,0 +1,110 @@
+"""
+Metadata - Per-municipality dataset manifest
+
+The manifest holds the row count, time bounds, summary statistics of every
+numeric column and the gaps of the hourly series. It is computed once per
+data version and written next to the data file as open_meteo_<m>.meta.json,
+tagged with the signature of the file it describes, so other processes and
+restarts reuse it instead of rescanning the rows.
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from .storage import FILE_PREFIX
+
+
+def manifest_path(municipality: str, data_dir: Path) -> Path:
+    """Path of the manifest file for a municipality."""
+    return Path(data_dir) / f"{FILE_PREFIX}_{municipality}.meta.json"
+
+
+def _number(value) -> Optional[float]:
+    """JSON-friendly float (None for NaN)."""
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+def build_manifest(df: pd.DataFrame, municipality: str) -> Dict:
+    """
+    Summarize a municipality frame.
+
+    Args:
+        df: Frame indexed by a sorted DatetimeIndex
+        municipality: Name of the municipality
+
+    Returns:
+        Dictionary with rows, start, end, columns (count, mean, std, min,
+        max per numeric column) and gaps (missing hours of the hourly series)
+    """
+    index = df.index
+    columns = {}
+    for column in df.columns:
+        if column == 'datetime' or not pd.api.types.is_numeric_dtype(df[column]):
+            continue
+        values = df[column].to_numpy(dtype='float64')
+        count = int(np.count_nonzero(~np.isnan(values)))
+        columns[column] = {
+            'dtype': str(df[column].dtype),
+            'count': count,
+            'mean': _number(np.nanmean(values)) if count else None,
+            'std': _number(np.nanstd(values, ddof=1)) if count > 1 else None,
+            'min': _number(np.nanmin(values)) if count else None,
+            'max': _number(np.nanmax(values)) if count else None,
+        }
+
+    gaps = {'expected_rows': len(df), 'missing_hours': 0, 'gap_count': 0, 'largest_gap_hours': 0}
+    if len(df) > 1:
+        steps = np.diff(index.asi8) // pd.Timedelta(hours=1).value
+        missing = steps[steps > 1] - 1
+        gaps = {
+            'expected_rows': int(steps.sum()) + 1,
+            'missing_hours': int(missing.sum()),
+            'gap_count': int(len(missing)),
+            'largest_gap_hours': int(missing.max()) if len(missing) else 0,
+        }
+
+    return {
+        'municipality': municipality,
+        'rows': len(df),
+        'start': str(index[0]) if len(df) else None,
+        'end': str(index[-1]) if len(df) else None,
+        'columns': columns,
+        'gaps': gaps,
+    }
+
+
+def read_manifest(path: Path, source: Path, signature: Tuple[int, int]) -> Optional[Dict]:
+    """
+    Read a manifest if it describes the given version of a data file.
+
+    Args:
+        path: Manifest file
+        source: Data file the manifest must describe
+        signature: Current signature of that file (see storage.file_signature)
+
+    Returns:
+        The manifest or None if missing, unreadable or stale
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if stored.get('source') != Path(source).name or stored.get('signature') != list(signature):
+        return None
+    return stored.get('manifest')
+
+
+def write_manifest(path: Path, manifest: Dict, source: Path, signature: Tuple[int, int]):
+    """Atomically write a manifest tagged with the data file version it describes."""
+    path = Path(path)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'source': Path(source).name, 'signature': list(signature), 'manifest': manifest},
+                  f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
@@ -2,37 +2,157 @@
 Municipality Agent - Code-enabled agent for municipality-specific queries
 """
 
+import threading
 import traceback
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional
 from colorama import Fore, Style
 
-from .safe_repl import SafePythonREPL
+from .analytics import describe_helpers
+from .config import LOCAL_FORMATTER
+from .formatter import format_result_locally
+from .linter import PerformanceLinter
+from .safe_repl import SafePythonREPL, format_result
 from .security import SecurityValidator
 
 
+# Descriptions used to document the DataFrame columns in the prompt
+COLUMN_DESCRIPTIONS = {
+    'datetime': 'fecha y hora (pandas datetime)',
+    'wind_speed_10m': 'velocidad del viento a 10m (m/s)',
+    'wind_direction_10m': 'dirección del viento (grados)',
+    'temperature_2m': 'temperatura a 2m (°C)',
+    'relative_humidity_2m': 'humedad relativa (%)',
+    'precipitation': 'precipitación (mm)',
+    'hour': 'hora del día (0-23)',
+    'date': 'fecha',
+}
+
+DTYPE_NAMES = {'float64': 'float', 'int64': 'int', 'object': 'string'}
+
+
+def describe_columns(df, municipality: str) -> str:
+    """
+    Build the column documentation of a municipality DataFrame for the prompt.
+    
+    Args:
+        df: Municipality DataFrame
+        municipality: Name of the municipality
+        
+    Returns:
+        One line per column, plus hints for columns derived from the index
+    """
+    lines = []
+    for column in df.columns:
+        dtype = str(df[column].dtype)
+        if column == 'municipio':
+            lines.append(f'- municipio: siempre "{municipality}" - string')
+        elif column == 'datetime':
+            lines.append(f"- datetime: {COLUMN_DESCRIPTIONS['datetime']}")
+        else:
+            description = COLUMN_DESCRIPTIONS.get(column, column)
+            lines.append(f"- {column}: {description} - {DTYPE_NAMES.get(dtype, dtype)}")
+    
+    if 'hour' not in df.columns:
+        lines.append("- hora del día (0-23): NO es columna, usa df.index.hour (el índice es un DatetimeIndex)")
+    if 'date' not in df.columns:
+        lines.append("- fecha: NO es columna, usa df.index.date o df.index.normalize()")
+    if any(str(dtype).startswith('uint') for dtype in df.dtypes):
+        lines.append("- Las columnas uint son enteros sin signo: usa .astype(float) antes de restar")
+    
+    return "\n".join(lines)
+
+
 class CodeMunicipalityAgent:
     """Municipality agent with Python code execution capability."""
     
-    def __init__(self, municipality: str, llm, data_manager):
+    def __init__(self, municipality: str, llm, data_manager,
+                 python_repl: Optional[SafePythonREPL] = None,
+                 security_validator: Optional[SecurityValidator] = None,
+                 performance_linter: Optional[PerformanceLinter] = None,
+                 format_locally: Optional[bool] = None):
         """
         Initialize Municipality Agent.
         
+        The agent is only per-municipality configuration: code runs on the
+        given REPL, validator and linter, which CodeMultiAgentSystem shares
+        between all agents. Standalone agents create their own.
+        
         Args:
             municipality: Name of the municipality
             llm: Language model instance
             data_manager: DataManager instance
+            python_repl: Shared execution service
+            security_validator: Shared code validator
+            performance_linter: Shared checker of slow pandas idioms
+            format_locally: Answer simple results with local templates instead
+                of a second LLM call (defaults to LOCAL_FORMATTER)
         """
         self.municipality = municipality
         self.llm = llm
         self.data_manager = data_manager
-        self.python_repl = SafePythonREPL(data_manager)
-        self.security_validator = SecurityValidator(verbose=False)
+        self.python_repl = python_repl if python_repl is not None else SafePythonREPL(data_manager)
+        self.security_validator = (security_validator if security_validator is not None
+                                   else SecurityValidator(verbose=False))
+        self.performance_linter = (performance_linter if performance_linter is not None
+                                   else PerformanceLinter(data_manager))
+        self.format_locally = LOCAL_FORMATTER if format_locally is None else format_locally
+        
+    def _generate_code(self, prompt: str) -> str:
+        """Ask the LLM for code and strip markdown code fences."""
+        code = self.llm.invoke(prompt).content.strip()
+        
+        # Remove markdown code blocks if present
+        if code.startswith("```python"):
+            code = code.split("```python", 1)[1]
+        if code.startswith("```"):
+            code = code.split("```", 1)[1]
+        if "```" in code:
+            code = code.split("```")[0]
+        return code.strip()
+    
+    def _optimize_code(self, prompt: str, code: str) -> str:
+        """
+        Rewrite or regenerate code the performance linter considers slow.
+        
+        Trivial cases are rewritten in place; if the estimated cost is still
+        above the linter budget, the LLM is asked once for a vectorized
+        version, which is kept only if it is safe and estimated faster.
+        
+        Args:
+            prompt: Prompt the code was generated from
+            code: Sanitized generated code
+            
+        Returns:
+            Code to execute
+        """
+        linter = self.performance_linter
+        code, rewrites = linter.rewrite(code)
+        for rewrite in rewrites:
+            print(f"{Fore.GREEN}⚡ Línea {rewrite['line']}: {rewrite['message']}{Style.RESET_ALL}")
+        
+        findings = linter.lint(code)
+        if not linter.too_slow(findings):
+            return code
+        
+        print(f"{Fore.YELLOW}🐢 Código lento (~{linter.cost(findings):.1f} s estimados), "
+              f"solicitando una versión vectorizada{Style.RESET_ALL}")
+        regenerated = self.security_validator.sanitize_code(
+            self._generate_code(prompt + "\n" + linter.regeneration_request(code, findings)))
+        if not regenerated:
+            return code
+        regenerated, _ = linter.rewrite(regenerated)
+        if linter.cost(linter.lint(regenerated)) < linter.cost(findings):
+            return regenerated
+        return code
         
-    def answer(self, query: str) -> str:
+    def answer(self, query: str, compare_with: Optional[List[str]] = None) -> str:
         """
         Answer query using Python code generation and execution.
         
         Args:
             query: User's question
+            compare_with: Other municipalities involved in a comparison; the
+                generated code then works on the shared panel in one pass
             
         Returns:
             Formatted response string
@@ -43,26 +163,56 @@ class CodeMunicipalityAgent:
         if df is None:
             return f"No hay datos disponibles para {municipality_display}."
         
+        metadata = self.data_manager.get_metadata(self.municipality)
+        helpers = "\n".join(describe_helpers(self.municipality))
+        analysis_display = municipality_display
+        comparison_section = ""
+        if compare_with:
+            compared = [self.municipality] + [m for m in compare_with if m != self.municipality]
+            analysis_display = ", ".join(m.replace("_", " ").title() for m in compared)
+            comparison_section = f"""
+COMPARACIÓN entre municipios: {compared}
+Usa el DataFrame PRE-CARGADO 'df_panel' con TODOS los municipios en formato largo:
+- Índice: MultiIndex (municipio, datetime); columnas: {', '.join(self.data_manager.get_panel().columns)}
+- Compara con UNA sola operación vectorizada, NO con bucles ni pd.concat. Ejemplo:
+  df_panel.loc[{compared}].groupby(level='municipio')['wind_speed_10m'].mean()
+- wide('wind_speed_10m') devuelve una matriz tiempo x municipio si necesitas correlaciones o diferencias por hora
+- stats_all() devuelve una tabla PRE-CALCULADA (un municipio por fila) con records, wind_speed_avg, wind_speed_max, wind_speed_min, wind_speed_std, temperature_avg, humidity_avg, precipitation_total, start, end; úsala para promedios/extremos globales:
+  stats_all().loc[{compared}, 'wind_speed_avg'].sort_values(ascending=False)
+"""
+        
         # Create prompt for code generation
-        prompt = f"""Eres un experto analista de datos para {municipality_display}, La Guajira.
-
+        prompt = f"""Eres un experto analista de datos para {analysis_display}, La Guajira.
+{comparison_section}
 IMPORTANTE: Tienes un DataFrame PRE-CARGADO llamado 'df_{self.municipality}' que contiene ÚNICAMENTE datos de {municipality_display}.
 NO necesitas importar pandas, NO necesitas filtrar por municipio - el DataFrame ya contiene solo datos de {municipality_display}.
 
 El DataFrame 'df_{self.municipality}' tiene las siguientes columnas:
-- datetime: fecha y hora (pandas datetime)
-- wind_speed_10m: velocidad del viento a 10m (m/s) - float
-- wind_direction_10m: dirección del viento (grados) - float
-- temperature_2m: temperatura a 2m (°C) - float
-- relative_humidity_2m: humedad relativa (%) - float
-- precipitation: precipitación (mm) - float
-- hour: hora del día (0-23) - int
-- date: fecha - string
-- municipio: siempre "{self.municipality}" - string
+{describe_columns(df, self.municipality)}
+
+El índice de df_{self.municipality} es un DatetimeIndex ordenado. Para filtrar por fechas NO uses máscaras booleanas sobre 'datetime':
+- get_range('{self.municipality}', '2024-01-01', '2024-03-31') devuelve las filas del rango (ambos extremos incluidos)
+- get_range('{self.municipality}', '2024-03', '2024-03', columns='wind_speed_10m') devuelve solo esa columna de marzo 2024
+- df_{self.municipality}.loc['2024-01':'2024-03'] también usa el índice temporal
+
+Para promedios, máximos, mínimos, conteos o desviaciones por periodo usa los agregados PRE-CALCULADOS (instantáneos) en lugar de groupby:
+- rollup('{self.municipality}', dimension, variable, stat) devuelve una Serie indexada por periodo
+- dimension: 'day', 'month' (mes calendario, ej. 2024-03), 'year', 'month_of_year' (1-12), 'hour' (0-23), 'month_hour' (mes 1-12 x hora)
+- stat: 'mean', 'min', 'max', 'std', 'var', 'sum', 'count'
+- Ejemplo: rollup('{self.municipality}', 'month_of_year', 'wind_speed_10m', 'mean').idxmax() es el mes más ventoso
+
+Para los análisis de viento habituales usa las funciones PRE-CARGADAS (vectorizadas, una sola línea) en lugar de escribir pandas:
+{helpers}
+- Ejemplo: print(wind_rose('{self.municipality}')['total'].idxmax()) es la dirección predominante
+
+Para preguntas sobre datos faltantes, cobertura o calidad NO busques huecos con diff() ni recorras las filas:
+- coverage('{self.municipality}', '2024-03', '2024-03') devuelve un dict con expected_hours, present_hours, missing_hours, coverage_pct, out_of_range_hours, duplicate_hours y forecast_hours (filas de pronóstico aún no confirmadas por el archivo histórico)
+- quality('{self.municipality}').missing_hours('2024-01', '2024-12') lista las horas faltantes
 
 Datos disponibles:
-- Total de registros: {len(df):,}
-- Rango de fechas: {df['datetime'].min()} a {df['datetime'].max()}
+- Total de registros: {metadata['rows']:,}
+- Rango de fechas: {metadata['start']} a {metadata['end']}
+- Horas faltantes en la serie: {metadata['gaps']['missing_hours']:,} ({metadata['gaps']['gap_count']} huecos)
 - Todos los registros son de {municipality_display}
 
 Tu tarea:
@@ -103,16 +253,7 @@ Genera SOLO el código Python (sin imports, sin explicaciones, solo el código e
 
         try:
             # Generate code
-            code = self.llm.invoke(prompt).content.strip()
-            
-            # Remove markdown code blocks if present
-            if code.startswith("```python"):
-                code = code.split("```python", 1)[1]
-            if code.startswith("```"):
-                code = code.split("```", 1)[1]
-            if "```" in code:
-                code = code.split("```")[0]
-            code = code.strip()
+            code = self._generate_code(prompt)
             
             # Sanitize code for security
             sanitized_code = self.security_validator.sanitize_code(code)
@@ -120,14 +261,24 @@ Genera SOLO el código Python (sin imports, sin explicaciones, solo el código e
             if not sanitized_code:
                 return f"⚠️ El código generado contiene operaciones no permitidas por seguridad. Por favor, reformula tu pregunta de manera más específica sobre {municipality_display}."
             
+            # Vectorize slow row-wise code before running it
+            sanitized_code = self._optimize_code(prompt, sanitized_code)
+            
             # Execute code
             print(f"{Fore.CYAN}🐍 Ejecutando código:{Style.RESET_ALL}")
             print(f"{Fore.YELLOW}{sanitized_code}{Style.RESET_ALL}\n")
             
-            result = self.python_repl.run(sanitized_code)
+            execution = self.python_repl.execute(sanitized_code, tags={'municipality': self.municipality, 'query': query})
+            
+            # Labeled numbers and short tables need no second LLM call
+            if self.format_locally:
+                local_response = format_result_locally(execution, analysis_display, query)
+                if local_response is not None:
+                    return local_response
+            result = format_result(execution)
             
             # Format result conversationally
-            format_prompt = f"""Basado en estos resultados de análisis de datos para {municipality_display}:
+            format_prompt = f"""Basado en estos resultados de análisis de datos para {analysis_display}:
 
 {result}
 
@@ -149,3 +300,45 @@ Respuesta conversacional:"""
             error_trace = traceback.format_exc()
             return f"Error al analizar datos de {municipality_display}: {str(e)}\n\nDetalles técnicos:\n{error_trace}"
 
+
+
+class MunicipalityAgents(Mapping):
+    """Read-only mapping of municipality agents, each created on first use."""
+    
+    def __init__(self, municipalities: Iterable[str], factory: Callable[[str], CodeMunicipalityAgent]):
+        """
+        Initialize the mapping without creating any agent.
+        
+        Args:
+            municipalities: Names of the available municipalities
+            factory: Builds the agent of one municipality
+        """
+        self._municipalities = list(dict.fromkeys(municipalities))
+        self._known = set(self._municipalities)
+        self._factory = factory
+        self._agents: Dict[str, CodeMunicipalityAgent] = {}
+        self._lock = threading.Lock()
+    
+    def __getitem__(self, municipality: str) -> CodeMunicipalityAgent:
+        if municipality not in self._known:
+            raise KeyError(municipality)
+        with self._lock:
+            agent = self._agents.get(municipality)
+            if agent is None:
+                agent = self._agents[municipality] = self._factory(municipality)
+            return agent
+    
+    def __contains__(self, municipality) -> bool:
+        # Membership must not build the agent
+        return municipality in self._known
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._municipalities)
+    
+    def __len__(self) -> int:
+        return len(self._municipalities)
+    
+    @property
+    def created(self) -> List[str]:
+        """Municipalities whose agent has been created so far."""
+        return list(self._agents)
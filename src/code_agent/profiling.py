@@ -0,0 +1,262 @@
+"""
+Profiling - Per-execution instrumentation of the REPL
+
+When profiling is enabled, SafePythonREPL measures every execution with a
+ProfileSession: wall and CPU time of the executing thread, peak memory traced
+by tracemalloc, and the hot lines of the snippet, found by a sampling thread
+that looks at the snippet frame every few milliseconds and charges the
+elapsed time to the line being run (calls into pandas included).
+
+The REPL adds output bytes, artifacts and status, tags the record with the
+municipality and a fingerprint of the user query (numbers, accents and
+municipality names normalized away, so "viento en mayo 2024 en Maicao" and
+"viento en junio 2023 en Riohacha" share a class) and appends it to a JSON
+lines file. Summary of the most expensive query classes:
+
+    python -m src.code_agent.profiling [data/state/repl_profile.jsonl]
+
+Samples are taken in the process running the snippet, so the measurements
+are exact on every backend. tracemalloc traces the whole process: with the
+'thread' backend the peak of concurrent executions may include each other.
+"""
+
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import unicodedata
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+from .code_cache import CODE_FILENAME
+from .config import MUNICIPALITIES, REPL_PROFILE_PATH
+
+# Municipality names as users write them (after normalize_query)
+_MUNICIPALITY_PATTERN = re.compile(
+    r"\b(" + "|".join(sorted((m.replace("_", " ") for m in MUNICIPALITIES), key=len, reverse=True)) + r")\b"
+)
+
+# tracemalloc is process-wide: started by the first active session, stopped
+# by the last one (unless something else started it)
+_tracing_lock = threading.Lock()
+_tracing_sessions = 0
+_tracing_owned = False
+
+
+def normalize_query(query: str) -> str:
+    """
+    Reduce a user query to its class.
+
+    Lowercases, strips accents and punctuation, and replaces numbers with
+    '#' and municipality names with '<municipio>'.
+    """
+    text = unicodedata.normalize('NFKD', query.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r"[_\W]+", " ", text)
+    text = _MUNICIPALITY_PATTERN.sub("<municipio>", text)
+    text = re.sub(r"\d+", "#", text)
+    return " ".join(text.split())
+
+
+def query_fingerprint(query: str) -> str:
+    """Short hash of the class of a user query (see normalize_query)."""
+    return hashlib.sha256(normalize_query(query).encode()).hexdigest()[:12]
+
+
+def _start_tracing():
+    global _tracing_sessions, _tracing_owned
+    with _tracing_lock:
+        if _tracing_sessions == 0:
+            _tracing_owned = not tracemalloc.is_tracing()
+            if _tracing_owned:
+                tracemalloc.start()
+            else:
+                tracemalloc.reset_peak()
+        _tracing_sessions += 1
+        return tracemalloc.get_traced_memory()[0]
+
+
+def _stop_tracing(baseline: int) -> int:
+    global _tracing_sessions
+    with _tracing_lock:
+        peak = max(tracemalloc.get_traced_memory()[1] - baseline, 0)
+        _tracing_sessions -= 1
+        if _tracing_sessions == 0 and _tracing_owned:
+            tracemalloc.stop()
+        return peak
+
+
+def after_fork():
+    """
+    Reset the tracing refcount in a forked child (e.g. a REPL worker).
+
+    Sessions running in other parent threads do not exist in the child, and
+    their lock may have been held at fork time.
+    """
+    global _tracing_lock, _tracing_sessions, _tracing_owned
+    _tracing_lock = threading.Lock()
+    if _tracing_sessions and _tracing_owned:
+        tracemalloc.stop()
+    _tracing_sessions = 0
+    _tracing_owned = False
+
+
+class ProfileSession:
+    """Measurements of one execution, taken in the executing thread."""
+
+    def __init__(self, code: str, interval: float = 0.005, top: int = 5):
+        """
+        Initialize the session.
+
+        Args:
+            code: Source of the snippet (to show the hot lines)
+            interval: Seconds between samples of the snippet frame
+            top: Hot lines reported
+        """
+        self.lines = code.splitlines()
+        self.interval = interval
+        self.top = top
+        self.line_seconds: Dict[int, float] = defaultdict(float)
+        self._done = threading.Event()
+
+    def start(self) -> "ProfileSession":
+        """Start measuring the calling thread."""
+        self._thread_id = threading.get_ident()
+        self._baseline = _start_tracing()
+        self._sampler = threading.Thread(target=self._sample, name="repl-profiler", daemon=True)
+        self._sampler.start()
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        return self
+
+    def _sample(self):
+        last = time.perf_counter()
+        while not self._done.wait(self.interval):
+            now = time.perf_counter()
+            frame = sys._current_frames().get(self._thread_id)
+            while frame is not None and frame.f_code.co_filename != CODE_FILENAME:
+                frame = frame.f_back
+            if frame is not None:
+                self.line_seconds[frame.f_lineno] += now - last
+            last = now
+
+    def stop(self) -> Dict:
+        """
+        Stop measuring.
+
+        Returns:
+            Dictionary with wall_seconds, cpu_seconds, peak_memory_bytes and
+            hot_lines (line, seconds and source of the slowest lines)
+        """
+        wall = time.perf_counter() - self._wall
+        cpu = time.thread_time() - self._cpu
+        self._done.set()
+        self._sampler.join()
+        peak = _stop_tracing(self._baseline)
+        hot = sorted(self.line_seconds.items(), key=lambda item: item[1], reverse=True)[:self.top]
+        return {
+            'wall_seconds': round(wall, 6),
+            'cpu_seconds': round(cpu, 6),
+            'peak_memory_bytes': peak,
+            'hot_lines': [
+                {
+                    'line': line,
+                    'seconds': round(seconds, 4),
+                    'code': self.lines[line - 1].strip() if 0 < line <= len(self.lines) else "",
+                }
+                for line, seconds in hot
+            ],
+        }
+
+
+class ProfileLog:
+    """Append-only JSON lines file of execution records."""
+
+    def __init__(self, path: Path = REPL_PROFILE_PATH):
+        """
+        Initialize the log.
+
+        Args:
+            path: File the records are appended to (created on first write)
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def after_fork(self):
+        """Replace the lock in a forked child, where another thread may have held it."""
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict):
+        """Append one record."""
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def read(self) -> List[Dict]:
+        """All records written so far (unreadable lines are skipped)."""
+        records = []
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        return records
+
+
+def expensive_queries(records: List[Dict], top: int = 10) -> List[Dict]:
+    """
+    Aggregate execution records per query class.
+
+    Args:
+        records: Records of a ProfileLog
+        top: Classes returned
+
+    Returns:
+        Classes sorted by total wall time, each with query_fingerprint,
+        query_class, executions, total/mean/max wall seconds, max peak memory
+        and the municipalities it was asked for
+    """
+    classes: Dict[str, Dict] = {}
+    for record in records:
+        if record.get('cached') or 'wall_seconds' not in record:
+            continue
+        entry = classes.setdefault(record.get('query_fingerprint'), {
+            'query_fingerprint': record.get('query_fingerprint'),
+            'query_class': record.get('query_class'),
+            'executions': 0,
+            'total_wall_seconds': 0.0,
+            'max_wall_seconds': 0.0,
+            'max_peak_memory_bytes': 0,
+            'municipalities': set(),
+        })
+        entry['executions'] += 1
+        entry['total_wall_seconds'] += record['wall_seconds']
+        entry['max_wall_seconds'] = max(entry['max_wall_seconds'], record['wall_seconds'])
+        entry['max_peak_memory_bytes'] = max(entry['max_peak_memory_bytes'], record.get('peak_memory_bytes', 0))
+        if record.get('municipality'):
+            entry['municipalities'].add(record['municipality'])
+
+    ranked = sorted(classes.values(), key=lambda entry: entry['total_wall_seconds'], reverse=True)[:top]
+    for entry in ranked:
+        entry['mean_wall_seconds'] = round(entry['total_wall_seconds'] / entry['executions'], 6)
+        entry['total_wall_seconds'] = round(entry['total_wall_seconds'], 6)
+        entry['municipalities'] = sorted(entry['municipalities'])
+    return ranked
+
+
+if __name__ == "__main__":
+    log = ProfileLog(Path(sys.argv[1]) if len(sys.argv) > 1 else REPL_PROFILE_PATH)
+    for entry in expensive_queries(log.read()):
+        print(f"{entry['total_wall_seconds']:9.3f} s  {entry['executions']:5d} ejecuciones  "
+              f"máx {entry['max_wall_seconds']:.3f} s  {entry['max_peak_memory_bytes'] / 2**20:8.1f} MB  "
+              f"{entry['query_class']}")
@@ -0,0 +1,220 @@
+"""
+Quality - Data gap and quality index per municipality
+
+The index lays the series on its hourly grid (first to last timestamp) and
+keeps one flag per hour: missing, out of physical range (or null), duplicated
+in the source file and forecast-sourced (newer than the last archive row
+merged by the ingestion service). Prefix sums over each flag, kept every
+QUALITY_BLOCK hours, answer "how many hours of this range are missing /
+suspicious" in constant time for any bucket: the count up to any hour is the
+stored sum of its block plus at most one block of flags. The index takes
+about 4 bytes per hour.
+
+The ingestion service records the provenance in STATE_DIR/provenance.json:
+
+    {"riohacha": {"archive_until": "2025-11-05 23:00:00"}, ...}
+"""
+
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Optional
+
+
+PROVENANCE_FILE = "provenance.json"
+
+# Physically plausible range of each measure (units as stored by Open-Meteo)
+VALID_RANGES = {
+    'wind_speed_10m': (0.0, 200.0),
+    'wind_direction_10m': (0.0, 360.0),
+    'temperature_2m': (-10.0, 50.0),
+    'relative_humidity_2m': (0.0, 100.0),
+    'precipitation': (0.0, 300.0),
+}
+
+FLAGS = ('missing', 'out_of_range', 'duplicate', 'forecast')
+
+HOUR = pd.Timedelta(hours=1)
+
+# Hours between stored prefix sums (see QualityIndex._prefix_at)
+QUALITY_BLOCK = 64
+
+
+def read_provenance(state_dir: Path) -> Dict[str, pd.Timestamp]:
+    """
+    Read the last archive timestamp per municipality.
+
+    Args:
+        state_dir: Directory of the ingestion service state
+
+    Returns:
+        Dictionary mapping municipalities to their archive_until timestamp
+        (empty if the service has not recorded provenance)
+    """
+    try:
+        with open(Path(state_dir) / PROVENANCE_FILE, encoding='utf-8') as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {
+        municipality: pd.Timestamp(entry['archive_until'])
+        for municipality, entry in stored.items()
+        if entry.get('archive_until')
+    }
+
+
+class QualityIndex:
+    """Hourly missing/out-of-range/duplicate/forecast flags of one municipality."""
+
+    def __init__(self, df: pd.DataFrame, duplicates: Optional[pd.DatetimeIndex] = None,
+                 archive_until: Optional[pd.Timestamp] = None):
+        """
+        Build the index from a frame indexed by a sorted DatetimeIndex.
+
+        Args:
+            df: Municipality frame (see DataManager)
+            duplicates: Timestamps that appeared more than once in the source
+            archive_until: Last archive timestamp; later rows are forecast
+                (provenance unknown if None)
+        """
+        index = df.index
+        self.start: Optional[pd.Timestamp] = index[0] if len(index) else None
+        self.end: Optional[pd.Timestamp] = index[-1] if len(index) else None
+        self.archive_until = archive_until
+        self.hours = int((self.end - self.start) // HOUR) + 1 if len(index) else 0
+
+        slots = self._slots(index)
+        on_grid = (index.asi8 - self.start.value) % HOUR.value == 0 if len(index) else np.array([], bool)
+
+        present = np.zeros(self.hours, dtype=bool)
+        present[slots[on_grid]] = True
+
+        invalid = np.zeros(len(df), dtype=bool)
+        self.out_of_range_rows: Dict[str, int] = {}
+        for column, (low, high) in VALID_RANGES.items():
+            if column not in df.columns:
+                continue
+            values = df[column].to_numpy(dtype='float64')
+            bad = np.isnan(values) | (values < low) | (values > high)
+            self.out_of_range_rows[column] = int(bad.sum())
+            invalid |= bad
+        out_of_range = np.zeros(self.hours, dtype=bool)
+        out_of_range[slots[on_grid & invalid]] = True
+
+        duplicate = np.zeros(self.hours, dtype=bool)
+        if duplicates is not None and len(duplicates) and self.hours:
+            duplicate_slots = self._slots(pd.DatetimeIndex(duplicates))
+            duplicate[duplicate_slots[(duplicate_slots >= 0) & (duplicate_slots < self.hours)]] = True
+
+        forecast = np.zeros(self.hours, dtype=bool)
+        if archive_until is not None and self.hours:
+            first_forecast = max(int((archive_until - self.start) // HOUR) + 1, 0)
+            forecast[first_forecast:] = present[first_forecast:]
+
+        self.missing = ~present
+        self._flags = dict(zip(FLAGS, (self.missing, out_of_range, duplicate, forecast)))
+        # Flags before every QUALITY_BLOCK-th hour
+        self._blocks = {
+            name: np.concatenate(([0], np.cumsum(flags, dtype=np.int32)))[::QUALITY_BLOCK].copy()
+            for name, flags in self._flags.items()
+        }
+        # The index is shared by every caller (see DataManager.get_quality)
+        for array in (*self._flags.values(), *self._blocks.values()):
+            array.flags.writeable = False
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the flag and prefix arrays."""
+        return sum(array.nbytes for array in (*self._flags.values(), *self._blocks.values()))
+
+    def _prefix_at(self, flag: str, position: int) -> int:
+        """Number of flagged hours before a grid slot position."""
+        block, offset = divmod(position, QUALITY_BLOCK)
+        start = position - offset
+        return int(self._blocks[flag][block]) + int(np.count_nonzero(self._flags[flag][start:position]))
+
+    def _slots(self, timestamps: pd.DatetimeIndex) -> np.ndarray:
+        """Hour offsets of timestamps from the start of the grid."""
+        if self.start is None:
+            return np.array([], dtype=np.int64)
+        return (timestamps.asi8 - self.start.value) // HOUR.value
+
+    def _bounds(self, start, end):
+        """
+        Clip a [start, end] range to grid slot positions [lo, hi).
+
+        Strings are resolved like partial-string indexing, so '2024-03' as
+        end includes the whole month (same as DataManager.get_range).
+        """
+        if self.start is None:
+            return 0, 0
+        if isinstance(start, str):
+            start = pd.Period(start).start_time
+        if isinstance(end, str):
+            end = pd.Period(end).end_time
+        lo = 0 if start is None else int(np.ceil((pd.Timestamp(start) - self.start) / HOUR))
+        hi = self.hours if end is None else int((pd.Timestamp(end) - self.start) // HOUR) + 1
+        lo, hi = max(lo, 0), min(hi, self.hours)
+        return lo, max(lo, hi)
+
+    def count(self, flag: str, start=None, end=None) -> int:
+        """
+        Number of hours with a flag in a range, in constant time.
+
+        Args:
+            flag: One of FLAGS
+            start: First instant (inclusive; series start if None)
+            end: Last instant (inclusive; series end if None)
+
+        Returns:
+            Number of flagged hours
+        """
+        if flag not in self._flags:
+            raise ValueError(f"Indicador inválido '{flag}'. Opciones: {', '.join(FLAGS)}")
+        lo, hi = self._bounds(start, end)
+        return self._prefix_at(flag, hi) - self._prefix_at(flag, lo)
+
+    def coverage(self, start=None, end=None) -> Dict:
+        """
+        Coverage and quality counts of a time range, in constant time.
+
+        Args:
+            start: First instant (inclusive; series start if None)
+            end: Last instant (inclusive; series end if None)
+
+        Returns:
+            Dictionary with expected, present and missing hours, coverage
+            percentage and out_of_range, duplicate and forecast hours
+        """
+        lo, hi = self._bounds(start, end)
+        expected = hi - lo
+        counts = {flag: self._prefix_at(flag, hi) - self._prefix_at(flag, lo) for flag in FLAGS}
+        present = expected - counts['missing']
+        return {
+            'expected_hours': expected,
+            'present_hours': present,
+            'missing_hours': counts['missing'],
+            'coverage_pct': round(100.0 * present / expected, 2) if expected else 0.0,
+            'out_of_range_hours': counts['out_of_range'],
+            'duplicate_hours': counts['duplicate'],
+            'forecast_hours': counts['forecast'],
+            'provenance_known': self.archive_until is not None,
+        }
+
+    def missing_hours(self, start=None, end=None) -> pd.DatetimeIndex:
+        """
+        Timestamps of the missing hours in a range.
+
+        Args:
+            start: First instant (inclusive; series start if None)
+            end: Last instant (inclusive; series end if None)
+
+        Returns:
+            DatetimeIndex of the hours absent from the series
+        """
+        lo, hi = self._bounds(start, end)
+        if self.count('missing', start, end) == 0:
+            return pd.DatetimeIndex([])
+        positions = np.flatnonzero(self.missing[lo:hi]) + lo
+        return pd.DatetimeIndex(self.start.value + positions * HOUR.value)
@@ -0,0 +1,209 @@
+"""
+Rollups - Materialized aggregate cube per municipality
+
+The cube keeps count, sum, min, max and sum of squares of every measure for
+each time bucket, so averages, extremes and standard deviations per day,
+month, year or hour of day are answered without touching the raw rows.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+
+# Measures aggregated in the cube
+MEASURE_COLUMNS = [
+    'wind_speed_10m',
+    'wind_direction_10m',
+    'temperature_2m',
+    'relative_humidity_2m',
+    'precipitation',
+]
+
+# Time buckets: calendar day, calendar month, year, month of year (1-12),
+# hour of day (0-23) and month of year x hour of day
+DIMENSIONS = ('day', 'month', 'year', 'month_of_year', 'hour', 'month_hour')
+
+# Stored measures per variable
+AGGREGATES = ('count', 'sum', 'min', 'max', 'sumsq')
+
+# Statistics that can be queried
+STATISTICS = ('count', 'sum', 'min', 'max', 'mean', 'var', 'std')
+
+
+# An aggregate table maps each aggregate name to a (bucket x variable) frame
+AggregateTable = Dict[str, pd.DataFrame]
+
+
+def _aggregate(values: pd.DataFrame, keys) -> AggregateTable:
+    """Group raw values by keys into an aggregate table."""
+    grouped = values.groupby(keys, sort=True)
+    return {
+        'count': grouped.count().astype('float64'),
+        'sum': grouped.sum(),
+        'min': grouped.min(),
+        'max': grouped.max(),
+        'sumsq': (values ** 2).groupby(keys, sort=True).sum(),
+    }
+
+
+def _reaggregate(table: AggregateTable, keys) -> AggregateTable:
+    """Roll an aggregate table up to coarser keys."""
+    result = {}
+    for aggregate, frame in table.items():
+        grouped = frame.groupby(keys, sort=True)
+        if aggregate == 'min':
+            result[aggregate] = grouped.min()
+        elif aggregate == 'max':
+            result[aggregate] = grouped.max()
+        else:
+            result[aggregate] = grouped.sum()
+    return result
+
+
+def _merge(left: AggregateTable, right: AggregateTable) -> AggregateTable:
+    """Combine two aggregate tables over the union of their buckets."""
+    index = left['count'].index.union(right['count'].index)
+    merged = {}
+    for aggregate in AGGREGATES:
+        a = left[aggregate].reindex(index)
+        b = right[aggregate].reindex(index)
+        if aggregate == 'min':
+            merged[aggregate] = np.fmin(a, b)
+        elif aggregate == 'max':
+            merged[aggregate] = np.fmax(a, b)
+        else:
+            merged[aggregate] = a.fillna(0) + b.fillna(0)
+    return merged
+
+
+class RollupCube:
+    """Count/sum/min/max/sum-of-squares cube of one municipality."""
+
+    def __init__(self, df: pd.DataFrame):
+        """
+        Build the cube from a frame indexed by a DatetimeIndex.
+
+        Args:
+            df: Municipality frame (see DataManager)
+        """
+        self.variables: List[str] = [c for c in MEASURE_COLUMNS if c in df.columns]
+        self.tables: Dict[str, AggregateTable] = {}
+        self.last_timestamp: Optional[pd.Timestamp] = None
+        self._day, self._month_hour = self._base_tables(df)
+        self._derive()
+        self._update_last_timestamp(df)
+
+    @classmethod
+    def from_base_tables(cls, variables: List[str], day: AggregateTable, month_hour: AggregateTable,
+                         last_timestamp: Optional[pd.Timestamp] = None) -> "RollupCube":
+        """
+        Rebuild a cube from its base tables (see base_tables).
+
+        Args:
+            variables: Measure columns of the tables
+            day: Aggregate table per calendar day
+            month_hour: Aggregate table per month of year x hour of day
+            last_timestamp: Timestamp of the last row folded into the cube
+
+        Returns:
+            Cube with the coarser dimensions derived again
+        """
+        cube = cls.__new__(cls)
+        cube.variables = list(variables)
+        cube.last_timestamp = last_timestamp
+        cube._day, cube._month_hour = day, month_hour
+        cube._derive()
+        return cube
+
+    def base_tables(self) -> Tuple[AggregateTable, AggregateTable]:
+        """The day and month x hour tables every other dimension derives from."""
+        return self._day, self._month_hour
+
+    def _base_tables(self, df: pd.DataFrame) -> Tuple[AggregateTable, AggregateTable]:
+        """Aggregate raw rows into the day and month x hour tables."""
+        values = df[self.variables].astype('float64')
+        index = df.index
+        day = _aggregate(values, index.normalize().rename('day'))
+        month_hour = _aggregate(values, [index.month.rename('month'), index.hour.rename('hour')])
+        return day, month_hour
+
+    def _derive(self):
+        """Derive the coarser dimensions from the base tables."""
+        days = self._day['count'].index
+        hours = self._month_hour['count'].index.get_level_values('hour')
+        self.tables = {
+            'day': self._day,
+            'month': _reaggregate(self._day, days.to_period('M').rename('month')),
+            'year': _reaggregate(self._day, days.year.rename('year')),
+            'month_of_year': _reaggregate(self._day, days.month.rename('month')),
+            'hour': _reaggregate(self._month_hour, hours),
+            'month_hour': self._month_hour,
+        }
+        self._queries: Dict[Tuple[str, str, str], pd.Series] = {}
+
+    def _update_last_timestamp(self, df: pd.DataFrame):
+        if len(df):
+            self.last_timestamp = df.index[-1]
+
+    def append(self, new_rows: pd.DataFrame):
+        """
+        Fold rows newer than the cube into it.
+
+        Args:
+            new_rows: Frame indexed by a DatetimeIndex whose timestamps are
+                all after last_timestamp (overwritten rows need a rebuild)
+        """
+        if new_rows.empty:
+            return
+        if self.last_timestamp is not None and new_rows.index[0] <= self.last_timestamp:
+            raise ValueError("RollupCube.append solo acepta filas posteriores al último registro")
+
+        day, month_hour = self._base_tables(new_rows)
+        self._day = _merge(self._day, day)
+        self._month_hour = _merge(self._month_hour, month_hour)
+        self._derive()
+        self._update_last_timestamp(new_rows)
+
+    def query(self, dimension: str, variable: str, stat: str = 'mean') -> pd.Series:
+        """
+        Get a statistic of a variable per bucket.
+
+        Args:
+            dimension: One of DIMENSIONS
+            variable: One of the measure columns
+            stat: One of STATISTICS (std and var use ddof=1 like pandas)
+
+        Returns:
+            Series indexed by bucket, shared by every caller (its values
+            are read-only)
+        """
+        key = (dimension, variable, stat)
+        if key in self._queries:
+            return self._queries[key]
+
+        if dimension not in self.tables:
+            raise ValueError(f"Dimensión inválida '{dimension}'. Opciones: {', '.join(DIMENSIONS)}")
+        if variable not in self.variables:
+            raise ValueError(f"Variable inválida '{variable}'. Opciones: {', '.join(self.variables)}")
+        if stat not in STATISTICS:
+            raise ValueError(f"Estadística inválida '{stat}'. Opciones: {', '.join(STATISTICS)}")
+
+        table = {aggregate: frame[variable] for aggregate, frame in self.tables[dimension].items()}
+        count = table['count']
+        if stat in ('count', 'sum', 'min', 'max'):
+            result = table[stat]
+        elif stat == 'mean':
+            result = table['sum'] / count
+        else:
+            var = (table['sumsq'] - table['sum'] ** 2 / count) / (count - 1)
+            result = var.clip(lower=0)
+            if stat == 'std':
+                result = np.sqrt(result)
+
+        # Memoized and handed to every caller: values are a read-only view
+        values = result.to_numpy().view()
+        values.flags.writeable = False
+        result = pd.Series(values, index=result.index, name=f"{variable}_{stat}", copy=False)
+        self._queries[key] = result
+        return result
@@ -2,31 +2,358 @@
 Safe Python REPL - Secure code execution environment
 """
 
+import copy
 import sys
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from pathlib import Path
-from io import StringIO
-from typing import Dict, Any
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Set, TextIO, Union
 
-from .config import OUTPUT_DIR
+from .config import (
+    OUTPUT_DIR, MUNICIPALITIES, REPL_BACKEND, REPL_WORKERS, REPL_QUEUE_SIZE,
+    REPL_CPU_SECONDS, REPL_MEMORY_MB, REPL_WALL_SECONDS, REPL_CODE_CACHE_SIZE, REPL_RESULT_CACHE_SIZE,
+    REPL_OUTPUT_MAX_CHARS, REPL_OUTPUT_STOP_CHARS, REPL_PROFILE,
+)
+from .analytics import WindAnalytics
+from .code_cache import CodeCache, scan_artifacts
+from .executors import (
+    InlineBackend, ThreadPoolBackend, ProcessPoolBackend, ExecutionLimits, ExecutionLimitExceeded,
+    execution_result,
+)
+from . import profiling
+from .profiling import ProfileLog, ProfileSession, normalize_query, query_fingerprint
+
+
+class OutputLimitReached(BaseException):
+    """
+    Raised by print() once an execution wrote more than the stop cap.
+    
+    Derives from BaseException so generated `except Exception` blocks do not
+    swallow it.
+    """
+
+
+class BoundedOutput:
+    """
+    Write-only text buffer keeping the head and tail of a long output.
+    
+    The first three quarters of max_chars are kept as written and the last
+    quarter as a rolling tail, so memory stays bounded however much a
+    snippet prints. Writing past stop_chars raises OutputLimitReached.
+    """
+    
+    def __init__(self, max_chars: int = REPL_OUTPUT_MAX_CHARS, stop_chars: int = REPL_OUTPUT_STOP_CHARS):
+        """
+        Initialize the buffer.
+        
+        Args:
+            max_chars: Characters kept (head plus tail)
+            stop_chars: Characters written after which writing raises
+                OutputLimitReached (0 never stops)
+        """
+        self.head_chars = max_chars * 3 // 4
+        self.tail_chars = max_chars - self.head_chars
+        self.stop_chars = stop_chars
+        self._head = []
+        self._head_len = 0
+        self._tail = deque()
+        self._tail_len = 0
+        self.chars = 0
+        self.bytes = 0
+        self.lines = 0
+        self.stopped = False
+    
+    def write(self, text: str) -> int:
+        """Append text, dropping what falls between the head and the tail."""
+        # Snippets catching the first stop (bare except) keep being stopped
+        if self.stopped:
+            raise OutputLimitReached()
+        written = len(text)
+        self.chars += written
+        self.bytes += len(text.encode('utf-8', 'replace'))
+        self.lines += text.count('\n')
+        
+        room = self.head_chars - self._head_len
+        if room > 0:
+            self._head.append(text[:room])
+            self._head_len += min(room, written)
+            text = text[room:]
+        if text and self.tail_chars > 0:
+            text = text[-self.tail_chars:]
+            self._tail.append(text)
+            self._tail_len += len(text)
+            while self._tail_len - len(self._tail[0]) >= self.tail_chars:
+                self._tail_len -= len(self._tail.popleft())
+        
+        if self.stop_chars and self.chars > self.stop_chars:
+            self.stopped = True
+            raise OutputLimitReached()
+        return written
+    
+    def flush(self):
+        """Nothing to flush."""
+    
+    @property
+    def truncated(self) -> bool:
+        """Whether text was dropped."""
+        return self.chars > self.head_chars + self.tail_chars
+    
+    def getvalue(self) -> str:
+        """
+        Captured output.
+        
+        Returns:
+            The whole output or, if it was too long, its head and tail around
+            a marker summarizing what was omitted
+        """
+        head = ''.join(self._head)
+        tail = ''.join(self._tail)
+        if not self.truncated:
+            return head + tail
+        tail = tail[len(tail) - self.tail_chars:] if len(tail) > self.tail_chars else tail
+        omitted = self.chars - len(head) - len(tail)
+        marker = (f"\n... [salida truncada: {self.lines:,} líneas y {self.bytes:,} bytes en total, "
+                  f"se omitieron {omitted:,} caracteres")
+        if self.stopped:
+            marker += "; ejecución detenida por exceso de salida"
+        return head + marker + "] ...\n" + tail
+
+
+# Output buffer of the execution running in the current thread (None outside)
+_execution_output: ContextVar[Optional[TextIO]] = ContextVar('repl_output', default=None)
+_stdout_lock = threading.Lock()
+
+
+class StdoutRouter:
+    """
+    sys.stdout replacement routing writes to the running execution.
+    
+    Code that writes to sys.stdout directly (DataFrame.info(), pandas and
+    NumPy printing helpers) lands in the buffer of the execution running in
+    the writing thread; writes from anywhere else go to the wrapped stream.
+    """
+    
+    def __init__(self, stream: TextIO):
+        """
+        Initialize the router.
+        
+        Args:
+            stream: Stream written to outside executions (the console)
+        """
+        self.stream = stream
+    
+    def _target(self) -> TextIO:
+        buffer = _execution_output.get()
+        return self.stream if buffer is None else buffer
+    
+    def write(self, text: str) -> int:
+        """Write to the current execution's buffer or to the stream."""
+        return self._target().write(text)
+    
+    def flush(self):
+        """Flush the current target."""
+        self._target().flush()
+    
+    def __getattr__(self, name: str):
+        return getattr(self.stream, name)
+
+
+def route_stdout():
+    """Install StdoutRouter as sys.stdout (again, if something replaced it)."""
+    with _stdout_lock:
+        if not isinstance(sys.stdout, StdoutRouter):
+            sys.stdout = StdoutRouter(sys.stdout)
+
+
+def output_print(buffer: TextIO):
+    """
+    Build a print() that writes to one execution's output buffer.
+
+    Each execution gets its own, so concurrent executions never share an
+    output stream; file= and flush= are accepted and ignored.
+    """
+    def run_print(*args, sep=' ', end='\n', file=None, flush=False):
+        print(*args, sep=sep, end=end, file=buffer)
+    return run_print
+
+
+def namespace_nbytes(namespace: Dict[str, Any], initial: Dict[str, Any]) -> int:
+    """
+    Approximate bytes held by the variables an execution created.
+
+    Args:
+        namespace: Globals of the execution after it ran
+        initial: The same globals before it ran (shared objects)
+
+    Returns:
+        Bytes of the DataFrames, Series and arrays (shallow size of other
+        objects) bound to names the execution assigned
+    """
+    total = 0
+    for name, value in namespace.items():
+        if initial.get(name) is value:
+            continue
+        if isinstance(value, pd.DataFrame):
+            total += int(value.memory_usage(index=True).sum())
+        elif isinstance(value, pd.Series):
+            total += int(value.memory_usage(index=True))
+        elif isinstance(value, np.ndarray):
+            total += value.nbytes
+        else:
+            total += sys.getsizeof(value)
+    return total
+
+
+def format_result(result: Dict) -> str:
+    """
+    Render an execution result as the text passed on to the LLM.
+
+    Args:
+        result: Result dictionary (see executors.execution_result)
+
+    Returns:
+        Captured output, a success note or the error message
+    """
+    if result['status'] != 'ok':
+        return result['error']
+    output = result['output'].strip()
+    return output if output else "Código ejecutado exitosamente (sin output)"
+
+
+def _shallow(obj):
+    """Shallow copy with its own axis objects, so renaming them stays local."""
+    if obj is None:
+        return None
+    copied = obj.copy(deep=False)
+    copied.index = obj.index.copy()
+    if isinstance(obj, pd.DataFrame):
+        copied.columns = obj.columns.copy()
+    return copied
+
+
+class ReadOnlyDataManager:
+    """
+    Read-only facade of the DataManager for generated code.
+    
+    Frames, Series and tables are shallow copies of the cached objects: the
+    arrays are the shared read-only buffers (writing values raises), while
+    adding columns, assigning or renaming an axis or sort_values(inplace=True)
+    only change the caller's copy. Manifests are deep-copied and quality indexes
+    shallow-copied. Methods that load, append or refresh data are not
+    exposed.
+    """
+    
+    def __init__(self, data_manager):
+        """
+        Initialize the facade.
+        
+        Args:
+            data_manager: DataManager being wrapped
+        """
+        self._manager = data_manager
+    
+    def get_data(self, municipality: str) -> Optional[pd.DataFrame]:
+        """Frame of a municipality (see DataManager.get_data)."""
+        return _shallow(self._manager.get_data(municipality))
+    
+    def get_range(self, municipality: str, start=None, end=None, columns=None):
+        """Rows of a municipality between two instants (see DataManager.get_range)."""
+        return _shallow(self._manager.get_range(municipality, start, end, columns))
+    
+    def get_rollup(self, municipality: str, dimension: str, variable: str,
+                   stat: str = 'mean') -> Optional[pd.Series]:
+        """Precomputed statistic per time bucket (see DataManager.get_rollup)."""
+        return _shallow(self._manager.get_rollup(municipality, dimension, variable, stat))
+    
+    def get_panel(self) -> pd.DataFrame:
+        """All municipalities as one long-format panel (see DataManager.get_panel)."""
+        return _shallow(self._manager.get_panel())
+    
+    def get_wide(self, variable: str) -> pd.DataFrame:
+        """Time x municipality matrix of a variable (see DataManager.get_wide)."""
+        return _shallow(self._manager.get_wide(variable))
+    
+    def get_statistics_all(self) -> pd.DataFrame:
+        """Summary table of every municipality (see DataManager.get_statistics_all)."""
+        return _shallow(self._manager.get_statistics_all())
+    
+    def get_all_data(self) -> Dict[str, pd.DataFrame]:
+        """Resident frames by municipality (see DataManager.get_all_data)."""
+        return {municipality: _shallow(df) for municipality, df in self._manager.get_all_data().items()}
+    
+    def get_statistics(self, municipality: str) -> Dict:
+        """Statistical summary of a municipality (see DataManager.get_statistics)."""
+        return self._manager.get_statistics(municipality)
+    
+    def get_metadata(self, municipality: str) -> Optional[Dict]:
+        """Metadata manifest of a municipality (see DataManager.get_metadata)."""
+        return copy.deepcopy(self._manager.get_metadata(municipality))
+    
+    def get_quality(self, municipality: str):
+        """Data quality index of a municipality (see DataManager.get_quality)."""
+        return copy.copy(self._manager.get_quality(municipality))
+    
+    def get_coverage(self, municipality: str, start=None, end=None) -> Dict:
+        """Coverage of a municipality over a time range (see DataManager.get_coverage)."""
+        return self._manager.get_coverage(municipality, start, end)
+    
+    def get_data_version(self, municipality: Optional[str] = None) -> int:
+        """Current data version (see DataManager.get_data_version)."""
+        return self._manager.get_data_version(municipality)
 
 
 class SafePythonREPL:
     """Safe Python REPL with access to preloaded municipality data."""
     
-    def __init__(self, data_manager):
+    def __init__(self, data_manager, backend: Union[str, Any, None] = None,
+                 workers: Optional[int] = None, limits: Optional[ExecutionLimits] = None,
+                 profile: Optional[bool] = None, profile_log: Optional[ProfileLog] = None):
         """
         Initialize Safe Python REPL.
         
         Args:
             data_manager: DataManager instance with loaded data
+            backend: 'inline', 'thread', 'process' or a backend instance
+                (see executors.py); defaults to REPL_BACKEND
+            workers: Threads or worker processes of the 'thread' and
+                'process' backends (defaults to REPL_WORKERS)
+            limits: CPU, memory and wall-clock limits of each execution
+                (defaults to REPL_CPU_SECONDS, REPL_MEMORY_MB and
+                REPL_WALL_SECONDS); only enforced by the 'process' backend,
+                since they apply to the whole executing process
+            profile: Whether to profile every execution (defaults to
+                REPL_PROFILE; see profiling.py)
+            profile_log: Where profiling records are appended (defaults to
+                REPL_PROFILE_PATH)
         """
         self.data_manager = data_manager
-        self.globals = {
+        self.profile = REPL_PROFILE if profile is None else profile
+        self.profile_log = profile_log or ProfileLog()
+        self.limits = limits or ExecutionLimits(
+            cpu_seconds=REPL_CPU_SECONDS or None,
+            memory_mb=REPL_MEMORY_MB or None,
+            wall_seconds=REPL_WALL_SECONDS or None,
+        )
+        # Base namespace shared by every execution; exposed read-only, and
+        # data comes through the facade so snippets never get cached objects
+        readonly = ReadOnlyDataManager(data_manager)
+        self._base = {
             'pd': pd,
             'plt': plt,
-            'data_manager': data_manager,
+            'data_manager': readonly,
+            'get_range': readonly.get_range,
+            'rollup': readonly.get_rollup,
+            'wide': readonly.get_wide,
+            'stats_all': readonly.get_statistics_all,
+            'coverage': readonly.get_coverage,
+            'quality': readonly.get_quality,
+            **WindAnalytics(readonly).namespace(),
             'OUTPUT_DIR': OUTPUT_DIR,
             'Path': Path,
             '__builtins__': {
@@ -47,41 +374,263 @@ class SafePythonREPL:
             }
         }
         
-        # Add all municipality dataframes to globals
+        # Add all resident municipality dataframes to globals
         for municipality, df in data_manager.get_all_data().items():
-            self.globals[f'df_{municipality}'] = df
+            self._base[f'df_{municipality}'] = df
+        self.globals = MappingProxyType(self._base)
+        
+        # pyplot keeps one global figure state, so plotting runs one at a time
+        self._plot_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self.metrics = {'executions': 0, 'cached': 0, 'namespace_bytes_released': 0,
+                        'output_bytes': 0, 'truncated': 0}
+        self.code_cache = CodeCache(REPL_CODE_CACHE_SIZE, REPL_RESULT_CACHE_SIZE)
+        # Set in process workers, the only place the limits are armed
+        self._in_worker = False
+        
+        # Created last: process workers are forked with the globals above
+        self.backend = self._make_backend(backend or REPL_BACKEND, workers)
+    
+    def _make_backend(self, backend, workers: Optional[int]):
+        """Build the execution backend named by a setting."""
+        if not isinstance(backend, str):
+            return backend
+        if backend == "inline":
+            return InlineBackend(self._execute_local)
+        if backend == "thread":
+            return ThreadPoolBackend(self._execute_local, workers=workers or REPL_WORKERS,
+                                     queue_size=REPL_QUEUE_SIZE)
+        if backend == "process":
+            return ProcessPoolBackend(
+                self._execute_local,
+                workers=workers or REPL_WORKERS,
+                queue_size=REPL_QUEUE_SIZE,
+                version=self.data_manager.get_data_version,
+                initializer=self._after_fork,
+                limits=self.limits,
+            )
+        raise ValueError(f"Backend de ejecución desconocido: '{backend}'. Opciones: inline, thread, process")
     
-    def run(self, code: str) -> str:
+    def _after_fork(self):
         """
-        Execute Python code safely and return result.
+        Reset the locks of a forked worker.
+        
+        Workers are re-forked while other threads of the bot may hold the
+        DataManager, code cache, profiling or plot locks; the child would
+        inherit them held and block on them forever.
+        """
+        self.data_manager.after_fork()
+        self.code_cache.after_fork()
+        self.profile_log.after_fork()
+        profiling.after_fork()
+        self._plot_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._in_worker = True
+    
+    def _namespace(self, buffer: TextIO) -> Dict[str, Any]:
+        """
+        Overlay namespace of one execution, with print() writing to its buffer.
+        
+        The overlay starts as a shallow copy of the base (a few dozen
+        references; frames and helpers are shared, never copied). Variables
+        assigned by the snippet only land in the overlay, which is cleared
+        after the run, so nothing leaks into the next execution.
+        """
+        namespace = dict(self._base)
+        namespace['__builtins__'] = {**self._base['__builtins__'], 'print': output_print(buffer)}
+        return namespace
+    
+    def _bind_frames(self, names: Set[str], namespace: Dict[str, Any]):
+        """
+        Bind the municipality frames referenced by the code.
+        
+        Frames are fetched through the DataManager, so lazily loaded or
+        evicted municipalities are (re)loaded on demand, and names of frames
+        no longer resident are dropped so the REPL does not pin them. The
+        shared multi-municipality panel is bound as df_panel the same way.
+        
+        Each execution gets shallow copies: the column arrays are the cached
+        read-only buffers (writing values raises), while adding columns,
+        renaming axes or in-place methods like dropna(inplace=True) only
+        change the copy.
         
         Args:
-            code: Python code to execute
-            
-        Returns:
-            Output string from code execution
+            names: Global names used by the code (see code_cache.referenced_names)
+            namespace: Globals of the execution
         """
+        if 'df_panel' in names:
+            namespace['df_panel'] = _shallow(self.data_manager.get_panel())
+        for municipality in MUNICIPALITIES:
+            name = f'df_{municipality}'
+            if name in names:
+                df = self.data_manager.get_data(municipality)
+                if df is not None:
+                    namespace[name] = _shallow(df)
+            elif municipality not in self.data_manager.get_all_data():
+                self._base.pop(name, None)
+    
+    def _execute_local(self, code: str) -> Dict:
+        """Execute code in this process (the body run by every backend)."""
+        # Output of this execution only, whatever else runs concurrently
+        captured_output = BoundedOutput()
+        route_stdout()
+        token = _execution_output.set(captured_output)
+        namespace = initial = {}
+        session = ProfileSession(code).start() if self.profile else None
         try:
-            # Capture stdout
-            old_stdout = sys.stdout
-            sys.stdout = captured_output = StringIO()
-            
             # Execute code
-            exec(code, self.globals)
-            
-            # Restore stdout
-            sys.stdout = old_stdout
-            
-            # Get output
-            output = captured_output.getvalue()
-            
-            if output:
-                return output.strip()
+            _, compiled, names = self.code_cache.compile(code)
+            namespace = self._namespace(captured_output)
+            self._bind_frames(names, namespace)
+            initial = dict(namespace)
+            if 'plt' in names:
+                with self._plot_lock:
+                    exec(compiled, namespace)
             else:
-                return "Código ejecutado exitosamente (sin output)"
-                
+                exec(compiled, namespace)
+            result = execution_result('ok', captured_output.getvalue())
+        
+        except OutputLimitReached:
+            # What was printed so far (head and tail) is still the answer
+            result = execution_result('ok', captured_output.getvalue())
+        except ExecutionLimitExceeded as e:
+            result = self.limits.exceeded(e.limit, captured_output.getvalue())
+        except MemoryError:
+            if self._in_worker and self.limits.memory_mb is not None:
+                result = self.limits.exceeded('memory', captured_output.getvalue())
+            else:
+                # No limit armed here: the allocation itself was impossible
+                result = execution_result('error', captured_output.getvalue(),
+                                          "Error ejecutando código:\nMemoryError: memoria insuficiente para esta operación")
         except Exception as e:
-            sys.stdout = old_stdout
             error_msg = f"Error ejecutando código:\n{type(e).__name__}: {str(e)}"
-            return error_msg
-
+            if isinstance(e, ValueError) and 'read-only' in str(e):
+                error_msg += "\nLos DataFrames pre-cargados son de solo lectura: usa .copy() antes de modificar valores."
+            result = execution_result('error', captured_output.getvalue(), error_msg)
+        finally:
+            _execution_output.reset(token)
+        
+        # Discard the overlay now; clearing it also breaks the cycles through
+        # functions the snippet defined, which would otherwise wait for the GC
+        result['namespace_bytes'] = namespace_nbytes(namespace, initial)
+        result['output_bytes'] = captured_output.bytes
+        result['truncated'] = captured_output.truncated
+        namespace.clear()
+        if session is not None:
+            result['profile'] = session.stop()
+        return result
+    
+    def execute(self, code: str, tags: Optional[Dict[str, Any]] = None) -> Dict:
+        """
+        Execute Python code on the configured backend.
+        
+        Args:
+            code: Python code to execute
+            tags: Context of the execution for the profiling record, e.g.
+                {'municipality': 'riohacha', 'query': user question}; the
+                query is stored as its fingerprint and class only
+        
+        Returns:
+            Result dictionary with status ('ok', 'error', 'busy' or
+            'limit_exceeded'), output (head and tail if it was truncated),
+            error, output_bytes (bytes printed), truncated, namespace_bytes
+            (memory held by the variables it created, released after the
+            run), the artifacts written to OUTPUT_DIR, cached=True when it
+            was served from the result cache, profile when profiling is
+            enabled (see ProfileSession.stop) and, for exceeded limits, the
+            limit hit ('cpu', 'memory' or 'wall_time')
+        """
+        started = time.perf_counter()
+        
+        # Same snippet over the same data: reuse the output and artifacts
+        version = self.data_manager.get_data_version()
+        digest = self.code_cache.memoizable(code)
+        result = None
+        if digest is not None:
+            result = self.code_cache.get_result(digest, version, OUTPUT_DIR)
+            if result is not None:
+                with self._metrics_lock:
+                    self.metrics['cached'] += 1
+        
+        if result is None:
+            # Only snippets naming the output directory can write files there
+            writes_files = 'OUTPUT_DIR' in code
+            before = scan_artifacts(OUTPUT_DIR) if writes_files else {}
+            result = self.backend.submit(code).result()
+            after = scan_artifacts(OUTPUT_DIR) if writes_files else {}
+            result['artifacts'] = {name: mtime for name, mtime in after.items() if before.get(name) != mtime}
+            
+            if (digest is not None and result['status'] == 'ok'
+                    and version == self.data_manager.get_data_version()):
+                # The profile describes this run, not later cache hits
+                self.code_cache.put_result(digest, version, {k: v for k, v in result.items() if k != 'profile'})
+            
+            with self._metrics_lock:
+                self.metrics['executions'] += 1
+                self.metrics['namespace_bytes_released'] += result.get('namespace_bytes', 0)
+                self.metrics['output_bytes'] += result.get('output_bytes', 0)
+                self.metrics['truncated'] += bool(result.get('truncated'))
+        
+        if self.profile:
+            self._record_profile(code, result, tags or {}, version, time.perf_counter() - started)
+        return result
+    
+    def _record_profile(self, code: str, result: Dict, tags: Dict[str, Any], version: int, latency: float):
+        """Append the profiling record of one execution to the profile log."""
+        try:
+            code_fingerprint = self.code_cache.fingerprint(code)[0]
+        except SyntaxError:
+            code_fingerprint = None
+        query = tags.get('query')
+        record = {
+            'timestamp': pd.Timestamp.now().isoformat(timespec='milliseconds'),
+            **{key: value for key, value in tags.items() if key != 'query'},
+            'query_fingerprint': query_fingerprint(query) if query else None,
+            'query_class': normalize_query(query) if query else None,
+            'code_fingerprint': code_fingerprint,
+            'data_version': version,
+            'backend': getattr(self.backend, 'name', type(self.backend).__name__),
+            'status': result['status'],
+            'cached': bool(result.get('cached')),
+            'latency_seconds': round(latency, 6),
+            'output_bytes': result.get('output_bytes', 0),
+            'truncated': bool(result.get('truncated')),
+            'artifacts': sorted(result.get('artifacts', {})),
+            **result.get('profile', {}),
+        }
+        try:
+            self.profile_log.write(record)
+        except OSError as e:
+            print(f"⚠️  No se pudo escribir el perfil de ejecución: {e}")
+    
+    def get_metrics(self) -> Dict:
+        """
+        Get execution metrics.
+        
+        Returns:
+            Dictionary with the number of executions, of results served from
+            the cache, the bytes of per-execution variables released and of
+            output printed so far, the number of truncated outputs, plus the
+            code cache statistics (see CodeCache.stats)
+        """
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        metrics['code_cache'] = self.code_cache.stats()
+        return metrics
+    
+    def run(self, code: str, tags: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Execute Python code safely and return result.
+        
+        Args:
+            code: Python code to execute
+            tags: Context for the profiling record (see execute)
+        
+        Returns:
+            Output string from code execution
+        """
+        return format_result(self.execute(code, tags))
+    
+    def close(self):
+        """Release the execution backend (stops process workers)."""
+        self.backend.close()
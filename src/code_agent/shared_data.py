@@ -0,0 +1,237 @@
+"""
+Shared Data - Municipality frames in host-wide shared memory
+
+One process publishes the built frames into a memory-mapped file under
+SHARED_MEMORY_DIR (/dev/shm on Linux, so it lives in RAM); every process on
+the host, the publisher included, maps it read-only and gets NumPy/pandas
+views of the same physical pages, so N processes hold one copy of the data.
+
+File layout:
+
+    header length (8 bytes) | JSON header | array buffers
+
+Every column with a fixed-size dtype is stored in the file. The derived
+text columns ('date', 'municipio') are rebuilt on attach from the index.
+Rollup cubes are stored as the arrays of their base tables (see
+RollupCube.base_tables) and the duplicated timestamps of each source as an
+array, so attaching never unpickles anything.
+
+SHARED_MEMORY_DIR is writable by every local user and segment names are
+predictable: segments are created private to the publishing user (mode
+0600) and only mapped if they belong to the current user and no one else
+can write them.
+"""
+
+import json
+import mmap
+import os
+import stat
+import struct
+import tempfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .rollups import AGGREGATES, RollupCube
+from .storage import date_strings
+
+
+SHARED_MEMORY_DIR = Path("/dev/shm") if Path("/dev/shm").is_dir() else Path(tempfile.gettempdir())
+SEGMENT_ALIGNMENT = 64
+
+
+def segment_path(prefix: str, version: str) -> Path:
+    """Path of the segment holding a data version."""
+    return SHARED_MEMORY_DIR / f"{prefix}_{version}.shm"
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // SEGMENT_ALIGNMENT) * SEGMENT_ALIGNMENT
+
+
+class _Buffers:
+    """Arrays laid out back to back at aligned offsets."""
+
+    def __init__(self):
+        self.arrays: List[Tuple[int, np.ndarray]] = []
+        self.size = 0
+
+    def add(self, values) -> list:
+        """Place an array; returns its header entry [dtype, offset, shape]."""
+        values = np.ascontiguousarray(values)
+        offset = _aligned(self.size)
+        self.arrays.append((offset, values))
+        self.size = offset + values.nbytes
+        return [values.dtype.str, offset, list(values.shape)]
+
+
+def _view(buffer, data_start: int, entry: list) -> np.ndarray:
+    dtype, offset, shape = entry
+    return np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=buffer, offset=data_start + offset)
+
+
+def _cube_layout(cube: RollupCube, buffers: _Buffers) -> Dict:
+    day, month_hour = cube.base_tables()
+    day_index = day['count'].index
+    month_hour_index = month_hour['count'].index
+    return {
+        'variables': cube.variables,
+        'last_timestamp': str(cube.last_timestamp) if cube.last_timestamp is not None else None,
+        'day': {
+            'index': buffers.add(day_index.values),
+            **{aggregate: buffers.add(day[aggregate][cube.variables].to_numpy()) for aggregate in AGGREGATES},
+        },
+        'month_hour': {
+            'month': buffers.add(month_hour_index.get_level_values('month').to_numpy()),
+            'hour': buffers.add(month_hour_index.get_level_values('hour').to_numpy()),
+            **{aggregate: buffers.add(month_hour[aggregate][cube.variables].to_numpy()) for aggregate in AGGREGATES},
+        },
+    }
+
+
+def _cube_from_layout(layout: Dict, buffer, data_start: int) -> RollupCube:
+    """Rebuild a cube; its arrays are copied out of the mapping (they are small)."""
+    variables = layout['variables']
+
+    def table(entries: Dict, index) -> Dict[str, pd.DataFrame]:
+        return {
+            aggregate: pd.DataFrame(_view(buffer, data_start, entries[aggregate]).copy(),
+                                    index=index, columns=variables)
+            for aggregate in AGGREGATES
+        }
+
+    day = layout['day']
+    month_hour = layout['month_hour']
+    day_index = pd.DatetimeIndex(_view(buffer, data_start, day['index']).copy(), name='day')
+    month_hour_index = pd.MultiIndex.from_arrays(
+        [_view(buffer, data_start, month_hour['month']).copy(), _view(buffer, data_start, month_hour['hour']).copy()],
+        names=['month', 'hour'],
+    )
+    last = layout['last_timestamp']
+    return RollupCube.from_base_tables(variables, table(day, day_index), table(month_hour, month_hour_index),
+                                       pd.Timestamp(last) if last is not None else None)
+
+
+def _check_trusted(info: os.stat_result, path: Path):
+    """Refuse segments another user could have planted or modified."""
+    foreign = hasattr(os, 'getuid') and info.st_uid != os.getuid()
+    if not stat.S_ISREG(info.st_mode) or foreign or info.st_mode & 0o077:
+        raise PermissionError(f"Segmento compartido no confiable (dueño o permisos): {path}")
+
+
+def publish_frames(frames: Dict[str, pd.DataFrame], rollups: Dict[str, RollupCube], path: Path,
+                   duplicates: Optional[Dict[str, pd.DatetimeIndex]] = None) -> bool:
+    """
+    Write frames, rollups and duplicated timestamps to a shared segment.
+
+    The segment is written to a private (0600) temporary file and renamed
+    into place, so other processes never attach to a partially written
+    segment.
+
+    Args:
+        frames: Municipality frames indexed by a DatetimeIndex
+        rollups: Rollup cube per municipality
+        path: Segment path (see segment_path)
+        duplicates: Timestamps found more than once in each source file
+
+    Returns:
+        True if this call created the segment, False if it already existed
+    """
+    path = Path(path)
+    if path.exists():
+        return False
+
+    buffers = _Buffers()
+    layout = {}
+    for municipality, df in frames.items():
+        entries = []
+        for column in df.columns:
+            values = df[column].to_numpy()
+            if values.dtype == object:
+                continue
+            entries.append([column, *buffers.add(values)])
+        layout[municipality] = {
+            'columns': entries,
+            'order': list(df.columns),
+            'rows': len(df),
+        }
+    cubes = {municipality: _cube_layout(cube, buffers) for municipality, cube in rollups.items()}
+    duplicated = {municipality: buffers.add(pd.DatetimeIndex(timestamps).values)
+                  for municipality, timestamps in (duplicates or {}).items()}
+
+    header = json.dumps({'frames': layout, 'rollups': cubes, 'duplicates': duplicated}).encode()
+    data_start = _aligned(8 + len(header))
+
+    # mkstemp creates the file exclusively (O_EXCL) with mode 0600
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    tmp = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(struct.pack('<Q', len(header)))
+            f.write(header)
+            for offset, values in buffers.arrays:
+                f.seek(data_start + offset)
+                f.write(values.reshape(-1).view(np.uint8).data)
+            f.truncate(data_start + buffers.size)
+
+        if path.exists():
+            # Another process published the same version meanwhile
+            return False
+        os.replace(tmp, path)
+        return True
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def attach_frames(path: Path) -> Optional[Tuple[Dict[str, pd.DataFrame], Dict[str, RollupCube],
+                                                Dict[str, pd.DatetimeIndex]]]:
+    """
+    Map a published segment.
+
+    Args:
+        path: Segment path (see segment_path)
+
+    Returns:
+        Tuple of (frames, rollups, duplicates) or None if the segment does
+        not exist. Frame columns are read-only views of the mapping, which
+        stays valid even after the publisher removes the file.
+
+    Raises:
+        PermissionError: If the segment is not a regular file owned by the
+            current user and private to it
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0))
+    except FileNotFoundError:
+        return None
+    with os.fdopen(fd, "rb") as f:
+        _check_trusted(os.fstat(f.fileno()), path)
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    buffer = memoryview(mapped)
+    (header_bytes,) = struct.unpack_from('<Q', buffer, 0)
+    header = json.loads(bytes(buffer[8:8 + header_bytes]))
+    data_start = _aligned(8 + header_bytes)
+
+    frames = {}
+    for municipality, layout in header['frames'].items():
+        data = {}
+        for column, *entry in layout['columns']:
+            data[column] = _view(buffer, data_start, entry)
+
+        index = pd.DatetimeIndex(data['datetime'], copy=False)
+        if 'date' in layout['order']:
+            data['date'] = date_strings(index)
+        if 'municipio' in layout['order']:
+            data['municipio'] = np.array([municipality], dtype=object).repeat(layout['rows'])
+
+        df = pd.DataFrame({c: data[c] for c in layout['order'] if c in data}, copy=False)
+        df.index = index
+        frames[municipality] = df
+
+    rollups = {municipality: _cube_from_layout(layout, buffer, data_start)
+               for municipality, layout in header['rollups'].items()}
+    duplicates = {municipality: pd.DatetimeIndex(_view(buffer, data_start, entry).copy())
+                  for municipality, entry in header['duplicates'].items()}
+    return frames, rollups, duplicates
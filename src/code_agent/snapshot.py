@@ -0,0 +1,165 @@
+"""
+Snapshot - Single-file serialized DataManager state for warm starts
+
+The fully built state (indexed frames, rollup cubes and source signatures)
+is pickled with protocol 5. Array data is written out-of-band after the
+pickle stream, each buffer aligned to SNAPSHOT_ALIGNMENT, and loaded back
+from a read-only memory map: numeric columns become zero-copy views of the
+file and pages are only read when touched.
+
+File layout:
+
+    MAGIC | header length (8 bytes) | JSON header | pickle stream | buffers
+
+Snapshots are keyed by the version of the source files, so a snapshot
+written before the ingestion service updated a file is never loaded. The
+version starts with a key of the load options, and writing a snapshot only
+replaces older ones with the same key: processes loading the same files with
+other options (e.g. compact=True) keep their snapshots.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from .storage import source_path, file_signature
+
+
+MAGIC = b"WINDSNAP"
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_ALIGNMENT = 64
+SNAPSHOT_SUFFIX = ".snap"
+
+
+Sources = Dict[str, Tuple[Path, Tuple[int, int]]]
+
+
+def current_sources(municipalities: Iterable[str], data_dir: Path) -> Sources:
+    """Map municipalities to the file they would be read from and its signature."""
+    sources = {}
+    for municipality in municipalities:
+        path = source_path(municipality, data_dir)
+        if path is not None:
+            sources[municipality] = (path, file_signature(path))
+    return sources
+
+
+def source_version(sources: Sources, **options) -> str:
+    """
+    Version of the source data a snapshot is built from.
+
+    Args:
+        sources: File and signature per municipality (see current_sources)
+        **options: Settings that change the built state (e.g. compact=True)
+
+    Returns:
+        '<options>_<files>' with hex digests of the options and of the file
+        names, modification times and sizes
+    """
+    files = sorted([m, Path(path).name, *signature] for m, (path, signature) in sources.items())
+    options_key = json.dumps([SNAPSHOT_FORMAT, sorted(options.items())])
+    payload = json.dumps([options_key, files])
+    return (f"{hashlib.sha256(options_key.encode()).hexdigest()[:8]}_"
+            f"{hashlib.sha256(payload.encode()).hexdigest()[:16]}")
+
+
+def snapshot_path(version: str, snapshot_dir: Path) -> Path:
+    """Path of the snapshot for a source data version."""
+    return Path(snapshot_dir) / f"datamanager_{version}{SNAPSHOT_SUFFIX}"
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // SNAPSHOT_ALIGNMENT) * SNAPSHOT_ALIGNMENT
+
+
+def save_snapshot(state: Dict[str, Any], path: Path) -> Path:
+    """
+    Atomically write a state dictionary as a snapshot file.
+
+    Older snapshots written with the same options (see source_version) are
+    removed; processes that still map them keep their (unlinked) copy until
+    they exit.
+
+    Args:
+        state: Objects to store
+        path: Destination path (see snapshot_path)
+
+    Returns:
+        Destination path
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    buffers = []
+    stream = pickle.dumps(state, protocol=5, buffer_callback=buffers.append)
+    raws = [buffer.raw() for buffer in buffers]
+
+    # Offsets are relative to the end of the pickle stream
+    layout = []
+    offset = 0
+    for raw in raws:
+        offset = _aligned(offset)
+        layout.append([offset, raw.nbytes])
+        offset += raw.nbytes
+
+    header = json.dumps({"format": SNAPSHOT_FORMAT, "pickle_bytes": len(stream),
+                         "buffers": layout}).encode()
+    prefix = MAGIC + struct.pack("<Q", len(header)) + header
+    data_start = _aligned(len(prefix) + len(stream))
+
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        f.write(prefix)
+        f.write(stream)
+        for (buffer_offset, _), raw in zip(layout, raws):
+            f.seek(data_start + buffer_offset)
+            f.write(raw)
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+
+    options_prefix = path.stem.rsplit("_", 1)[0]
+    for old in path.parent.glob(f"{options_prefix}_*{SNAPSHOT_SUFFIX}"):
+        if old != path:
+            old.unlink(missing_ok=True)
+    return path
+
+
+def load_snapshot(path: Path) -> Optional[Dict[str, Any]]:
+    """
+    Load a snapshot file through a read-only memory map.
+
+    Args:
+        path: Snapshot file
+
+    Returns:
+        The stored state dictionary or None if the file is missing or not
+        a snapshot of the current format
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mapped)
+    if bytes(view[:len(MAGIC)]) != MAGIC:
+        return None
+    (header_bytes,) = struct.unpack_from("<Q", view, len(MAGIC))
+    header_start = len(MAGIC) + 8
+    header = json.loads(bytes(view[header_start:header_start + header_bytes]))
+    if header.get("format") != SNAPSHOT_FORMAT:
+        return None
+
+    stream_start = header_start + header_bytes
+    stream_end = stream_start + header["pickle_bytes"]
+    data_start = _aligned(stream_end)
+    buffers = [view[data_start + offset:data_start + offset + nbytes]
+               for offset, nbytes in header["buffers"]]
+
+    return pickle.loads(view[stream_start:stream_end], buffers=buffers)
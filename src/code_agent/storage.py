@@ -0,0 +1,295 @@
+"""
+Storage - Columnar on-disk format for municipality data
+
+Municipality series are stored as Parquet files (typed columns, native
+timestamp type) next to the legacy CSV exports written by the ingestion
+service. Readers prefer the Parquet file and fall back to the CSV when it
+is missing or older than the CSV.
+
+The text columns derived from each row ('date' from the timestamp,
+'municipio' from the file name) are not stored in Parquet: decoding strings
+costs more than reading every measure, so they are rebuilt on read.
+
+Convert the existing CSV files with:
+
+    python -m src.code_agent.storage
+"""
+
+import io
+import os
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from colorama import Fore, Style
+
+from .config import DATA_DIR, MUNICIPALITIES
+
+try:
+    import pyarrow
+    import pyarrow.csv as pyarrow_csv
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+FILE_PREFIX = "open_meteo"
+
+# About one month of hourly rows per Parquet row group, so tail reads can
+# skip older row groups using their statistics
+ROW_GROUP_SIZE = 24 * 31
+
+# Column types of the CSV exports written by the ingestion service
+# ('datetime' is parsed as a timestamp by the reader)
+CSV_DTYPES = {
+    "wind_speed_10m": "float64",
+    "wind_direction_10m": "float64",
+    "temperature_2m": "float64",
+    "relative_humidity_2m": "float64",
+    "precipitation": "float64",
+    "hour": "int64",
+    "date": "str",
+    "municipio": "str",
+}
+
+# Text columns rebuilt on read instead of being stored in Parquet
+TEXT_COLUMNS = ("date", "municipio")
+
+# Initial number of bytes read from the end of a CSV when reading its tail
+CSV_TAIL_CHUNK = 64 * 1024
+
+
+def csv_path(municipality: str, data_dir: Path = DATA_DIR) -> Path:
+    """Path of the CSV export for a municipality."""
+    return Path(data_dir) / f"{FILE_PREFIX}_{municipality}.csv"
+
+
+def parquet_path(municipality: str, data_dir: Path = DATA_DIR) -> Path:
+    """Path of the Parquet file for a municipality."""
+    return Path(data_dir) / f"{FILE_PREFIX}_{municipality}.parquet"
+
+
+def source_path(municipality: str, data_dir: Path = DATA_DIR) -> Optional[Path]:
+    """
+    Resolve the file a municipality should be read from.
+
+    The Parquet file wins unless the CSV has been rewritten after it
+    (e.g. by an ingestion service running without pyarrow).
+
+    Args:
+        municipality: Name of the municipality
+        data_dir: Directory holding the data files
+
+    Returns:
+        Path to read or None if no data file exists
+    """
+    csv_file = csv_path(municipality, data_dir)
+    parquet_file = parquet_path(municipality, data_dir)
+
+    if PARQUET_AVAILABLE and parquet_file.exists():
+        if not csv_file.exists() or parquet_file.stat().st_mtime >= csv_file.stat().st_mtime:
+            return parquet_file
+    if csv_file.exists():
+        return csv_file
+    return None
+
+
+def municipality_of(path: Path) -> str:
+    """Municipality a data file belongs to, from its file name."""
+    return Path(path).stem[len(FILE_PREFIX) + 1:]
+
+
+def date_strings(datetimes) -> np.ndarray:
+    """'YYYY-MM-DD' strings of timestamps, formatting each distinct day once."""
+    days = pd.DatetimeIndex(datetimes).values.astype('datetime64[D]')
+    positions, unique_days = pd.factorize(days)
+    return np.datetime_as_string(unique_days, unit='D').astype(object)[positions]
+
+
+def add_text_columns(df: pd.DataFrame, municipality: str) -> pd.DataFrame:
+    """Rebuild the TEXT_COLUMNS missing from a frame read from Parquet."""
+    if "date" not in df.columns:
+        df["date"] = date_strings(df["datetime"])
+    if "municipio" not in df.columns:
+        # repeat() is much faster than np.full for object arrays
+        df["municipio"] = np.array([municipality], dtype=object).repeat(len(df))
+    return df
+
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Coerce a municipality frame to the canonical column types."""
+    if "datetime" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["datetime"]):
+        df["datetime"] = pd.to_datetime(df["datetime"])
+    if "date" in df.columns and df["date"].dtype != object:
+        df["date"] = df["date"].astype(str)
+    return df
+
+
+def read_csv_typed(path: Path) -> pd.DataFrame:
+    """
+    Read a CSV export with explicit column types.
+
+    Uses the multithreaded pyarrow CSV parser when available (timestamps are
+    parsed by the reader) and the pandas C parser otherwise. No column type
+    is inferred in either case.
+
+    Args:
+        path: CSV file
+
+    Returns:
+        DataFrame with the CSV_DTYPES column types
+    """
+    if PARQUET_AVAILABLE:
+        column_types = {"datetime": pyarrow.timestamp("ns")}
+        column_types.update({c: pyarrow.type_for_alias(t) for c, t in CSV_DTYPES.items()})
+        table = pyarrow_csv.read_csv(
+            path,
+            convert_options=pyarrow_csv.ConvertOptions(column_types=column_types,
+                                                       strings_can_be_null=False),
+        )
+        return table.to_pandas()
+
+    return pd.read_csv(path, dtype=CSV_DTYPES, parse_dates=["datetime"], engine="c")
+
+
+def read_frame(path: Path, text_columns: bool = True) -> pd.DataFrame:
+    """
+    Read a municipality frame from a Parquet or CSV file.
+
+    Args:
+        path: Parquet or CSV file
+        text_columns: Whether to rebuild the TEXT_COLUMNS of Parquet files
+            (callers dropping them anyway can skip the work)
+
+    Returns:
+        DataFrame with the canonical column types
+    """
+    if path.suffix == ".parquet":
+        df = pd.read_parquet(path)
+        if text_columns:
+            df = add_text_columns(df, municipality_of(path))
+    else:
+        df = read_csv_typed(path)
+    return normalize_frame(df)
+
+
+def file_signature(path: Path) -> Tuple[int, int]:
+    """Modification time (ns) and size of a data file, used to detect rewrites."""
+    stat = Path(path).stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def read_tail(path: Path, since) -> pd.DataFrame:
+    """
+    Read the rows of a data file from a given instant onwards.
+
+    Parquet files are filtered with row group statistics and CSV files are
+    read backwards from the end in growing chunks, so only the tail of the
+    file is parsed.
+
+    Args:
+        path: Parquet or CSV file
+        since: First instant to include
+
+    Returns:
+        DataFrame with the rows whose datetime is >= since
+    """
+    path = Path(path)
+    since = pd.Timestamp(since)
+
+    if path.suffix == ".parquet":
+        df = pd.read_parquet(path, filters=[("datetime", ">=", since)])
+        return normalize_frame(add_text_columns(df, municipality_of(path)))
+
+    size = path.stat().st_size
+    chunk = CSV_TAIL_CHUNK
+    with open(path, "rb") as f:
+        header = f.readline()
+        while True:
+            start = max(len(header), size - chunk)
+            f.seek(start)
+            data = f.read()
+            if start > len(header):
+                # Drop the partial first line
+                data = data[data.find(b"\n") + 1:]
+            df = normalize_frame(pd.read_csv(io.BytesIO(header + data)))
+            if start == len(header) or df.empty or df["datetime"].iloc[0] < since:
+                break
+            chunk *= 4
+
+    return df[df["datetime"] >= since].reset_index(drop=True)
+
+
+def read_municipality(municipality: str, data_dir: Path = DATA_DIR) -> Optional[pd.DataFrame]:
+    """
+    Read the stored series of a municipality.
+
+    Args:
+        municipality: Name of the municipality
+        data_dir: Directory holding the data files
+
+    Returns:
+        DataFrame or None if no data file exists
+    """
+    path = source_path(municipality, data_dir)
+    if path is None:
+        return None
+    return read_frame(path)
+
+
+def write_parquet(df: pd.DataFrame, path: Path) -> Path:
+    """
+    Atomically write a municipality frame as Parquet.
+
+    The TEXT_COLUMNS are left out (see read_frame).
+
+    Args:
+        df: Frame to write
+        path: Destination path
+
+    Returns:
+        Destination path
+    """
+    if not PARQUET_AVAILABLE:
+        raise RuntimeError("pyarrow no está instalado: no se puede escribir Parquet")
+
+    path = Path(path)
+    tmp = path.with_suffix(".tmp.parquet")
+    df = df.drop(columns=[c for c in TEXT_COLUMNS if c in df.columns])
+    normalize_frame(df).to_parquet(tmp, index=False, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp, path)
+    return path
+
+
+def convert_csv_to_parquet(data_dir: Path = DATA_DIR,
+                           municipalities: Optional[List[str]] = None,
+                           verbose: bool = True) -> Dict[str, Path]:
+    """
+    Convert the CSV exports of the given municipalities to Parquet.
+
+    Args:
+        data_dir: Directory holding the data files
+        municipalities: Municipalities to convert (all by default)
+        verbose: Whether to print progress messages
+
+    Returns:
+        Dictionary mapping municipality names to written Parquet paths
+    """
+    written = {}
+    for municipality in municipalities or MUNICIPALITIES:
+        csv_file = csv_path(municipality, data_dir)
+        if not csv_file.exists():
+            if verbose:
+                print(f"{Fore.RED}  ❌ {municipality}: CSV no encontrado{Style.RESET_ALL}")
+            continue
+
+        df = read_frame(csv_file)
+        written[municipality] = write_parquet(df, parquet_path(municipality, data_dir))
+        if verbose:
+            print(f"{Fore.GREEN}  ✅ {municipality}: {len(df):,} registros → {written[municipality].name}{Style.RESET_ALL}")
+
+    return written
+
+
+if __name__ == "__main__":
+    convert_csv_to_parquet()
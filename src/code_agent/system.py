@@ -2,27 +2,32 @@
 Multi-Agent System - Orchestrates all agents
 """
 
-from typing import Dict
+from typing import Optional
 from colorama import Fore, Style
 
 from .config import MUNICIPALITIES, get_supervisor_llm, get_agent_llm
 from .data_manager import DataManager
 from .supervisor import SupervisorAgent
-from .municipality_agent import CodeMunicipalityAgent
+from .municipality_agent import CodeMunicipalityAgent, MunicipalityAgents
 from .general_agent import GeneralAgent
+from .linter import PerformanceLinter
+from .safe_repl import SafePythonREPL
 from .security import SecurityValidator
 
 
 class CodeMultiAgentSystem:
     """Orchestrates the supervisor and code-enabled agents."""
     
-    def __init__(self, verbose: bool = True, enable_security: bool = True):
+    def __init__(self, verbose: bool = True, enable_security: bool = True,
+                 data_manager: Optional[DataManager] = None):
         """
         Initialize Multi-Agent System.
         
         Args:
             verbose: Whether to print initialization messages
             enable_security: Whether to enable security validation
+            data_manager: Preconfigured DataManager (e.g. compact=True);
+                a default one is created when omitted
         """
         self.verbose = verbose
         self.enable_security = enable_security
@@ -31,7 +36,7 @@ class CodeMultiAgentSystem:
         self.security_validator = SecurityValidator(verbose=verbose)
         
         # Initialize data manager
-        self.data_manager = DataManager(verbose=verbose)
+        self.data_manager = data_manager or DataManager(verbose=verbose)
         
         # Initialize LLMs
         if verbose:
@@ -42,23 +47,32 @@ class CodeMultiAgentSystem:
         
         # Initialize agents
         self.supervisor = SupervisorAgent(supervisor_llm)
-        self.general_agent = GeneralAgent(agent_llm)
-        self.municipality_agents: Dict[str, CodeMunicipalityAgent] = {}
+        self.general_agent = GeneralAgent(agent_llm, self.data_manager)
         
-        # Initialize municipality agents
-        if verbose:
-            print(f"{Fore.YELLOW}🤖 Inicializando agentes municipales...{Style.RESET_ALL}")
+        # One execution service and performance linter shared by every municipality agent
+        self.python_repl = SafePythonREPL(self.data_manager)
+        self.performance_linter = PerformanceLinter(self.data_manager)
         
-        for municipality in MUNICIPALITIES:
-            self.municipality_agents[municipality] = CodeMunicipalityAgent(
-                municipality, 
+        # Municipality agents are lightweight and created on first query
+        self.municipality_agents = MunicipalityAgents(
+            MUNICIPALITIES,
+            lambda municipality: CodeMunicipalityAgent(
+                municipality,
                 agent_llm,
-                self.data_manager
-            )
+                self.data_manager,
+                python_repl=self.python_repl,
+                security_validator=self.security_validator,
+                performance_linter=self.performance_linter,
+            ),
+        )
         
         if verbose:
             print(f"{Fore.GREEN}✅ Sistema multi-agente listo ({len(MUNICIPALITIES)} agentes){Style.RESET_ALL}\n")
     
+    def close(self):
+        """Release the shared execution service (stops process workers)."""
+        self.python_repl.close()
+    
     def process_query(self, query: str, verbose: bool = None) -> str:
         """
         Process user query through the multi-agent system.
@@ -107,6 +121,15 @@ class CodeMultiAgentSystem:
                 else:
                     return f"Municipio '{municipality}' no encontrado."
             
+            elif routing["type"] == "comparison":
+                # Comparison - one vectorized analysis over the shared panel
+                municipalities = [m for m in routing["municipalities"] if m in self.municipality_agents]
+                if not municipalities:
+                    return "No se encontraron municipios válidos."
+                if verbose:
+                    print(f"{Fore.MAGENTA}📊 Comparando {len(municipalities)} municipios sobre el panel compartido...{Style.RESET_ALL}\n")
+                return self.municipality_agents[municipalities[0]].answer(query, compare_with=municipalities)
+            
             else:
                 # Multiple municipalities - aggregate responses
                 if verbose:
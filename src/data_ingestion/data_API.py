@@ -3,6 +3,7 @@
 # src/data_ingestion/data_API.py
 
 import os
+import json
 import time
 import random
 import pytz
@@ -17,6 +18,12 @@ from requests.exceptions import HTTPError
 from fastapi import FastAPI, Query, HTTPException
 from pydantic import BaseModel
 
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
 # ==========================
 # Configuración básica
 # ==========================
@@ -65,8 +72,15 @@ def parse_city(city: str) -> str:
 def csv_path(city: str, prefix: str = "open_meteo") -> Path:
     return DATA_DIR / f"{prefix}_{parse_city(city)}.csv"
 
+def parquet_path(city: str, prefix: str = "open_meteo") -> Path:
+    return DATA_DIR / f"{prefix}_{parse_city(city)}.parquet"
+
 def load_existing(city: str) -> pd.DataFrame:
     path = csv_path(city)
+    pq_path = parquet_path(city)
+    if PARQUET_AVAILABLE and pq_path.exists() and (not path.exists() or pq_path.stat().st_mtime >= path.stat().st_mtime):
+        # El Parquet no guarda date/municipio: se derivan al leer
+        return normalize_df(pd.read_parquet(pq_path), city)
     if path.exists():
         df = pd.read_csv(path)
         if "datetime" in df.columns:
@@ -83,8 +97,25 @@ def save_df(df: pd.DataFrame, city: str) -> str:
     df.drop_duplicates(subset=["municipio", "datetime"], keep="last", inplace=True)
     df.to_csv(tmp, index=False)
     shutil.move(tmp, path)
+    if PARQUET_AVAILABLE:
+        # Copia columnar (timestamps nativos) que lee DataManager
+        pq_tmp = parquet_path(city).with_suffix(".tmp.parquet")
+        df.drop(columns=["date", "municipio"]).to_parquet(pq_tmp, index=False, row_group_size=24 * 31)
+        shutil.move(pq_tmp, parquet_path(city))
     return str(path)
 
+def record_provenance(city: str, archive_until: pd.Timestamp) -> None:
+    """Guarda la última hora descargada del archivo histórico; las posteriores son pronóstico."""
+    path = STATE_DIR / "provenance.json"
+    try:
+        state = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        state = {}
+    state[parse_city(city)] = {"archive_until": archive_until.strftime("%Y-%m-%d %H:%M:%S")}
+    tmp = path.with_suffix(".tmp.json")
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    shutil.move(tmp, path)
+
 def normalize_df(df: pd.DataFrame, city: str) -> pd.DataFrame:
     if df.empty:
         return df
@@ -213,6 +244,13 @@ def incremental_pull(city: str,
         merged.drop_duplicates(subset=["municipio", "datetime"], keep="last", inplace=True)
         new_rows = len(merged) - len(existing)
 
+    # Antes de escribir los datos, para que quien los recargue vea la procedencia nueva
+    if not archive_df.empty:
+        # El pronóstico (past_days=3) sobrescribe las últimas horas del histórico
+        archive_until = pd.to_datetime(archive_df["datetime"]).max()
+        if not forecast_df.empty:
+            archive_until = min(archive_until, pd.to_datetime(forecast_df["datetime"]).min() - timedelta(hours=1))
+        record_provenance(city_norm, archive_until)
     path = save_df(merged, city_norm)
     return {
         "city": city_norm,
@@ -280,6 +318,7 @@ def startup_event():
                 current = block_end + timedelta(days=1)
                 time.sleep(3)  # pausa entre requests
             if not all_data.empty:
+                record_provenance(city, all_data["datetime"].max())
                 save_df(all_data, city)
                 print(f"📥 {city}: descarga inicial completa ({len(all_data)} registros)")
         except Exception as e:
@@ -24,8 +24,13 @@ def get_code_agent_system():
     global _code_agent_system
     if _code_agent_system is None:
         try:
-            from src.code_agent import CodeMultiAgentSystem
-            _code_agent_system = CodeMultiAgentSystem(verbose=False)
+            from src.code_agent import CodeMultiAgentSystem, DataManager
+            from src.code_agent.config import DATA_REFRESH_SECONDS, DATA_SHARED_MEMORY, DATA_SNAPSHOT
+            data_manager = DataManager(verbose=False, snapshot=DATA_SNAPSHOT,
+                                       shared_memory=DATA_SHARED_MEMORY)
+            _code_agent_system = CodeMultiAgentSystem(verbose=False, data_manager=data_manager)
+            if DATA_REFRESH_SECONDS > 0:
+                _code_agent_system.data_manager.start_auto_refresh(DATA_REFRESH_SECONDS)
             print("✅ CodeMultiAgentSystem inicializado")
         except Exception as e:
             print(f"❌ Error inicializando CodeMultiAgentSystem: {e}")
@@ -59,6 +64,7 @@ async def start_command_code(update: Update, context: ContextTypes.DEFAULT_TYPE)
         f"Comandos disponibles:\n"
         f"/start - Mostrar este mensaje\n"
         f"/help - Ayuda detallada\n"
+        f"/stats - Resumen de datos por municipio\n"
         f"/clear - Limpiar historial\n\n"
         f"¡Hazme cualquier pregunta sobre análisis de viento!"
     )
@@ -91,12 +97,78 @@ async def help_command_code(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "⚙️ *Comandos:*\n"
         "/start - Mensaje de bienvenida\n"
         "/help - Mostrar esta ayuda\n"
+        "/stats - Resumen de datos de los 13 municipios\n"
+        "/stats riohacha - Resumen de un municipio\n"
         "/clear - Limpiar historial de conversación\n\n"
         "💡 *Nota:* Los gráficos se guardan en `test/chatbot/output/`"
     )
     await update.message.reply_text(help_message, parse_mode="Markdown")
 
 
+def format_statistics(table, municipality: str = None, coverage: dict = None) -> str:
+    """Format the all-municipality statistics table as a Telegram message."""
+    if municipality is not None:
+        row = table.loc[municipality]
+        coverage_line = ""
+        if coverage:
+            coverage_line = (
+                f"\n• Cobertura: {coverage['coverage_pct']:.2f} % "
+                f"({coverage['missing_hours']:,} horas faltantes)"
+            )
+            if coverage['forecast_hours']:
+                coverage_line += f"\n• Horas de pronóstico (sin confirmar): {coverage['forecast_hours']:,}"
+        return (
+            f"📊 *{municipality.replace('_', ' ').title()}*\n\n"
+            f"• Registros: {int(row['records']):,}\n"
+            f"• Periodo: {row['start']:%Y-%m-%d} a {row['end']:%Y-%m-%d}\n"
+            f"• Viento promedio: {row['wind_speed_avg']:.2f} m/s\n"
+            f"• Viento máximo: {row['wind_speed_max']:.2f} m/s\n"
+            f"• Viento mínimo: {row['wind_speed_min']:.2f} m/s\n"
+            f"• Desviación del viento: {row['wind_speed_std']:.2f} m/s\n"
+            f"• Temperatura promedio: {row['temperature_avg']:.2f} °C\n"
+            f"• Humedad promedio: {row['humidity_avg']:.2f} %\n"
+            f"• Precipitación total: {row['precipitation_total']:,.1f} mm"
+            f"{coverage_line}"
+        )
+
+    lines = [f"{'Municipio':<19}{'Prom':>6}{'Máx':>6}{'Temp':>6}"]
+    for name, row in table.sort_values('wind_speed_avg', ascending=False).iterrows():
+        lines.append(f"{name.replace('_', ' ').title()[:18]:<19}"
+                     f"{row['wind_speed_avg']:>6.1f}{row['wind_speed_max']:>6.1f}{row['temperature_avg']:>6.1f}")
+    return (
+        "📊 *Viento por municipio (m/s) y temperatura (°C)*\n"
+        "```\n" + "\n".join(lines) + "\n```\n"
+        "Usa /stats <municipio> para ver el detalle."
+    )
+
+
+async def stats_command_code(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /stats command: precomputed summary without calling the LLM"""
+    user_id = update.effective_user.id
+    print(f"📊 Estadísticas solicitadas por usuario: {user_id}")
+
+    try:
+        data_manager = get_code_agent_system().data_manager
+        table = data_manager.get_statistics_all()
+    except Exception as e:
+        print(f"❌ Error calculando estadísticas: {e}")
+        await update.message.reply_text("⚠️ No se pudieron calcular las estadísticas.")
+        return
+
+    municipality = None
+    if context.args:
+        municipality = "_".join(context.args).lower()
+        if municipality not in table.index:
+            await update.message.reply_text(
+                f"❌ Municipio '{' '.join(context.args)}' no encontrado.\n"
+                f"Opciones: {', '.join(table.index)}"
+            )
+            return
+
+    coverage = data_manager.get_coverage(municipality) if municipality else None
+    await update.message.reply_text(format_statistics(table, municipality, coverage), parse_mode="Markdown")
+
+
 async def clear_command_code(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /clear command for code agent bot"""
     user_id = update.effective_user.id
@@ -0,0 +1,644 @@
+"""
+Data Manager Tests - Validate storage formats and data loading
+"""
+
+import sys
+import json
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from colorama import Fore, Style, init
+
+# Initialize colorama
+init(autoreset=True)
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.code_agent.config import DATA_DIR
+from src.code_agent.data_manager import DataManager, DERIVED_COLUMNS, frame_nbytes
+from src.code_agent import storage, metadata, quality, shared_data
+
+SAMPLE_MUNICIPALITIES = ["riohacha", "maicao"]
+
+
+def make_sample_dir() -> Path:
+    """Copy a few CSV exports into a temporary data directory."""
+    tmp_dir = Path(tempfile.mkdtemp(prefix="windbot_data_"))
+    for municipality in SAMPLE_MUNICIPALITIES:
+        shutil.copy(storage.csv_path(municipality, DATA_DIR), tmp_dir)
+    return tmp_dir
+
+
+def test_parquet_conversion():
+    """Test that Parquet files round-trip the CSV data."""
+    print(f"\n{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}🗄️  Test 1: Parquet Conversion{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}\n")
+
+    tmp_dir = make_sample_dir()
+    try:
+        written = storage.convert_csv_to_parquet(tmp_dir, SAMPLE_MUNICIPALITIES, verbose=True)
+
+        passed = 0
+        failed = 0
+        for municipality in SAMPLE_MUNICIPALITIES:
+            from_csv = storage.read_frame(storage.csv_path(municipality, tmp_dir))
+            from_parquet = storage.read_frame(written[municipality])
+            same = (
+                storage.source_path(municipality, tmp_dir).suffix == ".parquet"
+                and from_csv.equals(from_parquet)
+                and str(from_parquet['datetime'].dtype) == "datetime64[ns]"
+                # Text columns are rebuilt on read, not stored
+                and not set(storage.TEXT_COLUMNS) & set(pd.read_parquet(written[municipality]).columns)
+            )
+            if same:
+                print(f"{Fore.GREEN}✅ {municipality}: Parquet idéntico al CSV{Style.RESET_ALL}")
+                passed += 1
+            else:
+                print(f"{Fore.RED}❌ {municipality}: Parquet difiere del CSV{Style.RESET_ALL}")
+                failed += 1
+
+        print(f"\n{Fore.YELLOW}Results: {passed}/{len(SAMPLE_MUNICIPALITIES)} converted{Style.RESET_ALL}")
+        return failed == 0
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_data_manager_reads_parquet():
+    """Test that DataManager loads from the columnar store."""
+    print(f"\n{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}📊 Test 2: DataManager Parquet Loading{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}\n")
+
+    tmp_dir = make_sample_dir()
+    try:
+        from_csv = DataManager(verbose=False, data_dir=tmp_dir)
+        storage.convert_csv_to_parquet(tmp_dir, SAMPLE_MUNICIPALITIES, verbose=False)
+        from_parquet = DataManager(verbose=False, data_dir=tmp_dir)
+
+        passed = sorted(from_parquet.get_all_data()) == sorted(SAMPLE_MUNICIPALITIES)
+        for municipality in SAMPLE_MUNICIPALITIES:
+            passed = passed and from_csv.get_data(municipality).equals(from_parquet.get_data(municipality))
+
+        status = f"{Fore.GREEN}✅" if passed else f"{Fore.RED}❌"
+        print(f"{status} Frames cargados desde Parquet{Style.RESET_ALL}")
+        return passed
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_compact_representation():
+    """Test the compact in-memory representation."""
+    print(f"\n{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}🗜️  Test 3: Compact Representation{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}\n")
+
+    tmp_dir = make_sample_dir()
+    try:
+        full = DataManager(verbose=False, data_dir=tmp_dir)
+        compact = DataManager(verbose=False, data_dir=tmp_dir, compact=True)
+
+        passed = 0
+        failed = 0
+        for municipality in SAMPLE_MUNICIPALITIES:
+            df_full = full.get_data(municipality)
+            df_compact = compact.get_data(municipality)
+            ratio = full.get_memory_usage(municipality) / compact.get_memory_usage(municipality)
+            # Sampled size of the text columns close to the exact one
+            exact = frame_nbytes(df_full, deep=True)
+            ok = (
+                abs(full.get_memory_usage(municipality) - exact) < 0.05 * exact
+                and isinstance(df_compact.index, pd.DatetimeIndex)
+                and not set(DERIVED_COLUMNS) & set(df_compact.columns)
+                and str(df_compact['relative_humidity_2m'].dtype) == "uint8"
+                and (df_compact.index.hour == df_full['hour'].values).all()
+                and np.allclose(df_compact['wind_speed_10m'], df_full['wind_speed_10m'], atol=1e-4)
+                and ratio > 4
+            )
+            if ok:
+                print(f"{Fore.GREEN}✅ {municipality}: {ratio:.1f}x menos memoria{Style.RESET_ALL}")
+                passed += 1
+            else:
+                print(f"{Fore.RED}❌ {municipality}: representación compacta inválida ({ratio:.1f}x){Style.RESET_ALL}")
+                failed += 1
+
+        print(f"\n{Fore.YELLOW}Results: {passed}/{len(SAMPLE_MUNICIPALITIES)} compact{Style.RESET_ALL}")
+        return failed == 0
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_lazy_lru_cache():
+    """Test lazy loading and LRU eviction under a memory budget."""
+    print(f"\n{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}♻️  Test 4: Lazy Loading & LRU Cache{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}\n")
+
+    tmp_dir = make_sample_dir()
+    try:
+        # Budget for roughly one compact frame
+        dm = DataManager(verbose=False, data_dir=tmp_dir, compact=True, lazy=True, memory_budget_mb=1.5)
+        nothing_loaded = len(dm.get_all_data()) == 0
+
+        first, second = SAMPLE_MUNICIPALITIES
+        dm.get_data(first)
+        dm.get_data(first)
+        dm.get_data(second)
+        stats = dm.get_cache_stats()
+
+        checks = [
+            ("Sin carga al iniciar", nothing_loaded),
+            ("1 hit / 2 misses", stats["hits"] == 1 and stats["misses"] == 2),
+            ("1 desalojo LRU", stats["evictions"] == 1 and stats["resident"] == [second]),
+            ("Dentro del presupuesto", stats["resident_bytes"] <= stats["budget_bytes"]),
+            ("Índice de calidad contado y desalojado", set(dm.quality) == {second}
+             and stats["resident_bytes"] == dm.get_memory_usage(second) + dm.quality[second].nbytes),
+            ("Recarga tras desalojo", dm.get_data(first) is not None),
+        ]
+
+        for name, ok in checks:
+            status = f"{Fore.GREEN}✅" if ok else f"{Fore.RED}❌"
+            print(f"{status} {name}{Style.RESET_ALL}")
+
+        return all(ok for _, ok in checks)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_range_queries():
+    """Test binary-search range queries against boolean masks."""
+    print(f"\n{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}📅 Test 5: Time Range Queries{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}\n")
+
+    tmp_dir = make_sample_dir()
+    try:
+        dm = DataManager(verbose=False, data_dir=tmp_dir)
+        municipality = SAMPLE_MUNICIPALITIES[0]
+        df = dm.get_data(municipality)
+
+        mask = (df['datetime'] >= '2023-02-01') & (df['datetime'] < '2023-03-01')
+        expected = df.loc[mask, 'wind_speed_10m']
+        series = dm.get_range(municipality, '2023-02', '2023-02', columns='wind_speed_10m')
+        frame = dm.get_range(municipality, '2023-02-01', '2023-02-28 23:00', columns=['wind_speed_10m', 'datetime'])
+
+        checks = [
+            ("Índice ordenado", df.index.is_monotonic_increasing and df.index.is_unique),
+            ("Mismas filas que la máscara", series.equals(expected)),
+            ("Lista de columnas", list(frame.columns) == ['wind_speed_10m', 'datetime'] and len(frame) == len(expected)),
+            ("Vista sin copia", np.shares_memory(frame['wind_speed_10m'].values, df['wind_speed_10m'].values)),
+            ("Rango abierto", len(dm.get_range(municipality)) == len(df)),
+        ]
+
+        for name, ok in checks:
+            status = f"{Fore.GREEN}✅" if ok else f"{Fore.RED}❌"
+            print(f"{status} {name}{Style.RESET_ALL}")
+
+        return all(ok for _, ok in checks)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_rollup_cube():
+    """Test rollup cube statistics and incremental appends."""
+    print(f"\n{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}🧊 Test 6: Rollup Cube{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}\n")
+
+    tmp_dir = make_sample_dir()
+    try:
+        municipality = SAMPLE_MUNICIPALITIES[0]
+        raw = storage.read_municipality(municipality, tmp_dir)
+        dm = DataManager(verbose=False, data_dir=tmp_dir, compact=True)
+        df = dm.get_data(municipality)
+        speed = df['wind_speed_10m']
+        # Cubes are built on first use, not at load time
+        built_at_load = bool(dm.rollups)
+
+        # Same manager fed in two steps: history first, then the newest rows
+        partial = DataManager(verbose=False, data_dir=tmp_dir, compact=True, lazy=True)
+        partial._store(municipality, dm.get_data(municipality).iloc[:40000])
+        partial.get_rollup(municipality, 'day', 'temperature_2m')
+        partial.append_data(municipality, raw.iloc[40000:])
+
+        # A new day with a null in a uint8 column of the compact frame
+        gappy = raw.iloc[-24:].copy()
+        gappy['datetime'] += pd.Timedelta(days=1)
+        gappy.loc[gappy.index[0], 'relative_humidity_2m'] = np.nan
+        lazy = DataManager(verbose=False, data_dir=tmp_dir, compact=True, lazy=True)
+        with_nulls = lazy.append_data(municipality, gappy)
+
+        checks = [
+            ("Cubo construido en el primer uso", not built_at_load
+             and dm.get_rollup(municipality, 'hour', 'wind_speed_10m') is not None
+             and municipality in dm.rollups),
+            ("Promedio por mes del año", np.allclose(
+                dm.get_rollup(municipality, 'month_of_year', 'wind_speed_10m'),
+                speed.groupby(df.index.month).mean())),
+            ("Máximo por hora", np.allclose(
+                dm.get_rollup(municipality, 'hour', 'wind_speed_10m', 'max'),
+                speed.groupby(df.index.hour).max())),
+            ("Desviación por año", np.allclose(
+                dm.get_rollup(municipality, 'year', 'wind_speed_10m', 'std'),
+                speed.groupby(df.index.year).std())),
+            ("Actualización incremental", all(
+                partial.get_rollup(municipality, dim, 'temperature_2m', stat).equals(
+                    dm.get_rollup(municipality, dim, 'temperature_2m', stat))
+                for dim in ('day', 'month', 'hour') for stat in ('count', 'min', 'max'))),
+            ("Datos tras append", partial.get_data(municipality).equals(df)),
+            ("Append con nulos en columna entera", with_nulls is not None
+             and len(with_nulls) == len(df) + 24
+             and with_nulls['relative_humidity_2m'].isna().sum() == 1),
+        ]
+
+        for name, ok in checks:
+            status = f"{Fore.GREEN}✅" if ok else f"{Fore.RED}❌"
+            print(f"{status} {name}{Style.RESET_ALL}")
+
+        return all(ok for _, ok in checks)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_panel_views():
+    """Test the shared multi-municipality panel and wide matrices."""
+    print(f"\n{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}🗺️  Test 7: Multi-Municipality Panel{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}\n")
+
+    tmp_dir = make_sample_dir()
+    try:
+        dm = DataManager(verbose=False, data_dir=tmp_dir, compact=True)
+        panel = dm.get_panel()
+        means = panel.groupby(level='municipio')['wind_speed_10m'].mean()
+        wide = dm.get_wide('wind_speed_10m')
+
+        checks = [
+            ("Índice (municipio, datetime)", list(panel.index.names) == ['municipio', 'datetime']),
+            ("Mismo objeto compartido", dm.get_panel() is panel),
+            ("Groupby vectorizado", all(
+                np.isclose(means[m], dm.get_data(m)['wind_speed_10m'].mean()) for m in SAMPLE_MUNICIPALITIES)),
+            ("Matriz tiempo x municipio", sorted(wide.columns) == sorted(SAMPLE_MUNICIPALITIES)),
+        ]
+
+        changed = storage.read_municipality(SAMPLE_MUNICIPALITIES[0], tmp_dir).tail(3)
+        changed['wind_speed_10m'] += 1
+        dm.append_data(SAMPLE_MUNICIPALITIES[0], changed)
+        checks.append(("Se reconstruye tras cambios", dm.get_panel() is not panel))
+
+        for name, ok in checks:
+            status = f"{Fore.GREEN}✅" if ok else f"{Fore.RED}❌"
+            print(f"{status} {name}{Style.RESET_ALL}")
+
+        return all(ok for _, ok in checks)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_hot_reload():
+    """Test picking up rows written by the ingestion service."""
+    print(f"\n{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}🔄 Test 8: Hot Reload{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}\n")
+
+    tmp_dir = make_sample_dir()
+    try:
+        municipality = SAMPLE_MUNICIPALITIES[0]
+        dm = DataManager(verbose=False, data_dir=tmp_dir, compact=True)
+        before = dm.get_data(municipality)
+        monthly = dm.get_rollup(municipality, 'month', 'temperature_2m')
+        checks = [("Sin cambios no hay recarga", dm.refresh() == {} and dm.get_data_version() == 0)]
+
+        # Simulate an hourly ingestion pull: forecast rows rewritten + one new hour
+        csv_file = storage.csv_path(municipality, tmp_dir)
+        raw = storage.read_frame(csv_file)
+        raw.loc[raw.index[-2:], 'temperature_2m'] = 40.0
+        new_row = raw.tail(1).copy()
+        new_row['datetime'] = new_row['datetime'] + pd.Timedelta(hours=1)
+        new_row['date'] = new_row['datetime'].dt.date.astype(str)
+        new_row['hour'] = new_row['datetime'].dt.hour
+        pd.concat([raw, new_row], ignore_index=True).to_csv(csv_file, index=False)
+
+        updated = dm.refresh()
+        after = dm.get_data(municipality)
+        checks.extend([
+            ("Municipio actualizado", updated == {municipality: 1}),
+            ("Versión incrementada", dm.get_data_version(municipality) == 1),
+            ("Fila nueva disponible", len(after) == len(before) + 1
+             and after.index[-1] == new_row['datetime'].iloc[0]),
+            ("Filas sobrescritas", (after['temperature_2m'].iloc[-3:] == 40.0).all()),
+            ("Rollup coherente", np.isclose(
+                dm.get_rollup(municipality, 'month', 'temperature_2m').iloc[-1],
+                after['temperature_2m'][after.index.to_period('M') == after.index[-1].to_period('M')].mean())),
+            ("Snapshot anterior intacto", len(before) == len(after) - 1 and monthly.iloc[-1] != 40.0),
+            ("Segunda llamada sin cambios", dm.refresh() == {}),
+        ])
+
+        for name, ok in checks:
+            status = f"{Fore.GREEN}✅" if ok else f"{Fore.RED}❌"
+            print(f"{status} {name}{Style.RESET_ALL}")
+
+        return all(ok for _, ok in checks)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_snapshot_warm_start():
+    """Test restoring the built state from a memory-mapped snapshot."""
+    print(f"\n{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}⚡ Test 9: Snapshot Warm Start{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}\n")
+
+    tmp_dir = make_sample_dir()
+    try:
+        municipality = SAMPLE_MUNICIPALITIES[0]
+        cold = DataManager(verbose=False, data_dir=tmp_dir, compact=True, snapshot=True)
+        snapshots = list((tmp_dir / "snapshots").glob("*.snap"))
+
+        warm = DataManager(verbose=False, data_dir=tmp_dir, compact=True, snapshot=True)
+        df = warm.get_data(municipality)
+        checks = [
+            ("Snapshot escrito", len(snapshots) == 1),
+            ("Arranque sin leer archivos", warm.load_times == {}),
+            ("Mismos datos", df.equals(cold.get_data(municipality))),
+            ("Columnas de solo lectura (mmap)", not df['wind_speed_10m'].values.flags.writeable),
+            ("Índice comparte memoria", np.shares_memory(df.index.values, df['datetime'].values)),
+            ("Rollups restaurados", warm.get_rollup(municipality, 'month', 'wind_speed_10m').equals(
+                cold.get_rollup(municipality, 'month', 'wind_speed_10m'))),
+        ]
+
+        # Same files loaded with other options get their own snapshot
+        DataManager(verbose=False, data_dir=tmp_dir, snapshot=True)
+        full_snapshots = set((tmp_dir / "snapshots").glob("*.snap")) - set(snapshots)
+
+        # A changed source file invalidates the snapshot
+        csv_file = storage.csv_path(municipality, tmp_dir)
+        raw = storage.read_frame(csv_file)
+        raw.iloc[:-1].to_csv(csv_file, index=False)
+        rebuilt = DataManager(verbose=False, data_dir=tmp_dir, compact=True, snapshot=True)
+        remaining = set((tmp_dir / "snapshots").glob("*.snap"))
+        checks.extend([
+            ("Snapshot obsoleto ignorado", len(rebuilt.get_data(municipality)) == len(raw) - 1),
+            ("Snapshot reemplazado", not set(snapshots) & remaining and len(remaining) == 2),
+            ("Snapshot de otras opciones conservado", len(full_snapshots) == 1 and full_snapshots <= remaining),
+        ])
+
+        for name, ok in checks:
+            status = f"{Fore.GREEN}✅" if ok else f"{Fore.RED}❌"
+            print(f"{status} {name}{Style.RESET_ALL}")
+
+        return all(ok for _, ok in checks)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_shared_memory():
+    """Test publishing frames to shared memory and attaching to them."""
+    print(f"\n{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}🔗 Test 10: Shared Memory{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}\n")
+
+    tmp_dir = make_sample_dir()
+    prefix = f"windbot_test_{tmp_dir.name}"
+    publisher = attached = None
+    try:
+        municipality = SAMPLE_MUNICIPALITIES[0]
+        # One duplicated row, which attached processes must see too
+        csv_file = storage.csv_path(municipality, tmp_dir)
+        raw = storage.read_frame(csv_file)
+        pd.concat([raw, raw.iloc[[100]]], ignore_index=True).to_csv(csv_file, index=False)
+
+        publisher = DataManager(verbose=False, data_dir=tmp_dir, shared_memory=prefix)
+        segment = publisher.shared_segment
+        attached = DataManager(verbose=False, data_dir=tmp_dir, shared_memory=prefix)
+        df = attached.get_data(municipality)
+
+        # A segment planted under a predictable name with loose permissions
+        planted = shared_data.segment_path(f"{prefix}_planted", segment.name[len(prefix) + 1:-len(".shm")])
+        shutil.copy(segment, planted)
+        planted.chmod(0o644)
+        try:
+            shared_data.attach_frames(planted)
+            refused = False
+        except PermissionError:
+            refused = True
+        victim = DataManager(verbose=False, data_dir=tmp_dir, shared_memory=f"{prefix}_planted")
+        planted.unlink()
+
+        checks = [
+            ("Segmento publicado", segment is not None and segment.exists()),
+            ("Segmento privado (0600)", segment.stat().st_mode & 0o777 == 0o600),
+            ("Segmento ajeno rechazado", refused and victim.shared_segment is None and victim.load_times != {}),
+            ("Mismo segmento", attached.shared_segment == segment),
+            ("Adjuntado sin leer archivos", attached.load_times == {}),
+            ("Mismos datos", df.equals(publisher.get_data(municipality))),
+            ("Columnas de solo lectura", not df['wind_speed_10m'].values.flags.writeable),
+            ("Rollups disponibles", attached.get_rollup(municipality, 'year', 'precipitation', 'sum').equals(
+                publisher.get_rollup(municipality, 'year', 'precipitation', 'sum'))),
+            ("Rollups sin pickle", np.allclose(attached.get_rollup(municipality, 'month_hour', 'wind_speed_10m', 'std'),
+                                               publisher.get_rollup(municipality, 'month_hour', 'wind_speed_10m', 'std'))),
+            ("Duplicados compartidos", attached.get_coverage(municipality)['duplicate_hours'] == 1),
+        ]
+
+        publisher.close()
+        checks.extend([
+            ("Segmento eliminado al cerrar", not segment.exists()),
+            ("Vistas siguen válidas", np.isclose(df['wind_speed_10m'].mean(), raw['wind_speed_10m'].mean())),
+        ])
+
+        for name, ok in checks:
+            status = f"{Fore.GREEN}✅" if ok else f"{Fore.RED}❌"
+            print(f"{status} {name}{Style.RESET_ALL}")
+
+        return all(ok for _, ok in checks)
+    finally:
+        if publisher is not None:
+            publisher.close()
+        shutil.rmtree(tmp_dir)
+
+
+def test_metadata_manifest():
+    """Test the per-municipality metadata manifest."""
+    print(f"\n{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}📋 Test 11: Metadata Manifest{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}\n")
+
+    tmp_dir = make_sample_dir()
+    try:
+        municipality = SAMPLE_MUNICIPALITIES[0]
+        dm = DataManager(verbose=False, data_dir=tmp_dir)
+        df = dm.get_data(municipality)
+        manifest = dm.get_metadata(municipality)
+        manifest_file = metadata.manifest_path(municipality, tmp_dir)
+
+        checks = [
+            ("Registros y rango", manifest['rows'] == len(df)
+             and manifest['start'] == str(df['datetime'].min()) and manifest['end'] == str(df['datetime'].max())),
+            ("Estadísticas por columna", np.isclose(manifest['columns']['wind_speed_10m']['mean'],
+                                                    df['wind_speed_10m'].mean())),
+            ("Escrito junto a los datos", manifest_file.exists()),
+            ("get_statistics desde el manifiesto",
+             dm.get_statistics(municipality)['wind_speed_max'] == round(df['wind_speed_10m'].max(), 2)),
+        ]
+
+        # A new process reuses the file; gaps are detected
+        other = DataManager(verbose=False, data_dir=tmp_dir, lazy=True)
+        other.get_data(municipality)
+        manifest_file.write_text(manifest_file.read_text().replace(
+            f'"rows": {len(df)}', '"rows": -1'))
+        checks.append(("Reutilizado desde disco", other.get_metadata(municipality)['rows'] == -1))
+
+        gappy = df.drop(index=df.index[100:110])
+        gaps = metadata.build_manifest(gappy, municipality)['gaps']
+        checks.append(("Huecos detectados", gaps['missing_hours'] == 10 and gaps['gap_count'] == 1))
+
+        changed = storage.read_municipality(municipality, tmp_dir).tail(2)
+        changed['wind_speed_10m'] = 99.0
+        dm.append_data(municipality, changed)
+        checks.append(("Recalculado tras cambios", dm.get_metadata(municipality)['columns']['wind_speed_10m']['max'] == 99.0))
+
+        for name, ok in checks:
+            status = f"{Fore.GREEN}✅" if ok else f"{Fore.RED}❌"
+            print(f"{status} {name}{Style.RESET_ALL}")
+
+        return all(ok for _, ok in checks)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_statistics_all():
+    """Test the vectorized all-municipality statistics table."""
+    print(f"\n{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}📊 Test 12: All-Municipality Statistics{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}\n")
+
+    tmp_dir = make_sample_dir()
+    try:
+        dm = DataManager(verbose=False, data_dir=tmp_dir, compact=True)
+        table = dm.get_statistics_all()
+        checks = [
+            ("Un municipio por fila", sorted(table.index) == sorted(SAMPLE_MUNICIPALITIES)),
+            ("Coincide con get_statistics", all(
+                table.loc[m, key] == value
+                for m in SAMPLE_MUNICIPALITIES
+                for key, value in dm.get_statistics(m).items()
+                if key in table.columns)),
+            ("Memoizada", dm.get_statistics_all() is table),
+        ]
+
+        changed = storage.read_municipality(SAMPLE_MUNICIPALITIES[0], tmp_dir).tail(1)
+        changed['wind_speed_10m'] = 99.0
+        dm.append_data(SAMPLE_MUNICIPALITIES[0], changed)
+        updated = dm.get_statistics_all()
+        checks.append(("Recalculada por versión de datos",
+                       updated is not table and updated.loc[SAMPLE_MUNICIPALITIES[0], 'wind_speed_max'] == 99.0))
+
+        for name, ok in checks:
+            status = f"{Fore.GREEN}✅" if ok else f"{Fore.RED}❌"
+            print(f"{status} {name}{Style.RESET_ALL}")
+
+        return all(ok for _, ok in checks)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_quality_index():
+    """Test the missing-hour, duplicate, range and provenance index."""
+    print(f"\n{Fore.CYAN}{'='*80}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}🩺 Test 13: Data Quality Index{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}\n")
+
+    tmp_dir = make_sample_dir()
+    try:
+        municipality = SAMPLE_MUNICIPALITIES[0]
+        csv_file = storage.csv_path(municipality, tmp_dir)
+        raw = storage.read_frame(csv_file)
+        # 24 missing hours in March 2024, one duplicated row, one impossible humidity
+        march = raw['datetime'].between('2024-03-10 00:00', '2024-03-10 23:00')
+        damaged = pd.concat([raw[~march], raw.iloc[[100]]], ignore_index=True)
+        damaged.loc[200, 'relative_humidity_2m'] = 140
+        damaged.to_csv(csv_file, index=False)
+
+        archive_until = raw['datetime'].iloc[-73]
+        (tmp_dir / quality.PROVENANCE_FILE).write_text(
+            json.dumps({municipality: {"archive_until": str(archive_until)}}))
+
+        dm = DataManager(verbose=False, data_dir=tmp_dir, state_dir=tmp_dir)
+        total = dm.get_coverage(municipality)
+        month = dm.get_coverage(municipality, '2024-03', '2024-03')
+        missing = dm.get_quality(municipality).missing_hours('2024-03', '2024-03')
+
+        checks = [
+            ("Horas faltantes", total['missing_hours'] == 24 and month['missing_hours'] == 24),
+            ("Cobertura del mes", month['expected_hours'] == 744 and month['coverage_pct'] == round(100 * 720 / 744, 2)),
+            ("Lista de horas faltantes", len(missing) == 24 and missing[0] == pd.Timestamp('2024-03-10 00:00')),
+            ("Duplicados", total['duplicate_hours'] == 1),
+            ("Fuera de rango", total['out_of_range_hours'] == 1),
+            ("Procedencia pronóstico", total['forecast_hours'] == 72 and total['provenance_known']),
+            ("Otro mes completo", dm.get_coverage(municipality, '2024-04', '2024-04')['coverage_pct'] == 100.0),
+            # Bounds inside a prefix block
+            ("Rango de pocas horas", dm.get_quality(municipality).count(
+                'missing', '2024-03-09 23:00', '2024-03-10 02:00') == 3),
+            ("Índice compacto", dm.get_quality(municipality).nbytes <= 5 * dm.get_quality(municipality).hours),
+        ]
+
+        for name, ok in checks:
+            status = f"{Fore.GREEN}✅" if ok else f"{Fore.RED}❌"
+            print(f"{status} {name}{Style.RESET_ALL}")
+
+        return all(ok for _, ok in checks)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def main():
+    """Run all data manager tests."""
+    print(f"\n{Fore.MAGENTA}{'='*80}{Style.RESET_ALL}")
+    print(f"{Fore.MAGENTA}📦 DATA MANAGER TESTS{Style.RESET_ALL}")
+    print(f"{Fore.MAGENTA}{'='*80}{Style.RESET_ALL}")
+
+    results = []
+
+    # Run all tests
+    results.append(("Parquet Conversion", test_parquet_conversion()))
+    results.append(("DataManager Parquet Loading", test_data_manager_reads_parquet()))
+    results.append(("Compact Representation", test_compact_representation()))
+    results.append(("Lazy Loading & LRU Cache", test_lazy_lru_cache()))
+    results.append(("Time Range Queries", test_range_queries()))
+    results.append(("Rollup Cube", test_rollup_cube()))
+    results.append(("Multi-Municipality Panel", test_panel_views()))
+    results.append(("Hot Reload", test_hot_reload()))
+    results.append(("Snapshot Warm Start", test_snapshot_warm_start()))
+    results.append(("Shared Memory", test_shared_memory()))
+    results.append(("Metadata Manifest", test_metadata_manifest()))
+    results.append(("All-Municipality Statistics", test_statistics_all()))
+    results.append(("Data Quality Index", test_quality_index()))
+
+    # Summary
+    print(f"\n{Fore.MAGENTA}{'='*80}{Style.RESET_ALL}")
+    print(f"{Fore.MAGENTA}📊 SUMMARY{Style.RESET_ALL}")
+    print(f"{Fore.MAGENTA}{'='*80}{Style.RESET_ALL}\n")
+
+    passed_count = sum(1 for _, passed in results if passed)
+    total_count = len(results)
+
+    for test_name, passed in results:
+        status = f"{Fore.GREEN}✅ PASSED" if passed else f"{Fore.RED}❌ FAILED"
+        print(f"{status}{Style.RESET_ALL}: {test_name}")
+
+    print(f"\n{Fore.YELLOW}Total: {passed_count}/{total_count} tests passed{Style.RESET_ALL}")
+
+    if passed_count == total_count:
+        print(f"\n{Fore.GREEN}🎉 All data manager tests passed!{Style.RESET_ALL}\n")
+        return 0
+    else:
+        print(f"\n{Fore.RED}⚠️  Some data manager tests failed. Please review.{Style.RESET_ALL}\n")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())